@@ -0,0 +1,315 @@
+from Controls import *
+from SEO_pre_reader import *
+from PlaceholderManager import *
+import numpy as np
+
+
+class CompiledEngFile(SEO_pre_reader):
+    """
+    This class inherits from the class SEO_pre_reader. Its constructor
+    scans an English file only once, and, besides collecting the LOOP info
+    that its parent collects, it parses (compiles) every line of the file
+    into an item of the list self.op_list. SEO_reader and all its children
+    (SEO_simulator, CGateExpander, the Qubiter_to_* translators, etc.)
+    don't read English files directly. Instead, they are driven by an
+    object of this class. Hence, if you want to re-simulate or re-translate
+    the same circuit many times, you can build an object of this class once
+    and hand it to the constructor of any SEO_reader child via its `ckt`
+    keyword argument. By doing so, all the text parsing is skipped.
+
+    Each item of self.op_list is a tuple (line_name, split_line, args),
+    where line_name is the first word of the line, split_line is the line
+    split into tokens and args is a tuple of the arguments that SEO_reader
+    must send to the use_ method labelled by line_name. Controls are
+    stored as Controls objects. Angles are stored as floats measured in
+    radians, except when the English file contains a placeholder (a legal
+    variable name, see class PlaceholderManager) for that angle. In that
+    case, the placeholder str is stored instead, and it is resolved by the
+    vars_manager of the SEO_reader each time the op is used.
+
+    args for each line_name:
+
+    * DIAG: (trols, rad_angles)
+    * HAD2: (tar_bit_pos, controls)
+    * IF_M(: (controls,)
+    * }IF_M: ()
+    * LOOP: (loop_num, nreps)
+    * MEAS: (tar_bit_pos, kind)
+    * MP_Y: (tar_bit_pos, trols, rad_angles)
+    * NEXT: (loop_num,)
+    * NOTA: (bla_str,)
+    * PHAS: (angle_rads, tar_bit_pos, controls)
+    * P0PH, P1PH: (projection_bit, angle_rads, tar_bit_pos, controls)
+    * PRINT: (style,)
+    * ROTX, ROTY, ROTZ: (axis, angle_rads, tar_bit_pos, controls)
+    * ROTN: (angle_x_rads, angle_y_rads, angle_z_rads, tar_bit_pos,
+      controls)
+    * SIGX, SIGY, SIGZ: (axis, tar_bit_pos, controls)
+    * SWAP: (bit1, bit2, controls)
+
+    Attributes
+    ----------
+    op_list : list[tuple[str, list[str], tuple]]
+        list of compiled lines (ops) of the English file, in the same
+        order as in the file. LOOPs are not unrolled.
+
+    """
+
+    def __init__(self, file_prefix, num_bits):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        file_prefix : str
+        num_bits : int
+
+        Returns
+        -------
+
+        """
+        self.op_list = []
+        SEO_pre_reader.__init__(self, file_prefix, num_bits)
+
+    @staticmethod
+    def degs_str_to_rads(degs_str):
+        """
+        Returns float(degs_str)*pi/180 unless degs_str is a legal variable
+        name, in which case it returns degs_str unchanged, so that it can be
+        resolved later on by a PlaceholderManager.
+
+        Parameters
+        ----------
+        degs_str : str
+
+        Returns
+        -------
+        float | str
+
+        """
+        if PlaceholderManager.is_legal_var_name(degs_str):
+            return degs_str
+        return float(degs_str)*np.pi/180
+
+    def read_multi_controls(self, tokens, allow_only_TF=False):
+        """
+        Given a list of tokens of the form:
+        * an int followed by either T or F,
+        * int, colon, int,
+
+        construct a control out of it.
+
+        Parameters
+        ----------
+        tokens : list[str]
+        allow_only_TF : bool
+
+        Returns
+        -------
+        Controls
+
+        """
+        # safe to use when no "IF"
+        # when no "IF", will return controls with _numControls=0
+        controls = Controls(self.num_bits)
+        if tokens:
+            for t in tokens:
+                t_end = t[-1]
+                if allow_only_TF:
+                    assert t_end in ['T', 'F']
+                if t_end == 'T':
+                    controls.set_control(int(t[:-1]), True)
+                elif t_end == 'F':
+                    controls.set_control(int(t[:-1]), False)
+                else:
+                    k1, k2 = t.split(':')
+                    controls.set_control(int(k1), int(k2))
+            controls.refresh_lists()
+        return controls
+
+    def read_TF_controls(self, tokens):
+        """
+        Same as read_multi_controls() but only allows T/F kind controls.
+
+        Parameters
+        ----------
+        tokens : list[str]
+
+        Returns
+        -------
+        Controls
+
+        """
+        return self.read_multi_controls(tokens, allow_only_TF=True)
+
+    def finalize_scan_line(self, line):
+        """
+        Overrides the parent class function. Compiles the line that was
+        just scanned and appends the result to self.op_list.
+
+        Parameters
+        ----------
+        line : str
+
+        Returns
+        -------
+        None
+
+        """
+        self.op_list.append(self.compile_line(line))
+
+    def compile_line(self, line):
+        """
+        Returns the tuple (line_name, split_line, args) for the line `line`.
+        See class docstring for a description of args.
+
+        Parameters
+        ----------
+        line : str
+
+        Returns
+        -------
+        tuple[str, list[str], tuple]
+
+        """
+        split_line = line.split()
+        line_name = split_line[0]
+        to_rads = CompiledEngFile.degs_str_to_rads
+
+        if line_name in ["DIAG", "MP_Y"]:
+            # example:
+            # DIAG IF 2:1 1:0  0T BY 30.0 10.5 11.0 83.1
+            # MP_Y AT 3 IF 2:1 1:0  0T BY 30.0 10.5 11.0 83.1
+
+            BY_pos = split_line.index('BY')
+            trol_beg = 2 if line_name == "DIAG" else 4
+            trols = self.read_multi_controls(split_line[trol_beg: BY_pos])
+            rad_angles = [to_rads(t) for t in split_line[BY_pos + 1:]]
+            if line_name == "DIAG":
+                args = (trols, rad_angles)
+            else:
+                args = (int(split_line[2]), trols, rad_angles)
+
+        elif line_name == "HAD2":
+            # example:
+            # HAD2 AT 1 IF 3F 2T
+
+            args = (int(split_line[2]),
+                    self.read_TF_controls(split_line[4:]))
+
+        elif line_name == "IF_M(":
+            # example:
+            # IF_M( 3F 2T ){
+
+            args = (self.read_TF_controls(split_line[1:-1]),)
+
+        elif line_name == "}IF_M":
+            args = ()
+
+        elif line_name == "LOOP":
+            # example:
+            # LOOP 5 NREPS= 2
+
+            args = (int(split_line[1]), int(split_line[3]))
+
+        elif line_name == "MEAS":
+            # example:
+            # MEAS  2  AT  5
+
+            args = (int(split_line[3]), int(split_line[1]))
+
+        elif line_name == "NEXT":
+            # example:
+            # NEXT 5
+
+            args = (int(split_line[1]),)
+
+        elif line_name == 'NOTA':
+            # example:
+            # NOTA  "I love you Mary."
+
+            args = (line[4:].strip(),)
+
+        elif line_name == "PHAS":
+            # example:
+            # PHAS 42.7 AT 1 IF 3F 2T
+
+            args = (to_rads(split_line[1]), int(split_line[3]),
+                    self.read_TF_controls(split_line[5:]))
+
+        elif line_name in ["P0PH", "P1PH"]:
+            # example:
+            # P0PH 42.7 AT 1 IF 3F 2T
+
+            projection_bit = 0 if line_name == "P0PH" else 1
+            args = (projection_bit, to_rads(split_line[1]),
+                    int(split_line[3]),
+                    self.read_TF_controls(split_line[5:]))
+
+        elif line_name == "PRINT":
+            # example:
+            # PRINT V1
+
+            assert len(split_line) == 2, \
+                "PRINT line must contain style str"
+            args = (split_line[1],)
+
+        elif line_name in ["ROTX", "ROTY", "ROTZ"]:
+            # example:
+            # ROTX 42.7 AT 1 IF 3F 2T
+
+            axis = {"ROTX": 1, "ROTY": 2, "ROTZ": 3}[line_name]
+            args = (axis, to_rads(split_line[1]), int(split_line[3]),
+                    self.read_TF_controls(split_line[5:]))
+
+        elif line_name == "ROTN":
+            # example:
+            # ROTN 42.7 30.2 78.5 AT 1 IF 3F 2T
+
+            args = (to_rads(split_line[1]),
+                    to_rads(split_line[2]),
+                    to_rads(split_line[3]),
+                    int(split_line[5]),
+                    self.read_TF_controls(split_line[7:]))
+
+        elif line_name in ["SIGX", "SIGY", "SIGZ"]:
+            # example:
+            # SIGX AT 1 IF 3F 2T
+
+            axis = {"SIGX": 1, "SIGY": 2, "SIGZ": 3}[line_name]
+            args = (axis, int(split_line[2]),
+                    self.read_TF_controls(split_line[4:]))
+
+        elif line_name == "SWAP":
+            # example:
+            # SWAP 1 0 IF 3F 2T
+
+            args = (int(split_line[1]), int(split_line[2]),
+                    self.read_TF_controls(split_line[4:]))
+
+        else:
+            assert False, \
+                "reading an unsupported line kind: " + line_name
+
+        return line_name, split_line, args
+
+if __name__ == "__main__":
+    from SEO_simulator import *
+
+    def main():
+        file_prefix = 'io_folder/sim_test2'
+        num_bits = 4
+        ckt = CompiledEngFile(file_prefix, num_bits)
+        print('number of lines=', ckt.tot_num_lines)
+        print('loop_to_nreps=', ckt.loop_to_nreps)
+        for line_name, split_line, args in ckt.op_list[:5]:
+            print(line_name, args)
+
+        # the file is parsed only once, by CompiledEngFile. Both
+        # simulations below are driven by ckt
+        sim1 = SEO_simulator(file_prefix, num_bits, ckt=ckt)
+        sim2 = SEO_simulator(file_prefix, num_bits, ckt=ckt)
+        print('same final state=',
+              np.allclose(sim1.cur_st_vec_dict['pure'].arr,
+                          sim2.cur_st_vec_dict['pure'].arr))
+    main()
@@ -7,7 +7,9 @@ class OneBitGates:
     of static methods, all of which return a complex 2 by 2 matrix (numpy
     array). In cases where the entries of the matrix are all real,
     an is_quantum bool option is given to choose between a float64 or
-    complex128 array.
+    complex array. The complex dtype is given by the option dtype,
+    which is np.complex128 by default, but can be set to np.complex64 to
+    match a state vector of that dtype.
 
 
     Attributes
@@ -16,13 +18,14 @@ class OneBitGates:
     """
 
     @staticmethod
-    def sigx(is_quantum=True):
+    def sigx(is_quantum=True, dtype=np.complex128):
         """
         Returns \sigma_x Pauli matrix.
 
         Parameters
         ----------
         is_quantum : bool
+        dtype : type
 
         Returns
         -------
@@ -32,36 +35,41 @@ class OneBitGates:
         if not is_quantum:
             ty = np.float64
         else:
-            ty = np.complex128
+            ty = dtype
         mat = np.zeros([2, 2], dtype=ty)
         mat[0, 1] = 1
         mat[1, 0] = 1
         return mat
 
     @staticmethod
-    def sigy():
+    def sigy(dtype=np.complex128):
         """
         Returns \sigma_y Pauli matrix.
 
+        Parameters
+        ----------
+        dtype : type
+
         Returns
         -------
         np.ndarray
 
         """
-        ty = np.complex128
+        ty = dtype
         mat = np.zeros([2, 2], dtype=ty)
         mat[0, 1] = -1j
         mat[1, 0] = 1j
         return mat
 
     @staticmethod
-    def sigz(is_quantum=True):
+    def sigz(is_quantum=True, dtype=np.complex128):
         """
         Returns \sigma_z Pauli matrix.
 
         Parameters
         ----------
         is_quantum : bool
+        dtype : type
 
         Returns
         -------
@@ -71,20 +79,21 @@ class OneBitGates:
         if not is_quantum:
             ty = np.float64
         else:
-            ty = np.complex128
+            ty = dtype
         mat = np.zeros([2, 2], dtype=ty)
         mat[0, 0] = 1
         mat[1, 1] = -1
         return mat
 
     @staticmethod
-    def had2(is_quantum=True):
+    def had2(is_quantum=True, dtype=np.complex128):
         """
         Returns 2 dimensional Hadamard matrix (\sigma_x + \sigma_z)/sqrt(2)
 
         Parameters
         ----------
         is_quantum : bool
+        dtype : type
 
         Returns
         -------
@@ -94,14 +103,14 @@ class OneBitGates:
         if not is_quantum:
             ty = np.float64
         else:
-            ty = np.complex128
+            ty = dtype
         x = 1/np.sqrt(2)
-        mat = np.zeros([2, 2], dtype=ty) + x
+        mat = np.full([2, 2], x, dtype=ty)
         mat[1, 1] = - mat[1, 1]
         return mat
 
     @staticmethod
-    def P_0(is_quantum=True):
+    def P_0(is_quantum=True, dtype=np.complex128):
         """
         Returns projection operator P_0 = |0><0| = nbar, where |0> = [1,
         0]^T and |1> = [0, 1]^T, T = transpose
@@ -109,6 +118,7 @@ class OneBitGates:
         Parameters
         ----------
         is_quantum : bool
+        dtype : type
 
         Returns
         -------
@@ -118,13 +128,13 @@ class OneBitGates:
         if not is_quantum:
             ty = np.float64
         else:
-            ty = np.complex128
+            ty = dtype
         mat = np.zeros([2, 2], dtype=ty)
         mat[0, 0] = 1
         return mat
 
     @staticmethod
-    def P_1(is_quantum=True):
+    def P_1(is_quantum=True, dtype=np.complex128):
         """
         Returns projection operator P_1 = |1><1| = nbar, where |0> = [1,
         0]^T and |1> = [0, 1]^T, T = transpose
@@ -132,6 +142,7 @@ class OneBitGates:
         Parameters
         ----------
         is_quantum : bool
+        dtype : type
 
         Returns
         -------
@@ -141,13 +152,13 @@ class OneBitGates:
         if not is_quantum:
             ty = np.float64
         else:
-            ty = np.complex128
+            ty = dtype
         mat = np.zeros([2, 2], dtype=ty)
         mat[1, 1] = 1
         return mat
 
     @staticmethod
-    def P_0_phase_fac(ang_rads):
+    def P_0_phase_fac(ang_rads, dtype=np.complex128):
         """
         Returns
 
@@ -156,20 +167,21 @@ class OneBitGates:
         Parameters
         ----------
         ang_rads : float
+        dtype : type
 
         Returns
         -------
         np.ndarray
 
         """
-        ty = np.complex128
+        ty = dtype
         mat = np.zeros([2, 2], dtype=ty)
         mat[0, 0] = np.exp(1j*ang_rads)
         mat[1, 1] = 1
         return mat
 
     @staticmethod
-    def P_1_phase_fac(ang_rads):
+    def P_1_phase_fac(ang_rads, dtype=np.complex128):
         """
         Returns
 
@@ -178,20 +190,21 @@ class OneBitGates:
         Parameters
         ----------
         ang_rads : float
+        dtype : type
 
         Returns
         -------
         np.ndarray
 
         """
-        ty = np.complex128
+        ty = dtype
         mat = np.zeros([2, 2], dtype=ty)
         mat[1, 1] = np.exp(1j*ang_rads)
         mat[0, 0] = 1
         return mat
 
     @staticmethod
-    def phase_fac(ang_rads):
+    def phase_fac(ang_rads, dtype=np.complex128):
         """
         Returns
 
@@ -201,13 +214,14 @@ class OneBitGates:
         Parameters
         ----------
         ang_rads : float
+        dtype : type
 
         Returns
         -------
         np.ndarray
 
         """
-        ty = np.complex128
+        ty = dtype
         mat = np.zeros([2, 2], dtype=ty)
         x = np.exp(1j*ang_rads)
         mat[1, 1] = x
@@ -215,7 +229,7 @@ class OneBitGates:
         return mat
 
     @staticmethod
-    def rot(rad_ang_x, rad_ang_y, rad_ang_z):
+    def rot(rad_ang_x, rad_ang_y, rad_ang_z, dtype=np.complex128):
         """
         Returns
 
@@ -229,13 +243,14 @@ class OneBitGates:
         rad_ang_x : float
         rad_ang_y : float
         rad_ang_z : float
+        dtype : type
 
         Returns
         -------
         np.ndarray
 
         """
-        ty = np.complex128
+        ty = dtype
         mat = np.zeros([2, 2], dtype=ty)
         vec = np.array([rad_ang_x, rad_ang_y, rad_ang_z])
         n = np.linalg.norm(vec)  # sqrt(dot(vec, vec.conj))
@@ -255,7 +270,7 @@ class OneBitGates:
         return mat
 
     @staticmethod
-    def rot_ax(rad_ang, axis):
+    def rot_ax(rad_ang, axis, dtype=np.complex128):
         """
         Returns
 
@@ -267,13 +282,14 @@ class OneBitGates:
         ----------
         rad_ang : float
         axis : int
+        dtype : type
 
         Returns
         -------
         np.ndarray
 
         """
-        ty = np.complex128
+        ty = dtype
         mat = np.zeros([2, 2], dtype=ty)
         c = np.cos(rad_ang)
         s = np.sin(rad_ang)
@@ -297,7 +313,7 @@ class OneBitGates:
         return mat
 
     @staticmethod
-    def mat_S(herm=False):
+    def mat_S(herm=False, dtype=np.complex128):
         """
         Returns
 
@@ -308,6 +324,7 @@ class OneBitGates:
         Parameters
         ----------
         herm : bool
+        dtype : type
 
         Returns
         -------
@@ -318,10 +335,10 @@ class OneBitGates:
             sign = 1
         else:
             sign = -1
-        return OneBitGates.P_1_phase_fac(sign*np.pi/2)
+        return OneBitGates.P_1_phase_fac(sign*np.pi/2, dtype)
 
     @staticmethod
-    def mat_T(herm=False):
+    def mat_T(herm=False, dtype=np.complex128):
         """
         Returns
 
@@ -332,6 +349,7 @@ class OneBitGates:
         Parameters
         ----------
         herm : bool
+        dtype : type
 
         Returns
         -------
@@ -342,31 +360,39 @@ class OneBitGates:
             sign = 1
         else:
             sign = -1
-        return OneBitGates.P_1_phase_fac(sign*np.pi/4)
+        return OneBitGates.P_1_phase_fac(sign*np.pi/4, dtype)
 
     @staticmethod
-    def mat_Tdag():
+    def mat_Tdag(dtype=np.complex128):
         """
         returns T^\dag
 
+        Parameters
+        ----------
+        dtype : type
+
         Returns
         -------
         np.ndarray
 
         """
-        return OneBitGates.mat_T(True)
+        return OneBitGates.mat_T(True, dtype)
 
     @staticmethod
-    def mat_Sdag():
+    def mat_Sdag(dtype=np.complex128):
         """
         returns S^\dag
 
+        Parameters
+        ----------
+        dtype : type
+
         Returns
         -------
         np.ndarray
 
         """
-        return OneBitGates.mat_S(True)
+        return OneBitGates.mat_S(True, dtype)
 
 if __name__ == "__main__":
     def main():
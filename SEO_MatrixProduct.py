@@ -40,29 +40,39 @@ class SEO_MatrixProduct:
     product of the matrices corresponding to each line (gate) of an English
     file.
 
-    In order to accomplish this goal, this class calls SEO_simulalor_sp
-    repeatedly using as initial state vector all the standard basis vectors
-    (2^num_bits of them). Then the class assembles the product matrix that
-    we seek by stacking on top of each other all the 2^num_bits final
-    evolved state vectors. Admittedly, this is a very slow, inefficient way
-    of finding the sought for matrix product. However, it works fine for a
-    small number of qubits. It can be used to check that gate expansions
-    agree with what they are supposed to be an expansion of.
-
-    Though slow, the strategy used by this class has the advantages that it
-    was very easy to code, and that every time it is shown to work,
-    SEO_simulator is shown to work too, 2^num_bit times. This strategy is
-    also easier to parallelize if the need for that arises at some later date.
+    In order to accomplish this goal, this class calls SEO_simulator_sp
+    using as initial state vector a batch (see class StateVec) of standard
+    basis vectors, in ZL order. So it evolves the identity matrix directly:
+    each line of the English file is read once and its gate is applied by
+    the kernels of SEO_simulator to all the columns of the identity matrix
+    at once. The final batch, transposed, is the matrix product that we
+    seek. This class can be used to check that gate expansions agree with
+    what they are supposed to be an expansion of.
+
+    For big matrices, the columns are split into blocks of at most
+    max_cols_per_block columns, and each block is evolved separately,
+    so only the block being evolved (not a second full copy of the
+    product matrix) is kept in memory besides prod_arr. By default,
+    the size of the blocks is chosen so that each one takes at most
+    max_block_bytes bytes. Each evolved block is written into its columns
+    of prod_arr through a transposed view, without first building its
+    traditional (ZL) copy. If num_workers > 1, the blocks are evolved in
+    parallel by a pool of num_workers processes. If memmap_file_name is
+    given, prod_arr is a np.memmap stored in that file, and the processes
+    write their blocks directly into it. The English file is compiled only
+    once, and the compiled circuit is sent to all the blocks.
 
     Attributes
     ----------
     prod_arr : np.ndarray
         the product matrix obtained by multiplying each line of the input
-        English file.
+        English file. A np.memmap if memmap_file_name is not None.
 
     """
 
-    def __init__(self, file_prefix, num_bits):
+    def __init__(self, file_prefix, num_bits, num_workers=1,
+                 max_cols_per_block=None, max_block_bytes=1 << 27,
+                 memmap_file_name=None):
         """
         Constructor
 
@@ -72,6 +82,18 @@ class SEO_MatrixProduct:
             Prefix of English file being read
         num_bits : int
             number of bits in English file begin read.
+        num_workers : int
+            number of processes that evolve blocks of columns in parallel.
+            If 1, no processes are spawned.
+        max_cols_per_block : int | None
+            maximum number of columns in a block. If None, the columns
+            are split evenly among the num_workers workers, but into
+            blocks of at most max_block_bytes bytes.
+        max_block_bytes : int
+            used only if max_cols_per_block is None
+        memmap_file_name : str | None
+            name of a file in which to store prod_arr as a np.memmap. If
+            None, prod_arr is an ordinary array kept in memory.
 
         Returns
         -------
@@ -81,25 +103,133 @@ class SEO_MatrixProduct:
 
         self.prod_arr = None
 
-        num_comps = 1 << num_bits
-        fin_list = []
-        for s in range(num_comps):
-            spin_dir_list = [(s >> bpos) & 1 for bpos in
-                             reversed(range(num_bits))]
-            init_st_vec = StateVec.get_standard_basis_st_vec(
-                spin_dir_list, ZL=True)
-            # print("---", spin_dir_list)
-            # print(init_st_vec)
-            sim = SEO_simulator_sp(file_prefix, num_bits,
-                    init_st_vec=init_st_vec)
-            fin_st_vec = sim.cur_st_vec_dict["pure"]
-            fin = StateVec.get_traditional_st_vec(fin_st_vec)
-            fin_list.append(fin)
-            # print(fin_st_vec)
-            # print(fin)
-        self.prod_arr = np.vstack(fin_list).transpose()
+        dim = 1 << num_bits
+        assert num_workers >= 1
+        if max_cols_per_block is None:
+            # a column takes 16*dim bytes
+            max_cols_per_block = max(1, min(-(-dim // num_workers),
+                                            max_block_bytes // (16*dim)))
+        col_blocks = [(j, min(j + max_cols_per_block, dim))
+                      for j in range(0, dim, max_cols_per_block)]
+
+        if memmap_file_name is not None:
+            # the workers open this same file and write to it
+            self.prod_arr = np.memmap(memmap_file_name,
+                dtype=np.complex128, mode='w+', shape=(dim, dim))
+        else:
+            self.prod_arr = np.empty((dim, dim), dtype=np.complex128)
+
+        ckt = CompiledEngFile(file_prefix, num_bits)
+        args_list = [(ckt, beg, end, memmap_file_name)
+                     for beg, end in col_blocks]
+        if num_workers == 1:
+            blocks = map(SEO_MatrixProduct.evolve_col_block, args_list)
+            self.fill_prod_arr(col_blocks, blocks)
+        else:
+            from multiprocessing import Pool
+            with Pool(num_workers) as pool:
+                blocks = pool.imap(SEO_MatrixProduct.evolve_col_block,
+                                   args_list)
+                self.fill_prod_arr(col_blocks, blocks)
         # print(self.prod_arr)
 
+    def fill_prod_arr(self, col_blocks, blocks):
+        """
+        Stores each block of columns in blocks into self.prod_arr. A block
+        that is None has already been written to the memmap file by the
+        worker that evolved it. The other blocks are batches returned by
+        evolve_col_block().
+
+        Parameters
+        ----------
+        col_blocks : list[tuple[int, int]]
+            list of pairs (beg, end). The columns of a block are range(beg,
+            end)
+        blocks : iterable[np.ndarray|None]
+            each block is a batch of shape [end - beg] + [2]*num_bits
+
+        Returns
+        -------
+        None
+
+        """
+        for (beg, end), block in zip(col_blocks, blocks):
+            if block is not None:
+                SEO_MatrixProduct.write_col_block(self.prod_arr, beg, end,
+                                                  block)
+
+    @staticmethod
+    def write_col_block(prod_arr, beg, end, block):
+        """
+        Writes the evolved batch block into the columns range(beg, end) of
+        prod_arr. Item k of the batch, whose qubit axes are in ZF order,
+        is column beg + k, whose rows are in ZL order. The copy is done
+        from a transposed view of block into a reshaped view of prod_arr,
+        so no temporary copy of the block is made.
+
+        Parameters
+        ----------
+        prod_arr : np.ndarray
+        beg : int
+        end : int
+        block : np.ndarray
+            shape [end - beg] + [2]*num_bits
+
+        Returns
+        -------
+        None
+
+        """
+        num_bits = block.ndim - 1
+        # splitting the row axis of a slice of columns is always a view.
+        # Axis j of cols is the row bit of qubit num_bits - 1 - j, which is
+        # axis num_bits - j of block
+        cols = prod_arr[:, beg:end].reshape([2]*num_bits + [end - beg])
+        cols[...] = np.transpose(block,
+                                 [num_bits - j for j in range(num_bits)]
+                                 + [0])
+
+    @staticmethod
+    def evolve_col_block(args):
+        """
+        Evolves the standard basis vectors with ZL labels in range(beg,
+        end), and returns the resulting batch, which, once written by
+        write_col_block(), is the block prod_arr[:, beg:end] of the matrix
+        product. If memmap_file_name is not None, the block is written into
+        the memmap file instead, and None is returned. This function is run
+        by the workers of the process pool, so its arguments are packed
+        into a single tuple.
+
+        Parameters
+        ----------
+        args : tuple[CompiledEngFile, int, int, str|None]
+            (ckt, beg, end, memmap_file_name)
+
+        Returns
+        -------
+        np.ndarray | None
+
+        """
+        ckt, beg, end, memmap_file_name = args
+        file_prefix, num_bits = ckt.file_prefix, ckt.num_bits
+        # item k of this batch is the standard basis vector with ZL
+        # label beg + k
+        init_st_vec = StateVec.get_standard_basis_batch_st_vec(
+            num_bits, labels=range(beg, end))
+        sim = SEO_simulator_sp(file_prefix, num_bits,
+                               init_st_vec=init_st_vec, ckt=ckt)
+        # item k of block is the image of basis vector beg + k, i.e.,
+        # column beg + k of the matrix product
+        block = sim.cur_st_vec_dict["pure"].arr
+        if memmap_file_name is None:
+            return block
+        dim = 1 << num_bits
+        prod_arr = np.memmap(memmap_file_name, dtype=np.complex128,
+                             mode='r+', shape=(dim, dim))
+        SEO_MatrixProduct.write_col_block(prod_arr, beg, end, block)
+        prod_arr.flush()
+        return None
+
 if __name__ == "__main__":
     from FouSEO_writer import *
 
@@ -116,4 +246,10 @@ if __name__ == "__main__":
         # print(exact)
         err = np.linalg.norm(prod - exact)
         print("error=", err)
+
+        # same, but with 2 processes evolving blocks of 2 columns each
+        mp = SEO_MatrixProduct(file_prefix, num_bits, num_workers=2,
+                               max_cols_per_block=2)
+        err = np.linalg.norm(mp.prod_arr - exact)
+        print("error with process pool=", err)
     main()
@@ -12,9 +12,11 @@ class SEO_pre_reader:
 
     Attributes
     ----------
-    english_in : _io.TextIOWrapper
+    english_in : _io.TextIOWrapper | None
         file object for input text file that stores English description of
-        circuit
+        circuit. It is set to None once the scan is over, so that objects of
+        this class (and of its child CompiledEngFile) can be pickled and
+        sent to worker processes.
     file_prefix : str
         beginning of the name of English file being scanned
     loop_queue : list[int]
@@ -35,7 +37,7 @@ class SEO_pre_reader:
 
     """
 
-    def __init__(self, file_prefix, num_bits):
+    def __init__(self, file_prefix, num_bits, pre_reader=None):
         """
         Constructor
 
@@ -45,6 +47,10 @@ class SEO_pre_reader:
             file must be called file_prefix + '_' + num_bits + "_eng.txt"
         num_bits : int
             total number of qubits of circuit.
+        pre_reader : SEO_pre_reader
+            If this is not None, the English file is not scanned again.
+            Instead, the loop info is copied from this object, which must
+            have scanned the same English file before.
 
         Returns
         -------
@@ -52,9 +58,20 @@ class SEO_pre_reader:
         """
         self.file_prefix = file_prefix
         self.num_bits = num_bits
+        self.split_line = None
+
+        if pre_reader is not None:
+            assert pre_reader.num_bits == num_bits
+            self.english_in = None
+            self.tot_num_lines = pre_reader.tot_num_lines
+            self.loop_to_start_offset = pre_reader.loop_to_start_offset
+            self.loop_to_start_line = pre_reader.loop_to_start_line
+            self.loop_to_nreps = pre_reader.loop_to_nreps
+            self.loop_queue = pre_reader.loop_queue
+            return
+
         self.english_in = open(
             file_prefix + '_' + str(num_bits) + '_eng.txt', 'rt')
-        self.split_line = None
 
         self.tot_num_lines = 0
         self.loop_to_start_offset = {}
@@ -64,6 +81,7 @@ class SEO_pre_reader:
 
         while not self.english_in.closed:
             self.scan_next_line()
+        self.english_in = None
 
     def scan_next_line(self):
         """
@@ -93,6 +111,27 @@ class SEO_pre_reader:
         else:
             pass
 
+        self.finalize_scan_line(line)
+
+    def finalize_scan_line(self, line):
+        """
+        Useful for intercepting the end of each call to scan_next_line().
+        Child classes that want to process every line, not just the LOOP
+        and NEXT ones, during this single scan of the English file can
+        override this.
+
+        Parameters
+        ----------
+        line : str
+            the line that was just scanned
+
+        Returns
+        -------
+        None
+
+        """
+        pass
+
     def scan_LOOP(self):
         """
         Parses and uses line starting with "LOOP".
@@ -1,5 +1,5 @@
 from Controls import *
-from SEO_pre_reader import *
+from CompiledEngFile import *
 from PlaceholderManager import *
 import numpy as np
 
@@ -9,7 +9,10 @@ class SEO_reader(SEO_pre_reader):
     This class inherits from the class SEO_pre_reader. It's an abstract
     class because it has a bunch of use_ methods that must be overridden by
     a child class. This class reads each line of an English file, parses it,
-    and sends the info obtained to a use_ method for further processing. One
+    and sends the info obtained to a use_ method for further processing.
+    The parsing is done only once, by an object of class CompiledEngFile. If
+    such an object is passed into the constructor of this class via the
+    `ckt` keyword argument, the English file is not even opened. One
     very important child of this class is SEO_simulator which uses each line
     of the English file to evolve by one further step a quantum state vector.
 
@@ -28,9 +31,8 @@ class SEO_reader(SEO_pre_reader):
 
     Attributes
     ----------
-    english_in : _io.TextIOWrapper
-        file object for input text file that stores English description of
-        circuit
+    ckt : CompiledEngFile
+        the compiled English file that drives this reader
     just_jumped : bool
         flag used to alert when loop jumps from NEXT to LOOP
     line_count : int
@@ -43,6 +45,8 @@ class SEO_reader(SEO_pre_reader):
         haven't been reset to |0> or |1>
     num_cnots : int
     num_ops : int
+    op_pos : int
+        position in self.ckt.op_list of the next op to be read
     split_line : list[str]
     vars_manager : PlaceholderManager
         handles variables indicated by #int in the English file being read
@@ -52,7 +56,7 @@ class SEO_reader(SEO_pre_reader):
     """
 
     def __init__(self, file_prefix, num_bits, vars_manager=None,
-                 verbose=False, write_log=False):
+                 verbose=False, write_log=False, ckt=None):
         """
         Constructor
 
@@ -62,12 +66,21 @@ class SEO_reader(SEO_pre_reader):
         num_bits : int
         vars_manager : PlaceholderManager
         verbose : bool
+        write_log : bool
+        ckt : CompiledEngFile
+            If None, the English file is compiled by the constructor.
+            Otherwise, it must be a compiled version of the English file
+            file_prefix + '_' + num_bits + "_eng.txt"
 
         Returns
         -------
 
         """
-        SEO_pre_reader.__init__(self, file_prefix, num_bits)
+        if ckt is None:
+            ckt = CompiledEngFile(file_prefix, num_bits)
+        self.ckt = ckt
+        # ckt has already collected the loop info, so no need to scan file
+        SEO_pre_reader.__init__(self, file_prefix, num_bits, pre_reader=ckt)
         self.split_line = None
         self.vars_manager = vars_manager
         if vars_manager is None:
@@ -79,9 +92,6 @@ class SEO_reader(SEO_pre_reader):
         self.measured_bits = []
         self.mcase_trols = None
 
-        self.english_in = open(
-            file_prefix + '_' + str(num_bits) + '_eng.txt', 'rt')
-
         self.loop_to_cur_rep = {loop_num: 0 for
                                 loop_num in self.loop_to_nreps.keys()}
 
@@ -90,7 +100,9 @@ class SEO_reader(SEO_pre_reader):
         self.line_count = 0
         self.just_jumped = False
 
-        while not self.english_in.closed:
+        self.op_pos = 0
+        num_ops_in_ckt = len(ckt.op_list)
+        while self.op_pos < num_ops_in_ckt:
             self.next_line()
 
         if write_log:
@@ -168,8 +180,8 @@ class SEO_reader(SEO_pre_reader):
 
     def next_line(self):
         """
-        Analyze the inputted line. Send info to use_ methods labelled by
-        first four letters of line) for further use.
+        Analyze the next line (op) of self.ckt. Send info to use_ methods
+        labelled by first four letters of line) for further use.
 
         Parameters
         ----------
@@ -179,50 +191,25 @@ class SEO_reader(SEO_pre_reader):
         None
 
         """
-        line = self.english_in.readline()
-        if not line or not line.strip():
-            self.english_in.close()
-            return
-
-        self.split_line = line.split()
-        line_name = self.split_line[0]
+        line_name, self.split_line, args = self.ckt.op_list[self.op_pos]
+        self.op_pos += 1
         self.num_ops += 1
         self.line_count += 1
         self.just_jumped = False
-        vman = self.vars_manager
+        rads = self.resolve_rads
 
         if line_name == "DIAG":
-            # example:
-            # DIAG IF 2:1 1:0  0T BY 30.0 10.5 11.0 83.1
-
-            BY_pos = -1
-            for k in range(len(self.split_line)):
-                if self.split_line[k] == 'BY':
-                    BY_pos = k
-                    break
-            trol_tokens = self.split_line[2: BY_pos]
-            ang_tokens = self.split_line[BY_pos + 1: len(self.split_line)]
-            trols = self.read_multi_controls(trol_tokens)
-            rad_angles = [vman.degs_str_to_rads(ang_tokens[k])
-                          for k in range(len(ang_tokens))]
-            self.use_DIAG(trols, rad_angles)
+            trols, rad_angles = args
+            self.use_DIAG(trols, [rads(x) for x in rad_angles])
 
         elif line_name == "HAD2":
-            # example:
-            # HAD2 AT 1 IF 3F 2T
-
-            tar_bit_pos = int(self.split_line[2])
-            controls = self.read_TF_controls(self.split_line[4:])
-            self.use_HAD2(tar_bit_pos, controls)
+            self.use_HAD2(*args)
 
         elif line_name == "IF_M(":
             # don't count IF_M(<controls>){ as operation
             self.num_ops -= 1
 
-            # example:
-            # IF_M( 3F 2T ){
-            self.mcase_trols = self.read_TF_controls(
-                self.split_line[1:-1])
+            self.mcase_trols = args[0]
             for bit in self.mcase_trols.bit_pos:
                 assert bit in self.measured_bits, \
                     "IF_M() argument mentions a qubit that" \
@@ -238,22 +225,10 @@ class SEO_reader(SEO_pre_reader):
         elif line_name == "LOOP":
             # don't count LOOP as operation
             self.num_ops -= 1
-
-            # example:
-            # LOOP 5 NREPS= 2
-
-            loop_num = int(self.split_line[1])
-            nreps = int(self.split_line[3])
-            self.use_LOOP(loop_num, nreps)
+            self.use_LOOP(*args)
 
         elif line_name == "MEAS":
-            # example:
-            # MEAS  0  AT  5
-            # MEAS  1  AT  5
-            # MEAS  2  AT  5
-
-            kind = int(self.split_line[1])
-            tar_bit_pos = int(self.split_line[3])
+            tar_bit_pos, kind = args
             if kind == 2:
                 # don't measure same bit twice
                 assert tar_bit_pos not in self.measured_bits,\
@@ -262,98 +237,54 @@ class SEO_reader(SEO_pre_reader):
             self.use_MEAS(tar_bit_pos, kind)
 
         elif line_name == "MP_Y":
-            # example:
-            # MP_Y AT 3 IF 2:1 1:0  0T BY 30.0 10.5 11.0 83.1
-
-            tar_bit_pos = int(self.split_line[2])
-            BY_pos = -1
-            for k in range(len(self.split_line)):
-                if self.split_line[k] == 'BY':
-                    BY_pos = k
-                    break
-            trol_tokens = self.split_line[4: BY_pos]
-            ang_tokens = self.split_line[BY_pos + 1: len(self.split_line)]
-            trols = self.read_multi_controls(trol_tokens)
-            rad_angles = [vman.degs_str_to_rads(ang_tokens[k])
-                for k in range(len(ang_tokens))]
-            self.use_MP_Y(tar_bit_pos, trols, rad_angles)
+            tar_bit_pos, trols, rad_angles = args
+            self.use_MP_Y(tar_bit_pos, trols, [rads(x) for x in rad_angles])
 
         elif line_name == "NEXT":
             # don't count NEXT as operation
             self.num_ops -= 1
-
-            # example:
-            # NEXT 5
-
-            loop_num = int(self.split_line[1])
+            loop_num = args[0]
             self.use_NEXT(loop_num)
 
         elif line_name == 'NOTA':
             # don't count NOTA as operation
             self.num_ops -= 1
-
-            # example:
-            # NOTA  "I love you Mary."
-
-            self.use_NOTA(line[4:].strip())
+            self.use_NOTA(*args)
 
         elif line_name == "PHAS":
-            # example:
-            # PHAS 42.7 AT 1 IF 3F 2T
-
-            angle_rads = vman.degs_str_to_rads(self.split_line[1])
-            tar_bit_pos = int(self.split_line[3])
-            controls = self.read_TF_controls(self.split_line[5:])
-            self.use_PHAS(angle_rads, tar_bit_pos, controls)
+            angle_rads, tar_bit_pos, controls = args
+            self.use_PHAS(rads(angle_rads), tar_bit_pos, controls)
 
-        elif line_name == "P0PH":
-            self.read_P_phase_factor(0)
-        elif line_name == "P1PH":
-            self.read_P_phase_factor(1)
+        elif line_name in ["P0PH", "P1PH"]:
+            projection_bit, angle_rads, tar_bit_pos, controls = args
+            self.use_P_PH(projection_bit,
+                          rads(angle_rads), tar_bit_pos, controls)
 
         elif line_name == "PRINT":
             # don't count PRINT as operation
             self.num_ops -= 1
+            self.use_PRINT(args[0], self.line_count)
+
+        elif line_name in ["ROTX", "ROTY", "ROTZ"]:
+            axis, angle_rads, tar_bit_pos, controls = args
+            self.use_ROT(axis, rads(angle_rads), tar_bit_pos, controls)
 
-            # example:
-            # PRINT V1
-            assert len(self.split_line) == 2, \
-                "PRINT line must contain style str"
-            self.use_PRINT(self.split_line[1], self.line_count)
-
-        elif line_name == "ROTX":
-            self.read_ROT(1)
-        elif line_name == "ROTY":
-            self.read_ROT(2)
-        elif line_name == "ROTZ":
-            self.read_ROT(3)
         elif line_name == "ROTN":
-            # example:
-            # ROTN 42.7 30.2 78.5 AT 1 IF 3F 2T
-
-            angle_x_rads = vman.degs_str_to_rads(self.split_line[1])
-            angle_y_rads = vman.degs_str_to_rads(self.split_line[2])
-            angle_z_rads = vman.degs_str_to_rads(self.split_line[3])
-            tar_bit_pos = int(self.split_line[5])
-            controls = self.read_TF_controls(self.split_line[7:])
-            self.use_ROTN(angle_x_rads, angle_y_rads, angle_z_rads,
-                             tar_bit_pos, controls)
-
-        elif line_name == "SIGX":
-            self.read_SIG(1)
-        elif line_name == "SIGY":
-            self.read_SIG(2)
-        elif line_name == "SIGZ":
-            self.read_SIG(3)
+            angle_x_rads, angle_y_rads, angle_z_rads, \
+                tar_bit_pos, controls = args
+            self.use_ROTN(rads(angle_x_rads),
+                          rads(angle_y_rads),
+                          rads(angle_z_rads),
+                          tar_bit_pos, controls)
+
+        elif line_name in ["SIGX", "SIGY", "SIGZ"]:
+            axis, tar_bit_pos, controls = args
+            if axis == 1 and len(controls.bit_pos) == 1:
+                self.num_cnots += 1
+            self.use_SIG(axis, tar_bit_pos, controls)
 
         elif line_name == "SWAP":
-            # example:
-            # SWAP 1 0 IF 3F 2T
-
-            bit1 = int(self.split_line[1])
-            bit2 = int(self.split_line[2])
-            controls = self.read_TF_controls(self.split_line[4:])
-            self.use_SWAP(bit1, bit2, controls)
+            self.use_SWAP(*args)
 
         else:
             assert False, \
@@ -374,132 +305,24 @@ class SEO_reader(SEO_pre_reader):
         if self.verbose:
             print('line_num, operation =', self.line_count, self.num_ops)
 
-    def read_multi_controls(self, tokens, allow_only_TF=False):
+    def resolve_rads(self, rads):
         """
-        Given a list of tokens of the form:
-        * an int followed by either T or F,
-        * int, colon, int,
-
-        construct a control out of it.
+        Returns rads unchanged if it is a float. If it is a str (i.e.,
+        a placeholder stored by CompiledEngFile), it tries to resolve it
+        into a float using self.vars_manager.
 
         Parameters
         ----------
-        tokens : list[str]
-        allow_only_TF : bool
+        rads : float | str
 
         Returns
         -------
-        Controls
-
-        """
-        # safe to use when no "IF"
-        # when no "IF", will return controls with _numControls=0
-        controls = Controls(self.num_bits)
-        if tokens:
-            for t in tokens:
-                t_end = t[-1]
-                if allow_only_TF:
-                    assert t_end in ['T', 'F']
-                if t_end == 'T':
-                    controls.set_control(int(t[:-1]), True)
-                elif t_end == 'F':
-                    controls.set_control(int(t[:-1]), False)
-                else:
-                    k1, k2 = t.split(':')
-                    controls.set_control(int(k1), int(k2))
-            controls.refresh_lists()
-        return controls
-
-    def read_TF_controls(self, tokens):
-        """
-        Same as read_multi_controls() but only allows T/F kind controls.
+        float | str
 
-        Parameters
-        ----------
-        tokens : list[str]
-
-        Returns
-        -------
-        Controls
-
-        """
-        return self.read_multi_controls(tokens, allow_only_TF=True)
-
-    def read_P_phase_factor(self, projection_bit):
         """
-        Collect useful info from P0PH or P1PH split_line and forward it to
-        use_ method.
-
-        Parameters
-        ----------
-        projection_bit : int
-        Returns
-        -------
-        None
-        """
-        # example:
-        # P0PH 42.7 AT 1 IF 3F 2T
-        # P1PH 42.7 AT 1 IF 3F 2T
-
-        vman = self.vars_manager
-        angle_rads = vman.degs_str_to_rads(self.split_line[1])
-        tar_bit_pos = int(self.split_line[3])
-        controls = self.read_TF_controls(self.split_line[5:])
-        assert projection_bit in [0, 1]
-        self.use_P_PH(projection_bit,
-                          angle_rads, tar_bit_pos, controls)
-
-    def read_ROT(self, axis):
-        """
-        Collect useful info from ROTX, ROTY, or ROTZ split_line and forward
-        it to use_ method.
-
-        Parameters
-        ----------
-        axis : int
-
-        Returns
-        -------
-        None
-
-        """
-        # example:
-        # ROTX 42.7 AT 1 IF 3F 2T
-        # ROTY 42.7 AT 1 IF 3F 2T
-        # ROTZ 42.7 AT 1 IF 3F 2T
-
-        vman = self.vars_manager
-        angle_rads = vman.degs_str_to_rads(self.split_line[1])
-        tar_bit_pos = int(self.split_line[3])
-        controls = self.read_TF_controls(self.split_line[5:])
-        self.use_ROT(axis, angle_rads, tar_bit_pos, controls)
-
-    def read_SIG(self, axis):
-        """
-        Collect useful info from SIGX, SIGY, or SIGZ split_line and forward
-        it to use_ method.
-
-        Parameters
-        ----------
-        axis : int
-
-        Returns
-        -------
-        None
-
-        """
-        # example:
-        # SIGX AT 1 IF 3F 2T
-        # SIGY AT 1 IF 3F 2T
-        # SIGZ AT 1 IF 3F 2T
-
-        tar_bit_pos = int(self.split_line[2])
-        controls = self.read_TF_controls(self.split_line[4:])
-        assert axis in [1, 2, 3]
-        if axis == 1 and len(controls.bit_pos) == 1:
-            self.num_cnots += 1
-
-        self.use_SIG(axis, tar_bit_pos, controls)
+        if isinstance(rads, str):
+            return self.vars_manager.degs_str_to_rads(rads)
+        return rads
 
     def use_DIAG(self, trols, rad_angles):
         """
@@ -641,7 +464,8 @@ class SEO_reader(SEO_pre_reader):
 
         """
         if self.loop_to_cur_rep[loop_num] < self.loop_to_nreps[loop_num]-1:
-            self.english_in.seek(self.loop_to_start_offset[loop_num])
+            # op after LOOP line has this position in self.ckt.op_list
+            self.op_pos = self.loop_to_start_line[loop_num] - 1
             self.just_jumped = True
             self.loop_to_cur_rep[loop_num] += 1
         else:
@@ -1,5 +1,7 @@
 import numpy as np
 import copy as cp
+import queue
+from concurrent.futures import ThreadPoolExecutor
 # import pprint as pp
 from SEO_reader import *
 from OneBitGates import *
@@ -17,7 +19,25 @@ class SEO_simulator(SEO_reader):
     the unitary matrix that represents the latest line read.
 
     An initial state vector can be entered via the constructor or else it is
-    set to the ground state automatically by the constructor.
+    set to the ground state automatically by the constructor. The initial
+    state vector may also be a batch of state vectors (see class StateVec),
+    for example, the one returned by
+    StateVec.get_standard_basis_batch_st_vec(). A batch is evolved in a
+    single pass; the gate kernels act on all the items of the batch at
+    once, and the English file is read only once.
+
+    If the constructor is given num_threads > 1, each gate is applied by
+    num_threads threads working in parallel. The slice of the state vector
+    that a gate acts on is split into chunks along its leading axes that
+    are not touched by the gate (i.e., that are neither controls nor the
+    target), and the gate kernels act on the chunks in a thread pool.
+    Since numpy releases the GIL during its array operations, this makes
+    the memory-bound kernels use several cores.
+
+    The simulation is done in the dtype of the initial state vector, which
+    can be np.complex64 instead of the default np.complex128. The gates
+    and the scratch buffers are built with that same dtype, so single
+    precision halves the memory and the memory bandwidth used.
 
     3 kinds (called 0, 1, 2) of measurements MEAS are allowed. A type 0
     measurement inserts a projector |0><0| = n = P_0 at the target bit. A
@@ -46,8 +66,53 @@ class SEO_simulator(SEO_reader):
     An item of cur_st_vec_dict may be key=some string, value=None. This
     means the state vector of that branch is zero.
 
+    Internally, the branches are not stored as separate arrays. They are
+    stacked into the single array self.branch_arr, whose first axis labels
+    the branches, and the outcomes of the kind 2 measurements that define
+    each branch are stored as an int bitmask per branch in
+    self.br_outcome_masks. This way, each gate is applied to all the
+    branches by a single call to a vectorized kernel, instead of by a
+    Python loop over branches. The values of cur_st_vec_dict are
+    StateVec's whose arr is a view of one branch of branch_arr.
+
+    When an IF_M( line is read, the branches that satisfy its controls
+    are found once, by comparing bitmasks, and the views of branch_arr
+    that hold them are stored in self.evolving_arrs. The gates inside the
+    IF_M block just evolve those views.
+
+    In long circuits with many kind 2 measurements, the number of branches
+    can be kept down with the constructor options prune_zero_brs, which
+    removes the zero branches, and merge_brs, which merges branches that
+    no later IF_M line can tell apart, when this doesn't change the
+    density matrix.
+
+    For circuits with too many kind 2 measurements to enumerate all their
+    branches, the constructor option trajectory=True turns on trajectory
+    mode. In this mode, a kind 2 measurement doesn't double the branches.
+    Instead, its outcome is sampled from the probabilities of the state,
+    and the state is projected onto that outcome and rescaled so that its
+    total probability doesn't change. Hence, there is always a single
+    branch, whose key records the sampled outcomes, and the IF_M blocks
+    are either applied to it or skipped. The static method
+    run_trajectories() runs many trajectories, optionally in a process
+    pool, and returns a histogram of their outcomes.
+
     Attributes
     ----------
+    br_is_zero : np.ndarray
+        bool array of shape (num_branches,). br_is_zero[br] is True iff
+        branch br is zero.
+    br_meas_bits : list[int]
+        list of the qubits measured so far by kind 2 measurements, in the
+        order in which they were measured.
+    br_outcome_masks : np.ndarray
+        int array of shape (num_branches,). Bit number `bit` of
+        br_outcome_masks[br] is 1 (resp., 0) if, in branch br, the qubit
+        bit in br_meas_bits was measured to be True (resp., False).
+    branch_arr : np.ndarray
+        complex array of shape (num_branches,) + batch_shape + [
+        2]*num_bits, whose item br is the state vector of branch br. The
+        branches are in the order of the keys of cur_st_vec_dict.
     cached_sts : dict[int, dict(str, StateVec)]
         A dictionary mapping an int to past values of self.cur_st_vec_dict.
         Used by use_PRINT() sometimes.
@@ -59,6 +124,33 @@ class SEO_simulator(SEO_reader):
         uniquely characterizes the measured controls. For example, if it has
         been measured previously (type 2 measurement only) that qubit 2 is
         True and qubit 4 is False, the branch key will be '4F2T'.
+    dtype : type
+        dtype of the arrays of the state vectors being evolved, either
+        np.complex128 or np.complex64
+    evolving_arrs : list[np.ndarray]
+        list of views of branch_arr that hold the branches evolved by the
+        current line. See get_evolving_arrs().
+    merge_brs : bool
+        if True, merge_branches() is called after each MEAS line
+    num_threads : int
+        number of threads that apply each gate in parallel
+    prune_zero_brs : bool
+        if True, prune_zero_branches() is called after each MEAS line
+    rng : np.random.Generator | None
+        random number generator used in trajectory mode, None otherwise
+    scratch0 : np.ndarray
+    scratch1 : np.ndarray
+        two 1 dim complex arrays, allocated once by the constructor, that
+        the gate kernels use as temporary storage, so that no array as big
+        as the state vector is allocated while applying a gate.
+    scratch_queue : queue.Queue
+        queue of pairs of scratch arrays. Each thread of thread_pool takes
+        a pair from it while it is working on a chunk. The first pair is (
+        scratch0, scratch1).
+    thread_pool : concurrent.futures.ThreadPoolExecutor | None
+        pool of num_threads threads, or None if num_threads = 1
+    trajectory : bool
+        True iff the simulator is in trajectory mode
 
     """
 
@@ -66,7 +158,9 @@ class SEO_simulator(SEO_reader):
     # LineList, UnitaryMat, SEO_readerMu
 
     def __init__(self, file_prefix, num_bits,
-                 init_st_vec=None, **kwargs):
+                 init_st_vec=None, dtype=np.complex128, num_threads=1,
+                 prune_zero_brs=False, merge_brs=False,
+                 trajectory=False, rand_seed=None, **kwargs):
         """
         Constructor
 
@@ -76,19 +170,90 @@ class SEO_simulator(SEO_reader):
         num_bits : int
         init_st_vec : StateVec
             get this using the functions StateVec.get_ground_st_vec() or
-            StateVec.get_standard_basis_st_vec().
+            StateVec.get_standard_basis_st_vec(). It may also be a batch of
+            state vectors; get one using StateVec.get_batch_st_vec() or
+            StateVec.get_standard_basis_batch_st_vec().
+        dtype : type
+            dtype of the ground state used when init_st_vec is None. If
+            init_st_vec is not None, the dtype of its arr is used instead.
+        num_threads : int
+            number of threads that apply each gate in parallel.
+        prune_zero_brs : bool
+            if True, zero branches are removed after each MEAS line. See
+            prune_zero_branches().
+        merge_brs : bool
+            if True, branches that can be merged are merged after each MEAS
+            line. See merge_branches().
+        trajectory : bool
+            if True, the simulator runs in trajectory mode. See class
+            docstring.
+        rand_seed : int | np.random.SeedSequence | None
+            seed of the random number generator used in trajectory mode
+            to sample the outcomes of kind 2 measurements.
 
         Returns
         -------
 
         """
         if StateVec.is_zero(init_st_vec):
-            init_st_vec = StateVec.get_ground_st_vec(num_bits)
+            init_st_vec = StateVec.get_ground_st_vec(num_bits, dtype)
+        self.dtype = init_st_vec.arr.dtype
         self.cur_st_vec_dict = {"pure": init_st_vec}
         self.cached_sts = {}
 
+        # a view, so init_st_vec is evolved in place, as long as there is
+        # a single branch
+        self.branch_arr = init_st_vec.arr[np.newaxis]
+        self.br_meas_bits = []
+        self.br_outcome_masks = np.zeros((1,), dtype=np.int64)
+        self.br_is_zero = np.zeros((1,), dtype=bool)
+        self.evolving_arrs = [self.branch_arr]
+        self.prune_zero_brs = prune_zero_brs
+        self.merge_brs = merge_brs
+        self.trajectory = trajectory
+        self.rng = None
+        if trajectory:
+            assert init_st_vec.arr.ndim == num_bits, \
+                "trajectory mode doesn't support batches of states"
+            self.rng = np.random.default_rng(rand_seed)
+
+        self.init_scratch_and_threads(num_threads)
+
         SEO_reader.__init__(self, file_prefix, num_bits, **kwargs)
 
+    def init_scratch_and_threads(self, num_threads):
+        """
+        Allocates the scratch arrays used by the gate kernels, and, if
+        num_threads > 1, the thread pool that applies the gates. self.dtype
+        must be set before calling this.
+
+        Parameters
+        ----------
+        num_threads : int
+
+        Returns
+        -------
+        None
+
+        """
+        # temporary storage used by the gate kernels. Its size is the
+        # size of the blocks into which the kernels split the state vector
+        max_block_size = 1 << 14
+        self.scratch0 = np.empty((max_block_size,), dtype=self.dtype)
+        self.scratch1 = np.empty((max_block_size,), dtype=self.dtype)
+
+        assert num_threads >= 1
+        self.num_threads = num_threads
+        self.thread_pool = None
+        self.scratch_queue = queue.Queue()
+        self.scratch_queue.put((self.scratch0, self.scratch1))
+        if num_threads > 1:
+            self.thread_pool = ThreadPoolExecutor(num_threads)
+            for k in range(num_threads - 1):
+                self.scratch_queue.put((
+                    np.empty((max_block_size,), dtype=self.dtype),
+                    np.empty((max_block_size,), dtype=self.dtype)))
+
     @staticmethod
     def branch_is_part_of_mcase(br_trols, case_trols):
         """
@@ -183,6 +348,623 @@ class SEO_simulator(SEO_reader):
             new_br_key = br_key + x
         return new_br_key
 
+    def get_br_key(self, br):
+        """
+        Returns the branch key (a key of cur_st_vec_dict) of branch br of
+        self.branch_arr. The key is built from the bitmask
+        self.br_outcome_masks[br].
+
+        Parameters
+        ----------
+        br : int
+
+        Returns
+        -------
+        str
+
+        """
+        br_key = "pure"
+        mask = int(self.br_outcome_masks[br])
+        for bit in self.br_meas_bits:
+            br_key = SEO_simulator.get_br_key_with_new_link(br_key,
+                bit, bool((mask >> bit) & 1))
+        return br_key
+
+    def refresh_st_vec_dict(self):
+        """
+        Rebuilds self.cur_st_vec_dict from self.branch_arr. Must be called
+        every time the branches are changed by something other than a gate.
+
+        Returns
+        -------
+        None
+
+        """
+        self.cur_st_vec_dict = {}
+        for br in range(self.branch_arr.shape[0]):
+            arr = None if self.br_is_zero[br] else self.branch_arr[br]
+            self.cur_st_vec_dict[self.get_br_key(br)] = \
+                StateVec(self.num_bits, arr)
+
+    def get_br_probs(self):
+        """
+        Returns an array of shape (num_branches,) + batch_shape with the
+        total probability of each state vector of self.branch_arr. The
+        probabilities are computed with np.vdot() one state vector at a
+        time, so no temporary array as big as branch_arr is allocated.
+
+        Returns
+        -------
+        np.ndarray
+
+        """
+        arr = self.branch_arr
+        probs = np.empty(arr.shape[:arr.ndim - self.num_bits])
+        for index in np.ndindex(*probs.shape):
+            item = arr[index]
+            probs[index] = np.real(np.vdot(item, item))
+        return probs
+
+    def get_evolving_arrs(self):
+        """
+        Returns a list of the arrays that must be evolved by the current
+        line. These arrays are views of self.branch_arr. If the current line
+        is outside of any IF_M block, the list is [self.branch_arr],
+        so all branches are evolved at once. If it is inside such a block,
+        only the branches that satisfy self.mcase_trols are evolved.
+
+        The list is not computed here, but by refresh_evolving_arrs(),
+        when the IF_M( line is read. This function just returns it.
+
+        Zero branches are evolved too, because evolving them is harmless
+        and cheaper than skipping them.
+
+        Returns
+        -------
+        list[np.ndarray]
+
+        """
+        return self.evolving_arrs
+
+    @staticmethod
+    def get_index_views(arr, indices):
+        """
+        Returns a list of views of arr such that the items (along axis 0)
+        of arr in all the views are exactly the items arr[indices], so
+        arr[indices] is never copied.
+
+        indices is first split into maximal runs of equally spaced ints.
+        Then, runs with the same shape whose first items are equally spaced
+        are merged into 2 dim blocks, and so on. For example, the branches
+        selected by an IF_M control on any subset of the measured bits
+        end up in a single view, with one axis for each group of free
+        measured bits. Each block becomes a view made by
+        np.lib.stride_tricks.as_strided().
+
+        Parameters
+        ----------
+        arr : np.ndarray
+        indices : np.ndarray
+            increasing 1 dim int array
+
+        Returns
+        -------
+        list[np.ndarray]
+
+        """
+        # a block is a pair (beg, dims), where dims is a tuple of pairs (
+        # count, step), and it stands for the indices beg + sum_j k_j*step_j
+        # with 0 <= k_j < count_j
+        blocks = [(int(k), ()) for k in indices]
+        while True:
+            new_blocks = []
+            k = 0
+            while k < len(blocks):
+                beg, dims = blocks[k]
+                m = k
+                if k + 1 < len(blocks) and blocks[k + 1][1] == dims:
+                    step = blocks[k + 1][0] - beg
+                    while m + 1 < len(blocks) and \
+                            blocks[m + 1][1] == dims and \
+                            blocks[m + 1][0] - blocks[m][0] == step:
+                        m += 1
+                if m > k:
+                    new_blocks.append((beg, ((m - k + 1, step),) + dims))
+                else:
+                    new_blocks.append((beg, dims))
+                k = m + 1
+            if len(new_blocks) == len(blocks):
+                break
+            blocks = new_blocks
+
+        views = []
+        stride = arr.strides[0]
+        for beg, dims in blocks:
+            shape = tuple(count for count, step in dims) + arr.shape[1:]
+            strides = tuple(step*stride for count, step in dims) + \
+                arr.strides[1:]
+            views.append(np.lib.stride_tricks.as_strided(
+                arr[beg:], shape=shape, strides=strides))
+        return views
+
+    def refresh_evolving_arrs(self):
+        """
+        Computes self.evolving_arrs. Must be called every time
+        self.mcase_trols or self.branch_arr change. If self.mcase_trols
+        is not None, the branches that satisfy it are those whose bitmask
+        in self.br_outcome_masks agrees with it on the bits that it
+        controls.
+
+        Returns
+        -------
+        None
+
+        """
+        assert not(self.mcase_trols and not self.measured_bits)
+        if not self.measured_bits or not self.mcase_trols:
+            self.evolving_arrs = [self.branch_arr]
+            return
+        case_mask = 0
+        case_vals = 0
+        for bit, kind in self.mcase_trols.bit_pos_to_kind.items():
+            case_mask |= 1 << bit
+            case_vals |= int(kind) << bit
+        brs = np.flatnonzero(
+            (self.br_outcome_masks & case_mask) == case_vals)
+        self.evolving_arrs = SEO_simulator.get_index_views(
+            self.branch_arr, brs)
+
+    def keep_branches(self, brs):
+        """
+        Keeps only the branches brs of self.branch_arr, and discards the
+        others. self.branch_arr becomes a new, compact array.
+
+        Parameters
+        ----------
+        brs : np.ndarray
+            increasing 1 dim int array
+
+        Returns
+        -------
+        None
+
+        """
+        self.branch_arr = self.branch_arr[brs]
+        self.br_outcome_masks = self.br_outcome_masks[brs]
+        self.br_is_zero = self.br_is_zero[brs]
+
+    def prune_zero_branches(self):
+        """
+        Removes all the zero branches from self.branch_arr, so that later
+        gates, get_den_mat() and describe_st_vec_dict() don't visit them.
+        If all branches are zero, the first one is kept, so that
+        cur_st_vec_dict is never empty.
+
+        Returns
+        -------
+        None
+
+        """
+        if not np.any(self.br_is_zero):
+            return
+        brs = np.flatnonzero(~self.br_is_zero)
+        if len(brs) == 0:
+            brs = np.array([0])
+        self.keep_branches(brs)
+
+    def get_live_meas_bits(self):
+        """
+        Returns the set of the bits of self.br_meas_bits that are
+        controls of the current IF_M block, if any, or of some IF_M( line
+        that may still be read. If the circuit has loops, all the IF_M(
+        lines of the circuit may still be read. Otherwise, only those after
+        the current one.
+
+        Returns
+        -------
+        set[int]
+
+        """
+        beg = 0 if self.loop_to_nreps else self.op_pos
+        live_bits = set()
+        if self.mcase_trols:
+            live_bits |= set(self.mcase_trols.bit_pos_to_kind.keys())
+        for line_name, split_line, args in self.ckt.op_list[beg:]:
+            if line_name == "IF_M(":
+                live_bits |= set(args[0].bit_pos_to_kind.keys())
+        return live_bits & set(self.br_meas_bits)
+
+    def merge_branches(self):
+        """
+        Merges branches that no IF_M( line that may still be read can tell
+        apart, whenever that doesn't change the density matrix of the
+        state.
+
+        Branches whose outcomes agree on all the live bits (see
+        get_live_meas_bits()) form a group. The group of the states |br0>,
+        |br1>, ... contributes |br0><br0| + |br1><br1| + ... to the
+        density matrix. If all those states are parallel, their
+        contribution equals |u><u| for a single state |u>, where |u> is
+        the eigenvector of maximum eigenvalue of the group's density
+        matrix, times the square root of that eigenvalue. It is found from
+        the (small) Gram matrix of the group. In that case, the group is
+        replaced by a single branch with state |u> and with the key of the
+        first branch of the group. For a batch of states, the group is
+        merged only if its states are parallel for every batch item.
+
+        Returns
+        -------
+        None
+
+        """
+        num_brs = self.branch_arr.shape[0]
+        if num_brs == 1:
+            return
+        live_mask = 0
+        for bit in self.get_live_meas_bits():
+            live_mask |= 1 << bit
+        live_masks = self.br_outcome_masks & live_mask
+        batch_shape = self.branch_arr.shape[1:self.branch_arr.ndim -
+                                               self.num_bits]
+        num_items = int(np.prod(batch_shape))
+        tol = 1e-5 if self.dtype == np.complex64 else 1e-10
+        keep = np.ones((num_brs,), dtype=bool)
+        for mask in np.unique(live_masks):
+            brs = np.flatnonzero(live_masks == mask)
+            if len(brs) == 1:
+                continue
+            # vecs has shape (num_items, len(brs), 2^num_bits)
+            vecs = self.branch_arr[brs].reshape(len(brs), num_items, -1)
+            vecs = np.swapaxes(vecs, 0, 1)
+            gram = np.matmul(vecs.conj(), np.swapaxes(vecs, 1, 2))
+            evas, evecs = np.linalg.eigh(gram)
+            traces = np.real(np.trace(gram, axis1=1, axis2=2))
+            if np.any(evas[:, -1] < (1 - tol)*traces - 1e-14):
+                continue
+            # if gram = V^* V^T, where the rows of V are the states of the
+            # group, and gram w = lambda w, then u = V^T w is an eigenvector
+            # of rho = V^T V^* with eigenvalue lambda = <u|u>
+            u = np.matmul(evecs[:, np.newaxis, :, -1], vecs)
+            self.branch_arr[brs[0]] = u.reshape(batch_shape +
+                                                (2,)*self.num_bits)
+            self.br_is_zero[brs[0]] = np.all(traces < 1e-8)
+            keep[brs[1:]] = False
+        if not np.all(keep):
+            self.keep_branches(np.flatnonzero(keep))
+
+    def get_TF_slicex_and_mp_arr(self, trols, mp_arr, tar_bit_pos=None):
+        """
+        This is an internal function used by the evolve_ methods for DIAG
+        and MP_Y lines. Say trols has k intrinsic (int kind) controls.
+        mp_arr is an array of shape (2^k,) + extra_shape whose first index
+        j labels a setting of the intrinsic controls: the control of kind m
+        has value (j >> m) & 1.
+
+        Returns a pair slicex, new_mp_arr. slicex is a list which fixes the
+        T/F controls of trols and is slice(None) elsewhere. new_mp_arr is
+        mp_arr rearranged into shape extra_shape + free_shape, where
+        free_shape has one axis for each bit left free by slicex (except
+        the target bit tar_bit_pos, if there is one), in increasing bit
+        position order. That axis has size 2 if the bit is an intrinsic
+        control, and size 1 otherwise, so that new_mp_arr can be broadcast
+        against arr[slicex] (or against one half of it, if there is a
+        target bit).
+
+        Parameters
+        ----------
+        trols : Controls
+        mp_arr : np.ndarray
+        tar_bit_pos : int | None
+
+        Returns
+        -------
+        list, np.ndarray
+
+        """
+        slicex = [slice(None)]*self.num_bits
+        mp_bpos = []
+        for bit, kind in zip(trols.bit_pos, trols.kinds):
+            # bool is subclass of int
+            # so isinstance(x, int) will be true if x is bool!
+            if isinstance(kind, bool):
+                slicex[bit] = int(kind)
+            else:
+                mp_bpos.append(bit)
+        mp_bpos.sort()
+        num_mp_trols = len(mp_bpos)
+        mp_kinds = [trols.bit_pos_to_kind[bit] for bit in mp_bpos]
+        assert sorted(mp_kinds) == list(range(num_mp_trols)), \
+            "kinds of intrinsic controls must be 0, 1, 2, ..."
+        assert mp_arr.shape[0] == (1 << num_mp_trols), \
+            "wrong number of angles"
+
+        # after reshape, axis j of mp_arr is the control of kind
+        # num_mp_trols - 1 - j. Transpose so that extra axes go first,
+        # and then the intrinsic controls in increasing bit position order
+        extra_shape = list(mp_arr.shape[1:])
+        num_extra = len(extra_shape)
+        mp_arr = mp_arr.reshape([2]*num_mp_trols + extra_shape)
+        mp_arr = mp_arr.transpose(
+            [num_mp_trols + e for e in range(num_extra)] +
+            [num_mp_trols - 1 - kind for kind in mp_kinds])
+        free_bits = [bit for bit in range(self.num_bits)
+                     if isinstance(slicex[bit], slice) and
+                     bit != tar_bit_pos]
+        mp_arr = mp_arr.reshape(extra_shape + [2 if bit in mp_bpos else 1
+                                               for bit in free_bits])
+        return slicex, mp_arr
+
+    def get_half_slicexs(self, tar_bit_pos, controls):
+        """
+        Returns a pair of tuples (slicex0, slicex1) which, when used as
+        indices of a state vector arr, give views of the two halves (
+        target bit =0 and target bit =1) of the slice of arr that satisfies
+        the controls. slicex = slice index.
+
+        Parameters
+        ----------
+        tar_bit_pos : int
+        controls : Controls
+
+        Returns
+        -------
+        tuple[tuple, tuple]
+
+        """
+        slicex = [slice(None)]*self.num_bits
+        for bit, kind in zip(controls.bit_pos, controls.kinds):
+            assert isinstance(kind, bool)
+            slicex[bit] = int(kind)
+        # Ellipsis at the beginning skips over the batch axes (if any) of
+        # arr, and it makes arr[slicex] a view even if all its qubit axes
+        # are fixed
+        slicex[tar_bit_pos] = 0
+        slicex0 = (Ellipsis,) + tuple(slicex)
+        slicex[tar_bit_pos] = 1
+        slicex1 = (Ellipsis,) + tuple(slicex)
+        return slicex0, slicex1
+
+    def get_chunk_slicexs(self, slicexs, touched_bits=()):
+        """
+        Returns a list of chunks. Each chunk is a tuple of slice indices,
+        one for each slice index in slicexs, obtained by restricting some
+        of the free axes of the slicexs (those with item slice(None)) to
+        either slice(0, 1) or slice(1, 2). The restricted axes are the
+        leading free axes (i.e., the ones with the largest memory
+        strides) of bits not in touched_bits, so the chunks of each slice
+        index partition it into non-overlapping pieces with the same number
+        of axes as the slice.
+
+        Parameters
+        ----------
+        slicexs : tuple[tuple]
+            slice indices, all of which start with Ellipsis and have the
+            same free axes
+        touched_bits : list[int] | tuple[int]
+            bits (e.g., intrinsic controls) whose axes must not be
+            restricted.
+
+        Returns
+        -------
+        list[tuple[tuple]]
+
+        """
+        free_bits = [bit for bit in range(self.num_bits)
+                     if bit not in touched_bits and
+                     all(slicex[1 + bit] == slice(None)
+                         for slicex in slicexs)]
+        # a few chunks per thread, for load balancing
+        num_chunk_bits = min(len(free_bits),
+                             int(np.ceil(np.log2(4*self.num_threads))))
+        chunk_bits = free_bits[:num_chunk_bits]
+        chunks = []
+        for vals in np.ndindex(*[2]*num_chunk_bits):
+            chunk = []
+            for slicex in slicexs:
+                slicex = list(slicex)
+                for bit, val in zip(chunk_bits, vals):
+                    slicex[1 + bit] = slice(val, val + 1)
+                chunk.append(tuple(slicex))
+            chunks.append(tuple(chunk))
+        return chunks
+
+    def run_in_chunks(self, kernel, arr, slicexs, touched_bits=()):
+        """
+        Calls kernel(arr, slicexs, scratch0, scratch1). If
+        self.num_threads > 1 and arr is big enough, this is done instead by
+        the threads of self.thread_pool, once for each of the chunks
+        returned by get_chunk_slicexs(). Each thread gets its own pair of
+        scratch arrays from self.scratch_queue.
+
+        Parameters
+        ----------
+        kernel : function
+        arr : np.ndarray
+        slicexs : tuple[tuple]
+        touched_bits : list[int] | tuple[int]
+
+        Returns
+        -------
+        None
+
+        """
+        # below this size, threads cost more than they save
+        if self.thread_pool is None or arr.size < (1 << 16):
+            kernel(arr, slicexs, self.scratch0, self.scratch1)
+            return
+
+        def run_chunk(chunk):
+            scratch0, scratch1 = self.scratch_queue.get()
+            try:
+                kernel(arr, chunk, scratch0, scratch1)
+            finally:
+                self.scratch_queue.put((scratch0, scratch1))
+
+        chunks = self.get_chunk_slicexs(slicexs, touched_bits)
+        # list() waits for all chunks and re-raises their exceptions
+        list(self.thread_pool.map(run_chunk, chunks))
+
+    @staticmethod
+    def diag_kernel(arr, slicex0, slicex1, fac0, fac1):
+        """
+        Multiplies in place the views arr[slicex0] and arr[slicex1] by the
+        scalars fac0 and fac1, respectively. This applies a diagonal gate
+        diag(fac0, fac1) without any temporary arrays. Factors equal to one
+        are skipped.
+
+        Parameters
+        ----------
+        arr : np.ndarray
+        slicex0 : tuple
+        slicex1 : tuple
+        fac0 : complex
+        fac1 : complex
+
+        Returns
+        -------
+        None
+
+        """
+        if fac0 != 1:
+            arr[slicex0] *= fac0
+        if fac1 != 1:
+            arr[slicex1] *= fac1
+
+    @staticmethod
+    def get_block_indices(shape, max_block_size):
+        """
+        Returns a list of index tuples for the leading axes of an array of
+        shape `shape`. If a is such an array, the views a[index] for index in
+        the list partition a into blocks of size <= max_block_size. Kernels
+        process big slices block by block so that their temporary storage
+        stays small.
+
+        All the items of an index tuple are ints, except the last one (
+        before the Ellipsis), which may be a slice that cuts its axis into
+        chunks, so that blocks are as big as allowed even when a leading
+        axis is long (e.g., a batch axis).
+
+        Parameters
+        ----------
+        shape : tuple[int]
+        max_block_size : int
+
+        Returns
+        -------
+        list[tuple[int|slice]]
+
+        """
+        num_lead_axes = 0
+        block_size = int(np.prod(shape))
+        while block_size > max_block_size and num_lead_axes < len(shape):
+            block_size //= shape[num_lead_axes]
+            num_lead_axes += 1
+        # Ellipsis at the end makes a[index] a view even if all its axes
+        # are fixed
+        if num_lead_axes == 0:
+            return [(Ellipsis,)]
+        ax_len = shape[num_lead_axes - 1]
+        chunk = max(1, max_block_size // block_size)
+        if chunk == 1:
+            chunks = list(range(ax_len))
+        else:
+            chunks = [slice(k, min(k + chunk, ax_len))
+                      for k in range(0, ax_len, chunk)]
+        return [index + (x, Ellipsis) for
+                index in np.ndindex(*shape[:num_lead_axes - 1])
+                for x in chunks]
+
+    @staticmethod
+    def swap_kernel(arr, slicex0, slicex1, scratch):
+        """
+        Exchanges in place the views arr[slicex0] and arr[slicex1], which
+        must have the same shape. This is done block by block, using as
+        temporary storage only the preallocated 1 dim array scratch (block
+        size = scratch.size). This applies SIGX to the target axis if
+        slicex0, slicex1 are the two halves of that axis, and it applies SWAP
+        if they are the (0, 1) and (1, 0) quarters of the two swapped axes.
+
+        Parameters
+        ----------
+        arr : np.ndarray
+        slicex0 : tuple
+        slicex1 : tuple
+        scratch : np.ndarray
+
+        Returns
+        -------
+        None
+
+        """
+        a0 = arr[slicex0]
+        a1 = arr[slicex1]
+        for index in SEO_simulator.get_block_indices(a0.shape, scratch.size):
+            b0 = a0[index]
+            b1 = a1[index]
+            tmp = scratch[:b0.size].reshape(b0.shape)
+            np.copyto(tmp, b0)
+            np.copyto(b0, b1)
+            np.copyto(b1, tmp)
+
+    @staticmethod
+    def one_bit_gate_kernel(arr, slicex0, slicex1, one_bit_gate,
+                            scratch0, scratch1):
+        """
+        Applies the 2 dim matrix one_bit_gate in place to the pair of views
+        (a0, a1) = (arr[slicex0], arr[slicex1]); i.e., a0 <- g00*a0 +
+        g01*a1, a1 <- g10*a0 + g11*a1. This is done block by block, using
+        as temporary storage only the preallocated 1 dim arrays scratch0
+        and scratch1, so no array as big as the slice is ever allocated.
+
+        one_bit_gate may also be a stack of 2 dim matrices, of shape (2,
+        2) + gate_shape, where gate_shape can be broadcast against the
+        trailing axes of a0. In that case, a different matrix acts on each
+        part of a0 and a1 (this is used for multiplexors).
+
+        Parameters
+        ----------
+        arr : np.ndarray
+        slicex0 : tuple
+        slicex1 : tuple
+        one_bit_gate : np.ndarray
+        scratch0 : np.ndarray
+        scratch1 : np.ndarray
+
+        Returns
+        -------
+        None
+
+        """
+        a0 = arr[slicex0]
+        a1 = arr[slicex1]
+        gate_shape = one_bit_gate.shape[2:]
+        # axis ax of a0 corresponds to axis ax - offset of gate_shape
+        offset = a0.ndim - len(gate_shape)
+        gate = one_bit_gate
+        for index in SEO_simulator.get_block_indices(a0.shape,
+                                                     scratch0.size):
+            b0 = a0[index]
+            b1 = a1[index]
+            if gate_shape:
+                # an int item of index removes its axis from b0, but a
+                # slice item keeps it
+                gate_index = tuple(
+                    (k if gate_shape[ax - offset] != 1 else
+                     slice(None) if isinstance(k, slice) else 0)
+                    for ax, k in enumerate(index[:-1]) if ax >= offset)
+                gate = one_bit_gate[(slice(None), slice(None)) +
+                                    gate_index + (Ellipsis,)]
+            g00, g01 = gate[0, 0], gate[0, 1]
+            g10, g11 = gate[1, 0], gate[1, 1]
+            s0 = scratch0[:b0.size].reshape(b0.shape)
+            s1 = scratch1[:b0.size].reshape(b0.shape)
+            np.multiply(b0, g00, out=s0)
+            np.multiply(b0, g10, out=s1)
+            np.multiply(b1, g01, out=b0)
+            b0 += s0
+            b1 *= g11
+            b1 += s1
+
     def evolve_by_controlled_bit_swap(self, bit1, bit2, controls):
         """
         Evolve each branch of cur_st_vec_dict by controlled bit swap iff the
@@ -205,47 +987,118 @@ class SEO_simulator(SEO_reader):
         for bit in [bit1, bit2]:
             assert -1 < bit < self.num_bits
             assert bit not in controls.bit_pos
- 
-        slicex = [slice(None)]*self.num_bits
-        num_controls = len(controls.bit_pos_to_kind)
-        for k in range(num_controls):
-            assert isinstance(controls.kinds[k], bool)
-            if controls.kinds[k]:  # it's True
-                slicex[controls.bit_pos[k]] = 1
-            else:  # it's False
-                slicex[controls.bit_pos[k]] = 0
-
-        # components that are fixed are no longer axes
-        scout = 0
-        for bit in range(self.num_bits):
-            if bit == bit1:
-                new1 = scout
-            if bit == bit2:
-                new2 = scout
-            if bit not in controls.bit_pos:
-                scout += 1
-
-        # perm = permutation that will use in transpose()
-        perm_len = scout
-        perm = list(range(perm_len))
-        perm[new1], perm[new2] = perm[new2], perm[new1]
 
-        # br = branch
-        for br_key in self.cur_st_vec_dict.keys():
-            if StateVec.is_zero(self.cur_st_vec_dict[br_key]):
-                continue
-            evolve_br = False
-            if not self.measured_bits or not self.mcase_trols:
-                evolve_br = True
-            else:
-                br_trols = self.get_controls_from_br_key(br_key)
-                if SEO_simulator.branch_is_part_of_mcase(
-                        br_trols, self.mcase_trols):
-                    evolve_br = True
-            if evolve_br:
-                arr = self.cur_st_vec_dict[br_key].arr[slicex]
-                self.cur_st_vec_dict[br_key].arr[slicex] = \
-                    arr.transpose(perm)
+        # only the amplitudes with (bit1, bit2) = (0, 1) or (1, 0) move.
+        # They are exchanged in place.
+        slicex0, slicex1 = self.get_half_slicexs(bit1, controls)
+        # item 0 of the slicex's is Ellipsis, so bit2 is at item 1 + bit2
+        slicex01 = list(slicex0)
+        slicex01[1 + bit2] = 1
+        slicex10 = list(slicex1)
+        slicex10[1 + bit2] = 0
+        slicex01 = tuple(slicex01)
+        slicex10 = tuple(slicex10)
+
+        def kernel(arr, slicexs, scratch0, scratch1):
+            SEO_simulator.swap_kernel(arr, slicexs[0], slicexs[1], scratch0)
+
+        for arr in self.get_evolving_arrs():
+            self.run_in_chunks(kernel, arr, (slicex01, slicex10))
+
+    def evolve_by_controlled_diag_unitary_gate(self, trols, rad_angles):
+        """
+        Evolve each branch of cur_st_vec_dict by a controlled diagonal
+        unitary (a DIAG line) iff the DIAG line is (1) outside of an IF_M
+        block, or (2) it is inside such a block, and it satisfies
+        self.mcase_trols.
+
+        The T/F controls of trols fix some axes of the state vector. The
+        k intrinsic (int kind) controls of trols label the axes on which the
+        d-unitary acts. The 2^k phases exp(1j*rad_angles) are arranged into
+        an array with a size 2 axis for each intrinsic control and a size 1
+        axis for every other free axis, and the slice of the state vector
+        that satisfies the T/F controls is multiplied in place by that
+        array, using numpy broadcasting. The phase exp(1j*rad_angles[j])
+        multiplies the components for which the intrinsic control of kind
+        m has value (j >> m) & 1.
+
+        Parameters
+        ----------
+        trols : Controls
+        rad_angles : list[float]
+
+        Returns
+        -------
+        None
+
+        """
+        phases = np.exp(1j*np.array(rad_angles)).astype(self.dtype)
+        slicex, phases = self.get_TF_slicex_and_mp_arr(trols, phases)
+        # Ellipsis at the beginning skips over the batch axes (if any) of
+        # arr, and it makes arr[slicex] a view even if all its qubit axes
+        # are fixed
+        slicex = (Ellipsis,) + tuple(slicex)
+        # the axes of the intrinsic controls can't be split into chunks
+        # because phases varies along them
+        mp_bits = [bit for bit, kind in zip(trols.bit_pos, trols.kinds)
+                   if not isinstance(kind, bool)]
+
+        def kernel(arr, slicexs, scratch0, scratch1):
+            arr[slicexs[0]] *= phases
+
+        for arr in self.get_evolving_arrs():
+            self.run_in_chunks(kernel, arr, (slicex,), mp_bits)
+
+    def evolve_by_controlled_multiplexor_gate(self,
+                tar_bit_pos, trols, rad_angles):
+        """
+        Evolve each branch of cur_st_vec_dict by a controlled multiplexor
+        (an MP_Y line) iff the MP_Y line is (1) outside of an IF_M block,
+        or (2) it is inside such a block, and it satisfies self.mcase_trols.
+
+        For each setting j of the k intrinsic (int kind) controls of trols,
+        the gate OneBitGates.rot_ax(rad_angles[j], 2) acts on the target
+        bit. The 2^k rotations are stacked into an array of shape (2, 2,
+        ...) whose trailing axes broadcast against the free axes of the
+        two halves of the target axis, and all of them are applied in a
+        single call to one_bit_gate_kernel().
+
+        Parameters
+        ----------
+        tar_bit_pos : int
+        trols : Controls
+        rad_angles : list[float]
+
+        Returns
+        -------
+        None
+
+        """
+        assert -1 < tar_bit_pos < self.num_bits
+        assert tar_bit_pos not in trols.bit_pos
+
+        cc = np.cos(rad_angles)
+        ss = np.sin(rad_angles)
+        # gates[j] = OneBitGates.rot_ax(rad_angles[j], 2)
+        gates = np.array([[cc, ss], [-ss, cc]], dtype=self.dtype)
+        gates = np.moveaxis(gates, 2, 0)
+        slicex, gates = self.get_TF_slicex_and_mp_arr(trols, gates,
+                                                      tar_bit_pos)
+        slicex[tar_bit_pos] = 0
+        slicex0 = (Ellipsis,) + tuple(slicex)
+        slicex[tar_bit_pos] = 1
+        slicex1 = (Ellipsis,) + tuple(slicex)
+        # the axes of the intrinsic controls can't be split into chunks
+        # because gates varies along them
+        mp_bits = [bit for bit, kind in zip(trols.bit_pos, trols.kinds)
+                   if not isinstance(kind, bool)]
+
+        def kernel(arr, slicexs, scratch0, scratch1):
+            SEO_simulator.one_bit_gate_kernel(arr, slicexs[0], slicexs[1],
+                gates, scratch0, scratch1)
+
+        for arr in self.get_evolving_arrs():
+            self.run_in_chunks(kernel, arr, (slicex0, slicex1), mp_bits)
 
     def evolve_by_controlled_one_bit_gate(self,
                 tar_bit_pos, controls, one_bit_gate):
@@ -256,6 +1109,11 @@ class SEO_simulator(SEO_reader):
         satisfies self.mcase_trols. Note one_bit_gate is entered as
         np.ndarray.
 
+        If one_bit_gate is diagonal, diag_kernel() is used instead of a
+        tensordot, so the two halves of the target axis are just multiplied
+        in place by scalar phases. If it is anti-diagonal, the two halves
+        are first exchanged in place by swap_kernel().
+
         Parameters
         ----------
         tar_bit_pos : int
@@ -269,59 +1127,31 @@ class SEO_simulator(SEO_reader):
 
         """
         assert -1 < tar_bit_pos < self.num_bits
-
-        vec_slicex = [slice(None)]*self.num_bits
-        num_controls = len(controls.bit_pos_to_kind)
-        for k in range(num_controls):
-            assert isinstance(controls.kinds[k], bool)
-            if controls.kinds[k]:  # it's True
-                vec_slicex[controls.bit_pos[k]] = 1
-            else:  # it's False
-                vec_slicex[controls.bit_pos[k]] = 0
-        vec_slicex = tuple(vec_slicex)
-
-        # components that are fixed are no longer axes
-        scout = 0
-        for bit in range(self.num_bits):
-            if bit == tar_bit_pos:
-                new_tar = scout
-            if bit not in controls.bit_pos:
-                scout += 1
-
-        perm_len = scout
-        # example tar = 2
-        # want to map [2, 0, 1, 3, 4] back to [0, 1, 2, 3, 4]
-
-        # this didn't work
-        # use perm 0>2, 1>0, 2>1, 3>3, 4>4
-        # perm = [new_tar] + list(range(new_tar))
-        # perm += list(range(new_tar+1, perm_len))
-
-        # use perm 2>0, 0>1, 1>2, 3>3, 4>4
-        perm = list(range(1, new_tar+1)) + [0]
-        perm += list(range(new_tar+1, perm_len))
-
-        # br = branch
-        assert not(self.mcase_trols and not self.measured_bits)
-        for br_key in self.cur_st_vec_dict.keys():
-            if StateVec.is_zero(self.cur_st_vec_dict[br_key]):
-                continue
-            evolve_br = False
-            if not self.measured_bits or not self.mcase_trols:
-                evolve_br = True
+        assert tar_bit_pos not in controls.bit_pos
+
+        # diagonal gates (PHAS, SIGZ, ROTZ, P0PH, P1PH) don't mix the
+        # two halves of the target axis
+        is_diag = (one_bit_gate[0, 1] == 0 and one_bit_gate[1, 0] == 0)
+        # anti-diagonal gates (SIGX, SIGY) just exchange the two halves of
+        # the target axis, and then multiply them by scalar phases
+        is_anti_diag = (one_bit_gate[0, 0] == 0 and one_bit_gate[1, 1] == 0)
+        slicex0, slicex1 = self.get_half_slicexs(tar_bit_pos, controls)
+
+        def kernel(arr, slicexs, scratch0, scratch1):
+            slicex0, slicex1 = slicexs
+            if is_diag:
+                SEO_simulator.diag_kernel(arr, slicex0, slicex1,
+                    one_bit_gate[0, 0], one_bit_gate[1, 1])
+            elif is_anti_diag:
+                SEO_simulator.swap_kernel(arr, slicex0, slicex1, scratch0)
+                SEO_simulator.diag_kernel(arr, slicex0, slicex1,
+                    one_bit_gate[0, 1], one_bit_gate[1, 0])
             else:
-                br_trols = self.get_controls_from_br_key(br_key)
-                if SEO_simulator.branch_is_part_of_mcase(
-                        br_trols, self.mcase_trols):
-                    evolve_br = True
-            if evolve_br:
-                arr = self.cur_st_vec_dict[br_key].arr[vec_slicex]
-                # Axes 1 of one_bit_gate and new_tar of vec are summed over.
-                #  Axis 0 of one_bit_gate goes to the front of all the axes
-                # of new vec. Use transpose() to realign axes.
-                arr = np.tensordot(one_bit_gate, arr, ([1], [new_tar]))
-                self.cur_st_vec_dict[br_key].arr[vec_slicex] = \
-                    np.transpose(arr, axes=perm)
+                SEO_simulator.one_bit_gate_kernel(arr, slicex0, slicex1,
+                    one_bit_gate, scratch0, scratch1)
+
+        for arr in self.get_evolving_arrs():
+            self.run_in_chunks(kernel, arr, (slicex0, slicex1))
 
     def finalize_next_line(self):
         """
@@ -344,8 +1174,8 @@ class SEO_simulator(SEO_reader):
 
     def use_DIAG(self, trols, rad_angles):
         """
-        This method should not be called. If called, it explains why it
-        shouldn't be called.
+        Overrides the parent class use_ function. Calls
+        evolve_by_controlled_diag_unitary_gate().
 
         Parameters
         ----------
@@ -354,13 +1184,10 @@ class SEO_simulator(SEO_reader):
 
         Returns
         -------
+        None
 
         """
-        assert False, \
-            "This class cannot simulate a circuit containing " \
-            "raw diagonal unitaries DIAG. Work around: use first our" \
-            "DiagUnitaryExpander class to expand " \
-            "DIAGs into simpler gates."
+        self.evolve_by_controlled_diag_unitary_gate(trols, rad_angles)
 
     def use_HAD2(self, tar_bit_pos, controls):
         """
@@ -378,12 +1205,14 @@ class SEO_simulator(SEO_reader):
         None
 
         """
-        gate = OneBitGates.had2()
+        gate = OneBitGates.had2(dtype=self.dtype)
         self.evolve_by_controlled_one_bit_gate(tar_bit_pos, controls, gate)
 
     def use_IF_M_beg(self, controls):
         """
-        Do nothing.
+        Overrides the parent class use_ function. Finds the branches
+        that satisfy controls, and that will be evolved by the lines inside
+        the IF_M block.
 
         Parameters
         ----------
@@ -394,11 +1223,12 @@ class SEO_simulator(SEO_reader):
         None
 
         """
-        pass
+        self.refresh_evolving_arrs()
 
     def use_IF_M_end(self):
         """
-        Do nothing.
+        Overrides the parent class use_ function. From now on, all
+        branches are evolved.
 
         Parameters
         ----------
@@ -408,7 +1238,7 @@ class SEO_simulator(SEO_reader):
         None
 
         """
-        pass
+        self.refresh_evolving_arrs()
 
     def use_MEAS(self, tar_bit_pos, kind):
         """
@@ -418,10 +1248,13 @@ class SEO_simulator(SEO_reader):
         |1><1|) to each branch of cur_st_vec_dict.
 
         For kind 2 measurements, it first doubles the number of branches in
-        cur_st_vec_dict by adding a deep copy of each branch. Next,
+        cur_st_vec_dict by adding a copy of each branch. Next,
         it applies P_0 to half of the branches of the dict and P_1 to the
         other half.
 
+        In both cases, the projections are applied to all the branches at
+        once, as slices of self.branch_arr.
+
         Parameters
         ----------
         kind : int
@@ -432,63 +1265,188 @@ class SEO_simulator(SEO_reader):
         None
 
         """
-        # slicex = slice index
-        slicex = [slice(None)]*self.num_bits
+        # slicex = slice index. Ellipsis at the beginning skips over the
+        # branch and batch axes of self.branch_arr
+        slicex = [Ellipsis] + [slice(None)]*self.num_bits
+        tar_item = 1 + tar_bit_pos
         # br = branch
         if kind in [0, 1]:
             b = 1 if kind == 0 else 0
-            for br_key in self.cur_st_vec_dict:
-                st_vec = self.cur_st_vec_dict[br_key]
-                if not StateVec.is_zero(st_vec):
-                    slicex[tar_bit_pos] = b
-                    # set projection |b=0><b=0| to zero for kind=1
-                    st_vec.arr[tuple(slicex)] = 0
-                    tot_prob = st_vec.get_total_prob()
-                    if tot_prob < 1e-8:
-                        # this didn't work
-                        # st_vec.arr = None
-                        self.cur_st_vec_dict[br_key].arr = None
-                    slicex[tar_bit_pos] = slice(None)
-                # self.cur_st_vec_dict[br_key].arr = st_vec.arr
+            # set projection |b=0><b=0| to zero for kind=1
+            slicex[tar_item] = b
+            self.branch_arr[tuple(slicex)] = 0
+        elif kind == 2 and self.trajectory:
+            self.sample_meas_outcome(tar_bit_pos)
         elif kind == 2:
-            old_st_vec_dict = cp.deepcopy(self.cur_st_vec_dict)
-            self.cur_st_vec_dict = {}
-            for br_key in old_st_vec_dict.keys():
-                new_T_key = self.get_br_key_with_new_link(br_key,
-                        tar_bit_pos, True)
-                new_F_key = self.get_br_key_with_new_link(br_key,
-                        tar_bit_pos, False)
-                # print('new keys=', new_F_key,',', new_T_key)
-
-                self.cur_st_vec_dict[new_T_key] = \
-                    cp.deepcopy(old_st_vec_dict[br_key])
-                self.cur_st_vec_dict[new_F_key] = \
-                    cp.deepcopy(old_st_vec_dict[br_key])
-
-                for b, new_key in enumerate([new_T_key, new_F_key]):
-                    # set projection |b=0><b=0| to zero for T key
-                    st_vec = self.cur_st_vec_dict[new_key]
-                    # print("b, newkey=" + str(b) + "," + new_key)
-                    if not StateVec.is_zero(st_vec):
-                        slicex[tar_bit_pos] = b
-                        st_vec.arr[tuple(slicex)] = 0
-                        tot_prob = st_vec.get_total_prob()
-                        # print('tot_prob=', tot_prob)
-                        if tot_prob < 1e-8:
-                            # this didn't work
-                            # st_vec.arr = None
-                            self.cur_st_vec_dict[new_key].arr = None
-                        slicex[tar_bit_pos] = slice(None)
-                    # print(st_vec)
-
-            # print(self.cur_st_vec_dict)
+            # branch br becomes branches 2*br (T) and 2*br + 1 (F). The
+            # only new array is the new stack. Each of its halves is either
+            # copied straight from the same half of the old stack or set
+            # to zero.
+            old_arr = self.branch_arr
+            num_brs = 2*old_arr.shape[0]
+            self.branch_arr = np.empty((num_brs,) + old_arr.shape[1:],
+                                       dtype=old_arr.dtype)
+            for b in [0, 1]:
+                slicex[tar_item] = b
+                # T branches (the even ones) keep the b=1 half
+                self.branch_arr[0::2][tuple(slicex)] = \
+                    old_arr[tuple(slicex)] if b == 1 else 0
+                # F branches (the odd ones) keep the b=0 half
+                self.branch_arr[1::2][tuple(slicex)] = \
+                    old_arr[tuple(slicex)] if b == 0 else 0
+            del old_arr
+            self.br_is_zero = np.repeat(self.br_is_zero, 2)
+            self.br_outcome_masks = np.repeat(self.br_outcome_masks, 2)
+            self.br_outcome_masks[0::2] |= 1 << tar_bit_pos
+            self.br_meas_bits.append(tar_bit_pos)
         else:
             assert False, 'unsupported measurement kind'
 
+        # branches with (almost) zero probability become zero
+        num_brs = self.branch_arr.shape[0]
+        probs = self.get_br_probs()
+        new_zeros = np.all(probs.reshape(num_brs, -1) < 1e-8, axis=1)
+        self.branch_arr[new_zeros & ~self.br_is_zero] = 0
+        self.br_is_zero |= new_zeros
+        if self.prune_zero_brs:
+            self.prune_zero_branches()
+        if self.merge_brs:
+            self.merge_branches()
+        self.refresh_st_vec_dict()
+        self.refresh_evolving_arrs()
+
+    def sample_meas_outcome(self, tar_bit_pos):
+        """
+        Used in trajectory mode instead of the branch doubling of a kind 2
+        measurement. Samples the outcome of measuring qubit tar_bit_pos in
+        the only branch, projects the branch onto that outcome, and
+        rescales it so that its total probability doesn't change. The
+        outcome is stored in self.br_outcome_masks, so it becomes part of
+        the branch key, and it decides which IF_M blocks are applied.
+
+        Parameters
+        ----------
+        tar_bit_pos : int
+
+        Returns
+        -------
+        None
+
+        """
+        assert self.branch_arr.shape[0] == 1
+        arr = self.branch_arr[0]
+        slicex = [slice(None)]*self.num_bits
+        slicex[tar_bit_pos] = 1
+        half1 = arr[tuple(slicex)]
+        prob1 = np.real(np.vdot(half1, half1))
+        tot_prob = np.real(np.vdot(arr, arr))
+        is_T = False
+        if tot_prob > 0:
+            is_T = self.rng.random() < prob1/tot_prob
+        # zero the half that wasn't measured
+        slicex[tar_bit_pos] = 0 if is_T else 1
+        arr[tuple(slicex)] = 0
+        prob = prob1 if is_T else tot_prob - prob1
+        if prob > 0:
+            arr *= np.sqrt(tot_prob/prob)
+        if is_T:
+            self.br_outcome_masks[0] |= 1 << tar_bit_pos
+        self.br_meas_bits.append(tar_bit_pos)
+
+    @staticmethod
+    def run_trajectories(file_prefix, num_bits, num_trajs,
+                         init_st_vec=None, num_workers=1, rand_seed=None):
+        """
+        Runs num_trajs simulations in trajectory mode of the circuit in the
+        English file, and returns a histogram of their outcomes, i.e., a
+        dictionary mapping each branch key that occurred to the number of
+        trajectories that ended with it. More precisely, each trajectory
+        is counted with a weight equal to the total probability of its
+        final state, which is 1 unless the circuit has kind 0 or 1
+        measurements. This way, hist[br_key]/sum(hist.values()) estimates
+        the probability of branch br_key found by a simulation that
+        enumerates all branches. The English file is compiled only once,
+        and the compiled circuit is sent to the num_workers processes
+        among which the trajectories are split evenly. Each process holds
+        only one state vector at a time, no matter how many measurements
+        the circuit has.
+
+        Parameters
+        ----------
+        file_prefix : str
+        num_bits : int
+        num_trajs : int
+        init_st_vec : StateVec
+            initial state of every trajectory. The ground state if None.
+        num_workers : int
+            number of processes that run trajectories in parallel. If 1,
+            no processes are spawned.
+        rand_seed : int | None
+
+        Returns
+        -------
+        dict[str, float]
+
+        """
+        assert num_workers >= 1
+        num_chunks = min(num_workers, num_trajs)
+        seeds = np.random.SeedSequence(rand_seed).spawn(num_chunks)
+        init_arr = None if StateVec.is_zero(init_st_vec) else \
+            init_st_vec.arr
+        ckt = CompiledEngFile(file_prefix, num_bits)
+        args_list = [(ckt,
+                      num_trajs//num_chunks + (k < num_trajs % num_chunks),
+                      init_arr, seeds[k]) for k in range(num_chunks)]
+        if num_workers == 1:
+            hists = list(map(SEO_simulator.run_traj_chunk, args_list))
+        else:
+            from multiprocessing import Pool
+            with Pool(num_workers) as pool:
+                hists = pool.map(SEO_simulator.run_traj_chunk, args_list)
+        hist = {}
+        for h in hists:
+            for br_key, count in h.items():
+                hist[br_key] = hist.get(br_key, 0) + count
+        return hist
+
+    @staticmethod
+    def run_traj_chunk(args):
+        """
+        Runs a chunk of the trajectories of run_trajectories(), and
+        returns their histogram. This function is run by the workers of
+        the process pool, so its arguments are packed into a single tuple.
+
+        Parameters
+        ----------
+        args : tuple[CompiledEngFile, int, np.ndarray|None,
+                np.random.SeedSequence]
+            (ckt, num_trajs, init_arr, seed)
+
+        Returns
+        -------
+        dict[str, float]
+
+        """
+        ckt, num_trajs, init_arr, seed = args
+        file_prefix, num_bits = ckt.file_prefix, ckt.num_bits
+        rng = np.random.default_rng(seed)
+        hist = {}
+        for k in range(num_trajs):
+            init_st_vec = None
+            if init_arr is not None:
+                init_st_vec = StateVec(num_bits, init_arr.copy())
+            sim = SEO_simulator(file_prefix, num_bits,
+                                init_st_vec=init_st_vec, trajectory=True,
+                                rand_seed=rng, ckt=ckt)
+            br_key = sim.get_br_key(0)
+            hist[br_key] = hist.get(br_key, 0) + \
+                float(sim.get_br_probs()[0])
+        return hist
+
     def use_MP_Y(self, tar_bit_pos, trols, rad_angles):
         """
-        This method should not be called. If called, it explains why it
-        shouldn't be called.
+        Overrides the parent class use_ function. Calls
+        evolve_by_controlled_multiplexor_gate().
 
         Parameters
         ----------
@@ -498,13 +1456,11 @@ class SEO_simulator(SEO_reader):
 
         Returns
         -------
+        None
 
         """
-        assert False, \
-            "This class cannot simulate a circuit containing " \
-            "raw multiplexors MP_Y. Work around: use first our" \
-            "MultiplexorExpander class to expand " \
-            "MP_Ys into simpler gates."
+        self.evolve_by_controlled_multiplexor_gate(
+            tar_bit_pos, trols, rad_angles)
 
     def use_NOTA(self, bla_str):
         """
@@ -537,7 +1493,7 @@ class SEO_simulator(SEO_reader):
         None
 
         """
-        gate = OneBitGates.phase_fac(angle_rads)
+        gate = OneBitGates.phase_fac(angle_rads, self.dtype)
         self.evolve_by_controlled_one_bit_gate(tar_bit_pos, controls, gate)
 
     def use_P_PH(self, projection_bit,
@@ -564,7 +1520,7 @@ class SEO_simulator(SEO_reader):
             0: OneBitGates.P_0_phase_fac,
             1: OneBitGates.P_1_phase_fac
         }
-        gate = fun[projection_bit](angle_rads)
+        gate = fun[projection_bit](angle_rads, self.dtype)
         self.evolve_by_controlled_one_bit_gate(tar_bit_pos, controls, gate)
 
     def use_PRINT(self, style, line_num):
@@ -621,7 +1577,7 @@ class SEO_simulator(SEO_reader):
         None
 
         """
-        gate = OneBitGates.rot_ax(angle_rads, axis)
+        gate = OneBitGates.rot_ax(angle_rads, axis, self.dtype)
         self.evolve_by_controlled_one_bit_gate(tar_bit_pos, controls, gate)
 
     def use_ROTN(self, angle_x_rads, angle_y_rads, angle_z_rads,
@@ -644,7 +1600,8 @@ class SEO_simulator(SEO_reader):
         None
 
         """
-        gate = OneBitGates.rot(angle_x_rads, angle_y_rads, angle_z_rads)
+        gate = OneBitGates.rot(angle_x_rads, angle_y_rads, angle_z_rads,
+                               self.dtype)
         self.evolve_by_controlled_one_bit_gate(tar_bit_pos, controls, gate)
 
     def use_SIG(self, axis, tar_bit_pos, controls):
@@ -669,7 +1626,7 @@ class SEO_simulator(SEO_reader):
             2: OneBitGates.sigy,
             3: OneBitGates.sigz
         }
-        gate = fun[axis]()
+        gate = fun[axis](dtype=self.dtype)
         self.evolve_by_controlled_one_bit_gate(tar_bit_pos, controls, gate)
 
     def use_SWAP(self, bit1, bit2, controls):
@@ -709,4 +1666,24 @@ if __name__ == "__main__":
             # branches
             sim = SEO_simulator('io_folder/sim_test3', 4, verbose=True)
 
+        if test in [0, 4]:
+            # test batch of initial states. The 16 basis states of 4 qubits
+            # are evolved in a single pass
+            init_st_vec = StateVec.get_standard_basis_batch_st_vec(4)
+            sim = SEO_simulator('io_folder/sim_test2', 4,
+                                init_st_vec=init_st_vec)
+            fin_st_vec = sim.cur_st_vec_dict['pure']
+            print('batch shape=', fin_st_vec.get_batch_shape())
+            # row j of this is column j of the unitary matrix of the circuit
+            print(fin_st_vec.get_traditional_st_vec().shape)
+
+        if test in [0, 5]:
+            # test trajectory mode. Each trajectory samples the outcomes of
+            # the kind 2 measurements instead of enumerating all branches.
+            # In branch 1T0T, qubit 2 always ends up being measured False
+            hist = SEO_simulator.run_trajectories('io_folder/traj_test', 4,
+                                                  num_trajs=1000,
+                                                  rand_seed=1234)
+            print('trajectory histogram=', hist)
+
     main()
@@ -0,0 +1,440 @@
+from SEO_simulator import *
+import pprint as pp
+
+
+class SEO_simulator_dm(SEO_simulator):
+    """
+    This class simulates the evolution of the density matrix rho of
+    num_bits qubits. Whereas the parent class SEO_simulator stores a mixed
+    state as a list of branches (state vectors) that doubles with each kind
+    2 measurement, this class evolves the 2^num_bits x 2^num_bits density
+    matrix directly, so its cost doesn't depend on the number of
+    measurements. It is a better choice than its parent for small
+    registers with lots of measurements and IF_M blocks.
+
+    The density matrix is stored in self.den_arr, a complex array of shape
+    [2]*num_bits + [2]*num_bits (plus the leading classical axes described
+    below). Axis bit (resp., num_bits + bit) of den_arr labels the column
+    (resp., row) index of rho at qubit bit, so den_arr[c, r] = rho[r, c].
+    Hence, if we think of the column axes as batch axes (see class
+    StateVec), den_arr is a batch of state vectors (the columns of rho),
+    and the gate kernels of the parent class, which act on the trailing
+    num_bits axes, multiply rho on the left by a gate U. The gate is then
+    applied a second time, with its entries complex conjugated, to the
+    transposed view of den_arr whose trailing axes are the column axes.
+    This multiplies rho on the right by U^dagger. Hence, each line U of
+    the English file replaces rho by U rho U^dagger.
+
+    A kind 0 (resp., 1) measurement MEAS replaces rho by P rho P, where P =
+    P_0 (resp., P_1) is a projector at the target bit. A kind 2 measurement
+    dephases rho, i.e., it replaces rho by P_0 rho P_0 + P_1 rho P_1, by
+    setting to zero the entries of rho whose row and column disagree at
+    the target bit.
+
+    If the outcome of a kind 2 measurement of qubit bit is needed by an
+    IF_M( line that may still be read (see
+    SEO_simulator.get_live_meas_bits()), the outcome is also kept in a
+    classical axis, i.e., a new leading axis m of den_arr, such that
+    den_arr[m] stores P_m rho P_m, where P_m is the projector at qubit
+    bit. So rho becomes sum_m |m><m| (x) P_m rho P_m, and the classical
+    axis remembers the outcome m even if later gates change the qubit.
+    The lines inside an IF_M block are applied only to the slice of
+    den_arr whose classical axes agree with the controls of the IF_M(
+    line, exactly like SEO_simulator applies them only to the branches
+    that agree with them. Once no IF_M( line that may still be read
+    refers to a classical axis, the axis is summed over, which gives back
+    the density matrix of the qubits.
+
+    Attributes
+    ----------
+    cl_bits : list[int]
+        cl_bits[j] is the qubit whose measured outcome is stored in the
+        classical axis j of den_arr
+    col_arr : np.ndarray
+        view of den_arr with the classical axes first, then the row axes,
+        and the column axes last
+    den_arr : np.ndarray
+        the density matrix, stored as explained in the class docstring,
+        with shape [2]*len(cl_bits) + [2]*num_bits + [2]*num_bits
+
+    """
+
+    def __init__(self, file_prefix, num_bits, init_st_vec=None,
+                 dtype=np.complex128, num_threads=1, **kwargs):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        file_prefix : str
+        num_bits : int
+        init_st_vec : StateVec
+            the initial density matrix is |init_st_vec><init_st_vec|. If
+            None, the ground state is used. Batches are not supported.
+        dtype : type
+            dtype of the ground state used when init_st_vec is None.
+        num_threads : int
+            number of threads that apply each gate in parallel.
+
+        Returns
+        -------
+
+        """
+        if StateVec.is_zero(init_st_vec):
+            init_st_vec = StateVec.get_ground_st_vec(num_bits, dtype)
+        assert init_st_vec.arr.ndim == num_bits, \
+            "batches of states are not supported"
+        arr = init_st_vec.arr
+        # den_arr[c, r] = rho[r, c] = arr[r]*conj(arr[c])
+        self.den_arr = np.multiply.outer(np.conj(arr), arr)
+        self.cl_bits = []
+        self.col_arr = None
+        self.refresh_col_arr(num_bits)
+        # the parent sees den_arr as a batch of state vectors whose batch
+        # axes are the column axes
+        SEO_simulator.__init__(self, file_prefix, num_bits,
+                               init_st_vec=StateVec(num_bits, self.den_arr),
+                               num_threads=num_threads, **kwargs)
+
+    def get_den_mat(self):
+        """
+        Returns the density matrix as a 2 dim array of shape (2^num_bits,
+        2^num_bits), indexed in the ZL convention, and normalized so that
+        its trace is 1, like the one returned by StateVec.get_den_mat().
+
+        Returns
+        -------
+        np.ndarray
+
+        """
+        num_bits = self.num_bits
+        den_arr = np.sum(self.den_arr, axis=tuple(range(len(self.cl_bits))))
+        # rows first, and within rows and columns, bit num_bits - 1 first
+        perm = list(reversed(range(num_bits, 2*num_bits))) + \
+            list(reversed(range(num_bits)))
+        dim = 1 << num_bits
+        den_mat = np.transpose(den_arr, perm).reshape((dim, dim))
+        tr = np.trace(den_mat)
+        assert abs(tr) > 1e-6
+        return den_mat/tr
+
+    def refresh_col_arr(self, num_bits):
+        """
+        Computes self.col_arr. Must be called every time self.den_arr is
+        replaced by a new array. Also makes self.branch_arr and the only
+        item of self.cur_st_vec_dict views of self.den_arr, like the
+        constructor of the parent class does.
+
+        Parameters
+        ----------
+        num_bits : int
+
+        Returns
+        -------
+        None
+
+        """
+        num_cl = len(self.cl_bits)
+        perm = list(range(num_cl)) + \
+            list(range(num_cl + num_bits, num_cl + 2*num_bits)) + \
+            list(range(num_cl, num_cl + num_bits))
+        self.col_arr = self.den_arr.transpose(perm)
+        self.branch_arr = self.den_arr[np.newaxis]
+        self.cur_st_vec_dict = {"pure": StateVec(num_bits, self.den_arr)}
+
+    def get_mcase_slicex(self):
+        """
+        Returns a slice index for the classical axes of self.den_arr and
+        self.col_arr. Outside of an IF_M block, it selects all of them.
+        Inside one, it selects the outcomes that agree with
+        self.mcase_trols.
+
+        Returns
+        -------
+        tuple
+
+        """
+        slicex = [slice(None)]*len(self.cl_bits)
+        if self.mcase_trols:
+            for bit, kind in self.mcase_trols.bit_pos_to_kind.items():
+                slicex[self.cl_bits.index(bit)] = int(kind)
+        return tuple(slicex)
+
+    def evolve_rows_and_cols(self, evolve_fun, row_args, col_args):
+        """
+        Calls evolve_fun(*row_args) with self.evolving_arrs = [
+        self.den_arr], and then evolve_fun(*col_args) with
+        self.evolving_arrs = [self.col_arr]. evolve_fun is an evolve_
+        method of the parent class, and col_args are row_args with the
+        gates complex conjugated. Inside an IF_M block, only the slices of
+        self.den_arr and self.col_arr given by get_mcase_slicex() are
+        evolved.
+
+        Parameters
+        ----------
+        evolve_fun : function
+        row_args : tuple
+        col_args : tuple
+
+        Returns
+        -------
+        None
+
+        """
+        slicex = self.get_mcase_slicex()
+        self.evolving_arrs = [self.den_arr[slicex]]
+        evolve_fun(self, *row_args)
+        self.evolving_arrs = [self.col_arr[slicex]]
+        evolve_fun(self, *col_args)
+        self.evolving_arrs = [self.den_arr]
+
+    def evolve_by_controlled_bit_swap(self, bit1, bit2, controls):
+        """
+        Overrides the parent class function. Replaces rho by U rho
+        U^dagger, where U is a controlled bit swap.
+
+        Parameters
+        ----------
+        bit1 : int
+        bit2 : int
+        controls : Controls
+
+        Returns
+        -------
+        None
+
+        """
+        args = (bit1, bit2, controls)
+        self.evolve_rows_and_cols(
+            SEO_simulator.evolve_by_controlled_bit_swap, args, args)
+
+    def evolve_by_controlled_diag_unitary_gate(self, trols, rad_angles):
+        """
+        Overrides the parent class function. Replaces rho by U rho
+        U^dagger, where U is a controlled diagonal unitary.
+
+        Parameters
+        ----------
+        trols : Controls
+        rad_angles : list[float]
+
+        Returns
+        -------
+        None
+
+        """
+        self.evolve_rows_and_cols(
+            SEO_simulator.evolve_by_controlled_diag_unitary_gate,
+            (trols, rad_angles), (trols, [-x for x in rad_angles]))
+
+    def evolve_by_controlled_multiplexor_gate(self,
+                tar_bit_pos, trols, rad_angles):
+        """
+        Overrides the parent class function. Replaces rho by U rho
+        U^dagger, where U is a controlled multiplexor. Its gates are real,
+        so they are not conjugated for the columns.
+
+        Parameters
+        ----------
+        tar_bit_pos : int
+        trols : Controls
+        rad_angles : list[float]
+
+        Returns
+        -------
+        None
+
+        """
+        args = (tar_bit_pos, trols, rad_angles)
+        self.evolve_rows_and_cols(
+            SEO_simulator.evolve_by_controlled_multiplexor_gate, args, args)
+
+    def evolve_by_controlled_one_bit_gate(self,
+                tar_bit_pos, controls, one_bit_gate):
+        """
+        Overrides the parent class function. Replaces rho by U rho
+        U^dagger, where U is a controlled one bit gate.
+
+        Parameters
+        ----------
+        tar_bit_pos : int
+        controls : Controls
+        one_bit_gate : np.ndarray
+
+        Returns
+        -------
+        None
+
+        """
+        self.evolve_rows_and_cols(
+            SEO_simulator.evolve_by_controlled_one_bit_gate,
+            (tar_bit_pos, controls, one_bit_gate),
+            (tar_bit_pos, controls, np.conj(one_bit_gate)))
+
+    def use_IF_M_beg(self, controls):
+        """
+        Overrides the parent class use_ function. Does nothing, because
+        get_mcase_slicex() reads self.mcase_trols each time a line inside
+        the IF_M block is applied.
+
+        Parameters
+        ----------
+        controls : Controls
+
+        Returns
+        -------
+        None
+
+        """
+        pass
+
+    def use_IF_M_end(self):
+        """
+        Overrides the parent class use_ function. Sums over the classical
+        axes that no IF_M( line that may still be read refers to.
+
+        Returns
+        -------
+        None
+
+        """
+        self.drop_dead_cl_bits()
+
+    def drop_dead_cl_bits(self):
+        """
+        Sums self.den_arr over the classical axes of the qubits in
+        self.cl_bits that are not in get_live_meas_bits(), and removes
+        those qubits from self.cl_bits.
+
+        Returns
+        -------
+        None
+
+        """
+        live_bits = self.get_live_meas_bits()
+        dead_axes = tuple(j for j, bit in enumerate(self.cl_bits)
+                          if bit not in live_bits)
+        if not dead_axes:
+            return
+        self.den_arr = np.sum(self.den_arr, axis=dead_axes)
+        self.cl_bits = [bit for bit in self.cl_bits if bit in live_bits]
+        self.refresh_col_arr(self.num_bits)
+
+    def use_MEAS(self, tar_bit_pos, kind):
+        """
+        Overrides the parent class use_ function. For kind 0 (resp., 1),
+        replaces rho by P_0 rho P_0 (resp., P_1 rho P_1). For kind 2,
+        replaces rho by P_0 rho P_0 + P_1 rho P_1, and, if some IF_M( line
+        that may still be read refers to qubit tar_bit_pos, keeps the two
+        terms apart in a new classical axis. This applies to the whole
+        density matrix, even inside an IF_M block, like in SEO_simulator.
+
+        Parameters
+        ----------
+        tar_bit_pos : int
+        kind : int
+
+        Returns
+        -------
+        None
+
+        """
+        num_bits = self.num_bits
+        # slicex = slice index. Ellipsis at the beginning skips over the
+        # classical axes
+        col_item = 1 + tar_bit_pos
+        row_item = 1 + num_bits + tar_bit_pos
+        slicex = [Ellipsis] + [slice(None)]*(2*num_bits)
+        if kind in [0, 1]:
+            b = 1 if kind == 0 else 0
+            slicex[row_item] = b
+            self.den_arr[tuple(slicex)] = 0
+            slicex[row_item] = slice(None)
+            slicex[col_item] = b
+            self.den_arr[tuple(slicex)] = 0
+        elif kind == 2:
+            self.br_meas_bits.append(tar_bit_pos)
+            if tar_bit_pos in self.get_live_meas_bits():
+                # new_arr[m] = P_m rho P_m
+                new_arr = np.zeros((2,) + self.den_arr.shape,
+                                   dtype=self.den_arr.dtype)
+                for m in [0, 1]:
+                    slicex[row_item] = m
+                    slicex[col_item] = m
+                    new_arr[m][tuple(slicex)] = \
+                        self.den_arr[tuple(slicex)]
+                self.den_arr = new_arr
+                self.cl_bits = [tar_bit_pos] + self.cl_bits
+                self.refresh_col_arr(num_bits)
+            else:
+                for b in [0, 1]:
+                    slicex[row_item] = b
+                    slicex[col_item] = 1 - b
+                    self.den_arr[tuple(slicex)] = 0
+        else:
+            assert False, 'unsupported measurement kind'
+
+    def use_PRINT(self, style, line_num):
+        """
+        Overrides the parent class use_ function. Prints to screen the
+        probabilities of each qubit, and, if style is "ALL", the density
+        matrix too.
+
+        Parameters
+        ----------
+        style : str
+            style in which to print
+        line_num : int
+            line number in eng & pic files in which PRINT command appears
+
+        Returns
+        -------
+        None
+
+        """
+        assert style in ["V1", "ALL"], "unsupported PRINT style"
+        print("\n*************************beginning PRINT output")
+        print("PRINT line number=" + str(line_num))
+        den_mat = self.get_den_mat()
+        if style == "ALL":
+            print("density matrix:")
+            print(den_mat)
+        pd = StateVec.get_den_mat_pd(den_mat)
+        print("dictionary with key=qubit, value=(Prob(0), Prob(1))")
+        bit_probs = StateVec.get_bit_probs(self.num_bits, pd)
+        pp.pprint(dict(enumerate(bit_probs)))
+        print("****************************ending PRINT output")
+
+if __name__ == "__main__":
+    from SEO_writer import *
+
+    def main():
+        # test MEAS dephasing. The density matrix should agree with the
+        # one obtained from the branches of SEO_simulator
+        file_prefix = 'io_folder/sim_test3'
+        num_bits = 4
+        sim = SEO_simulator(file_prefix, num_bits)
+        den_mat = StateVec.get_den_mat(num_bits, sim.cur_st_vec_dict)
+        sim_dm = SEO_simulator_dm(file_prefix, num_bits)
+        print('same density matrix=',
+              np.allclose(den_mat, sim_dm.get_den_mat()))
+        print('entropy=', StateVec.get_entropy(sim_dm.get_den_mat()))
+
+        # feed-forward reset: measure qubit 0 and flip it if it is 1.
+        # The gate inside the IF_M block changes the qubit that controls
+        # the block. The final state is |00>
+        file_prefix = 'io_folder/dm_reset_test'
+        num_bits = 2
+        wr = SEO_writer(file_prefix, CktEmbedder(num_bits, num_bits))
+        wr.write_one_bit_gate(0, OneBitGates.had2)
+        wr.write_MEAS(0, kind=2)
+        trols = Controls(num_bits)
+        trols.set_control(0, True)
+        trols.refresh_lists()
+        wr.write_IF_M_beg(trols)
+        wr.write_one_bit_gate(0, OneBitGates.sigx)
+        wr.write_IF_M_end()
+        wr.close_files()
+        sim_dm = SEO_simulator_dm(file_prefix, num_bits)
+        print('reset density matrix=\n', sim_dm.get_den_mat())
+    main()
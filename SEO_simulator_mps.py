@@ -0,0 +1,786 @@
+from SEO_simulator import *
+import pprint as pp
+
+
+class SEO_simulator_mps(SEO_reader):
+    """
+    This class simulates the evolution of a state of num_bits qubits
+    stored as a matrix product state (MPS). The state is a chain of
+    num_bits tensors, one per qubit, and the memory that it takes grows
+    with the entanglement of the state rather than exponentially with
+    num_bits. Circuits whose gates act on nearby qubits of a 1 dim chain,
+    like many of those embedded with CktEmbedder, keep the entanglement
+    low, and can be simulated with 60 or more qubits.
+
+    The tensor of qubit bit is self.tensors[bit], of shape (chi_left, 2,
+    chi_right), where chi_left and chi_right are the bond dimensions of
+    the bonds to its left and right neighbors (1 at the ends of the
+    chain). The amplitude of the state with qubit values (v_0, v_1, ...)
+    is the product of the matrices tensors[0][:, v_0, :] tensors[1][:,
+    v_1, :] ...
+
+    A line of the English file acts on a set of qubits (its target and its
+    controls). If they are not neighbors in the chain, they are brought
+    together by a swap network, i.e., by a sequence of SWAPs of
+    neighboring qubits, which is undone after the line is applied. The
+    tensors of the neighboring qubits are contracted into a single
+    tensor, the (dense) matrix of the line is applied to it, and the
+    result is split back into one tensor per qubit by SVDs.
+
+    After each SVD, the smallest singular values are discarded, as long as
+    the sum of their squares (the discarded weight), divided by the sum of
+    the squares of all the singular values, is <= self.trunc_threshold,
+    and also so that at most self.max_bond_dim singular values are kept.
+    The state is kept in mixed canonical form (all tensors to the left
+    (resp., right) of the orthogonality center are left (resp., right)
+    isometries), so that these truncations are optimal. The sum of the
+    relative discarded weights is accumulated in self.trunc_err. It is an
+    estimate of the infidelity of the final state.
+
+    The initial state is the ground state |0>|0>...|0>. Measurements and
+    IF_M blocks are handled as by SEO_simulator_stab: the outcome of a
+    kind 2 measurement is sampled, and the state is projected onto it and
+    rescaled so that its total probability doesn't change. A kind 0 or 1
+    measurement projects the state without rescaling it.
+
+    Attributes
+    ----------
+    br_meas_bits : list[int]
+        list of the qubits measured so far by kind 2 measurements, in the
+        order in which they were measured.
+    center : int
+        position of the orthogonality center of the MPS
+    max_bond_dim : int | None
+        maximum bond dimension. None means no maximum.
+    mcase_is_true : bool
+        True iff the lines being read are not inside an IF_M block, or if
+        they are inside one whose controls agree with meas_outcomes.
+    meas_outcomes : dict[int, bool]
+        dictionary mapping each qubit measured by a kind 2 measurement to
+        its sampled outcome.
+    rng : np.random.Generator
+    tensors : list[np.ndarray]
+        the tensors of the MPS. See class docstring.
+    trunc_err : float
+        sum of the relative discarded weights of all the truncations so far
+    trunc_threshold : float
+        maximum relative discarded weight of a truncation
+
+    """
+
+    def __init__(self, file_prefix, num_bits, max_bond_dim=None,
+                 trunc_threshold=1e-12, rand_seed=None, **kwargs):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        file_prefix : str
+        num_bits : int
+        max_bond_dim : int | None
+        trunc_threshold : float
+        rand_seed : int | np.random.SeedSequence | None
+            seed of the random number generator used to sample the outcomes
+            of kind 2 measurements.
+
+        Returns
+        -------
+
+        """
+        self.tensors = []
+        for bit in range(num_bits):
+            tensor = np.zeros((1, 2, 1), dtype=np.complex128)
+            tensor[0, 0, 0] = 1
+            self.tensors.append(tensor)
+        self.center = 0
+        self.max_bond_dim = max_bond_dim
+        self.trunc_threshold = trunc_threshold
+        self.trunc_err = 0.
+        self.rng = np.random.default_rng(rand_seed)
+        self.br_meas_bits = []
+        self.meas_outcomes = {}
+        self.mcase_is_true = True
+        SEO_reader.__init__(self, file_prefix, num_bits, **kwargs)
+
+    def get_bond_dims(self):
+        """
+        Returns a list with the dimensions of the num_bits - 1 bonds of the
+        MPS.
+
+        Returns
+        -------
+        list[int]
+
+        """
+        return [tensor.shape[2] for tensor in self.tensors[:-1]]
+
+    def move_center(self, site):
+        """
+        Moves the orthogonality center of the MPS to site, by QR
+        decompositions of the tensors between self.center and site.
+
+        Parameters
+        ----------
+        site : int
+
+        Returns
+        -------
+        None
+
+        """
+        ts = self.tensors
+        while self.center < site:
+            c = self.center
+            chi_l, d, chi_r = ts[c].shape
+            q, r = np.linalg.qr(ts[c].reshape(chi_l*d, chi_r))
+            ts[c] = q.reshape(chi_l, d, -1)
+            ts[c + 1] = np.tensordot(r, ts[c + 1], axes=(1, 0))
+            self.center += 1
+        while self.center > site:
+            c = self.center
+            chi_l, d, chi_r = ts[c].shape
+            # LQ decomposition, from the QR decomposition of the transpose
+            q, r = np.linalg.qr(ts[c].reshape(chi_l, d*chi_r).T)
+            ts[c] = q.T.reshape(-1, d, chi_r)
+            ts[c - 1] = np.tensordot(ts[c - 1], r.T, axes=(2, 0))
+            self.center -= 1
+
+    def split_bond(self, mat):
+        """
+        Returns the truncated SVD (u, v) of the 2 dim array mat, where the
+        singular values have been multiplied into v. Adds the relative
+        discarded weight to self.trunc_err. The kept singular values are
+        rescaled so that the norm of u @ v equals that of mat.
+
+        Parameters
+        ----------
+        mat : np.ndarray
+
+        Returns
+        -------
+        np.ndarray, np.ndarray
+
+        """
+        u, s, v = np.linalg.svd(mat, full_matrices=False)
+        weights = s**2
+        tot_weight = np.sum(weights)
+        if tot_weight == 0:
+            return u[:, :1], np.zeros_like(v[:1])
+        # discarded_weights[k] = weight discarded if only k values are kept
+        discarded_weights = np.concatenate(
+            [np.cumsum(weights[::-1])[::-1], [0.]])/tot_weight
+        num_kept = int(np.argmax(discarded_weights <= self.trunc_threshold))
+        num_kept = max(num_kept, 1)
+        if self.max_bond_dim is not None:
+            num_kept = min(num_kept, self.max_bond_dim)
+        self.trunc_err += discarded_weights[num_kept]
+        s = s[:num_kept]*np.sqrt(tot_weight/np.sum(weights[:num_kept]))
+        return u[:, :num_kept], s[:, np.newaxis]*v[:num_kept]
+
+    def apply_window_mat(self, first_site, num_sites, mat):
+        """
+        Applies the 2^num_sites dim matrix mat to the neighboring qubits
+        first_site, first_site + 1, ..., first_site + num_sites - 1. The
+        basis states of these qubits are labelled by the int whose binary
+        digits are their values, with the value of first_site as the most
+        significant digit.
+
+        Parameters
+        ----------
+        first_site : int
+        num_sites : int
+        mat : np.ndarray
+
+        Returns
+        -------
+        None
+
+        """
+        ts = self.tensors
+        self.move_center(first_site)
+        theta = ts[first_site]
+        for site in range(first_site + 1, first_site + num_sites):
+            theta = np.tensordot(theta, ts[site], axes=(-1, 0))
+        theta = np.tensordot(mat.reshape([2]*(2*num_sites)), theta,
+                             axes=(list(range(num_sites, 2*num_sites)),
+                                   list(range(1, num_sites + 1))))
+        # axes of theta are now (v_first, ..., v_last, chi_l, chi_r)
+        theta = np.moveaxis(theta, num_sites, 0)
+        for site in range(first_site, first_site + num_sites - 1):
+            chi_l = theta.shape[0]
+            rest_shape = theta.shape[2:]
+            u, v = self.split_bond(
+                theta.reshape(chi_l*2, int(np.prod(rest_shape))))
+            ts[site] = u.reshape(chi_l, 2, -1)
+            theta = v.reshape((-1,) + rest_shape)
+            self.center = site + 1
+        ts[first_site + num_sites - 1] = theta
+
+    @staticmethod
+    def get_window_mat(bits, fun):
+        """
+        Returns the matrix, in the basis of apply_window_mat(), of the
+        linear operator on the qubits `bits` that maps each basis state
+        vals to sum_k amp_k * out_vals_k, where fun(vals) = [(out_vals_0,
+        amp_0), (out_vals_1, amp_1), ...]. vals and out_vals_k are
+        dictionaries mapping each bit in bits to its value, 0 or 1.
+
+        Parameters
+        ----------
+        bits : list[int]
+        fun : function
+
+        Returns
+        -------
+        np.ndarray
+
+        """
+        num_bits = len(bits)
+        dim = 1 << num_bits
+        mat = np.zeros((dim, dim), dtype=np.complex128)
+        for k in range(dim):
+            vals = {bit: (k >> (num_bits - 1 - pos)) & 1 for
+                    pos, bit in enumerate(bits)}
+            for out_vals, amp in fun(vals):
+                out_k = 0
+                for bit in bits:
+                    out_k = 2*out_k + out_vals[bit]
+                mat[out_k, k] += amp
+        return mat
+
+    def apply_to_bits(self, bits, fun):
+        """
+        Applies the linear operator described by fun (see
+        get_window_mat()) to the qubits `bits`. If they are not neighbors
+        in the chain, a swap network brings them together first, and is
+        undone afterwards.
+
+        Parameters
+        ----------
+        bits : list[int]
+        fun : function
+
+        Returns
+        -------
+        None
+
+        """
+        bits = sorted(bits)
+        first = bits[0]
+        swap_mat = SEO_simulator_mps.get_window_mat(
+            [0, 1], lambda vals: [({0: vals[1], 1: vals[0]}, 1)])
+        # move bits[k] to site first + k, one neighbor swap at a time
+        swap_sites = []
+        for k, bit in enumerate(bits):
+            for site in range(bit - 1, first + k - 1, -1):
+                self.apply_window_mat(site, 2, swap_mat)
+                swap_sites.append(site)
+        self.apply_window_mat(first, len(bits),
+                              SEO_simulator_mps.get_window_mat(bits, fun))
+        for site in reversed(swap_sites):
+            self.apply_window_mat(site, 2, swap_mat)
+
+    @staticmethod
+    def trols_are_satisfied(trols, vals):
+        """
+        Returns True iff the T/F controls of trols agree with vals, a
+        dictionary mapping bits to their values.
+
+        Parameters
+        ----------
+        trols : Controls
+        vals : dict[int, int]
+
+        Returns
+        -------
+        bool
+
+        """
+        return all(vals[bit] == int(kind) for bit, kind in
+                   trols.bit_pos_to_kind.items() if isinstance(kind, bool))
+
+    @staticmethod
+    def get_mp_index(trols, vals):
+        """
+        Returns the int j whose binary digit m is the value in vals of the
+        intrinsic control of kind m of trols.
+
+        Parameters
+        ----------
+        trols : Controls
+        vals : dict[int, int]
+
+        Returns
+        -------
+        int
+
+        """
+        j = 0
+        for bit, kind in trols.bit_pos_to_kind.items():
+            if not isinstance(kind, bool):
+                j |= vals[bit] << kind
+        return j
+
+    def evolve_by_controlled_one_bit_gate(self,
+                tar_bit_pos, controls, one_bit_gate):
+        """
+        Applies the controlled one bit gate to the MPS.
+
+        Parameters
+        ----------
+        tar_bit_pos : int
+        controls : Controls
+        one_bit_gate : np.ndarray
+
+        Returns
+        -------
+        None
+
+        """
+        if not self.mcase_is_true:
+            return
+        if not controls.bit_pos:
+            ts = self.tensors
+            ts[tar_bit_pos] = np.einsum('ij,ajb->aib', one_bit_gate,
+                                        ts[tar_bit_pos])
+            return
+
+        def fun(vals):
+            if not SEO_simulator_mps.trols_are_satisfied(controls, vals):
+                return [(vals, 1)]
+            ans = []
+            for val in [0, 1]:
+                out_vals = dict(vals)
+                out_vals[tar_bit_pos] = val
+                ans.append((out_vals,
+                            one_bit_gate[val, vals[tar_bit_pos]]))
+            return ans
+        self.apply_to_bits(list(controls.bit_pos) + [tar_bit_pos], fun)
+
+    def use_DIAG(self, trols, rad_angles):
+        """
+        Overrides the parent class use_ function. Applies the controlled
+        diagonal unitary to the MPS.
+
+        Parameters
+        ----------
+        trols : Controls
+        rad_angles : list[float]
+
+        Returns
+        -------
+        None
+
+        """
+        if not self.mcase_is_true:
+            return
+        phases = np.exp(1j*np.array(rad_angles))
+
+        def fun(vals):
+            if not SEO_simulator_mps.trols_are_satisfied(trols, vals):
+                return [(vals, 1)]
+            j = SEO_simulator_mps.get_mp_index(trols, vals)
+            return [(vals, phases[j])]
+        self.apply_to_bits(list(trols.bit_pos), fun)
+
+    def use_HAD2(self, tar_bit_pos, controls):
+        """
+        Overrides the parent class use_ function. Calls
+        evolve_by_controlled_one_bit_gate() for had2.
+
+        Parameters
+        ----------
+        tar_bit_pos : int
+        controls : Controls
+
+        Returns
+        -------
+        None
+
+        """
+        gate = OneBitGates.had2()
+        self.evolve_by_controlled_one_bit_gate(tar_bit_pos, controls, gate)
+
+    def use_IF_M_beg(self, controls):
+        """
+        Overrides the parent class use_ function. The lines inside the IF_M
+        block will be applied iff controls agree with the sampled outcomes
+        of the measurements.
+
+        Parameters
+        ----------
+        controls : Controls
+
+        Returns
+        -------
+        None
+
+        """
+        self.mcase_is_true = all(
+            self.meas_outcomes[bit] == kind for bit, kind in
+            controls.bit_pos_to_kind.items())
+
+    def use_IF_M_end(self):
+        """
+        Overrides the parent class use_ function. From now on, all lines
+        are applied.
+
+        Returns
+        -------
+        None
+
+        """
+        self.mcase_is_true = True
+
+    def use_MEAS(self, tar_bit_pos, kind):
+        """
+        Overrides the parent class use_ function. For kind 2, samples the
+        outcome of measuring qubit tar_bit_pos, projects the state onto it
+        and rescales it, and stores the outcome in self.meas_outcomes. For
+        kind 0 (resp., 1), projects the state onto outcome 0 (resp., 1).
+
+        Parameters
+        ----------
+        tar_bit_pos : int
+        kind : int
+
+        Returns
+        -------
+        None
+
+        """
+        # at the orthogonality center, the norm of the state is the norm of
+        # the center tensor
+        self.move_center(tar_bit_pos)
+        tensor = self.tensors[tar_bit_pos]
+        if kind in [0, 1]:
+            tensor[:, 1 - kind, :] = 0
+        elif kind == 2:
+            prob1 = np.linalg.norm(tensor[:, 1, :])**2
+            tot_prob = np.linalg.norm(tensor)**2
+            is_T = False
+            if tot_prob > 0:
+                is_T = bool(self.rng.random() < prob1/tot_prob)
+            tensor[:, 0 if is_T else 1, :] = 0
+            prob = prob1 if is_T else tot_prob - prob1
+            if prob > 0:
+                tensor *= np.sqrt(tot_prob/prob)
+            self.meas_outcomes[tar_bit_pos] = is_T
+            self.br_meas_bits.append(tar_bit_pos)
+        else:
+            assert False, 'unsupported measurement kind'
+
+    def use_MP_Y(self, tar_bit_pos, trols, rad_angles):
+        """
+        Overrides the parent class use_ function. Applies the controlled
+        multiplexor to the MPS.
+
+        Parameters
+        ----------
+        tar_bit_pos : int
+        trols : Controls
+        rad_angles : list[float]
+
+        Returns
+        -------
+        None
+
+        """
+        if not self.mcase_is_true:
+            return
+
+        def fun(vals):
+            if not SEO_simulator_mps.trols_are_satisfied(trols, vals):
+                return [(vals, 1)]
+            j = SEO_simulator_mps.get_mp_index(trols, vals)
+            gate = OneBitGates.rot_ax(rad_angles[j], 2)
+            ans = []
+            for val in [0, 1]:
+                out_vals = dict(vals)
+                out_vals[tar_bit_pos] = val
+                ans.append((out_vals, gate[val, vals[tar_bit_pos]]))
+            return ans
+        self.apply_to_bits(list(trols.bit_pos) + [tar_bit_pos], fun)
+
+    def use_NOTA(self, bla_str):
+        """
+        Overrides the parent class use_ function. Does nothing.
+
+        Parameters
+        ----------
+        bla_str : str
+
+        Returns
+        -------
+        None
+
+        """
+        pass
+
+    def use_PHAS(self, angle_rads, tar_bit_pos, controls):
+        """
+        Overrides the parent class use_ function. Calls
+        evolve_by_controlled_one_bit_gate() for PHAS.
+
+        Parameters
+        ----------
+        angle_rads : float
+        tar_bit_pos : int
+        controls : Controls
+
+        Returns
+        -------
+        None
+
+        """
+        gate = OneBitGates.phase_fac(angle_rads)
+        self.evolve_by_controlled_one_bit_gate(tar_bit_pos, controls, gate)
+
+    def use_P_PH(self, projection_bit, angle_rads, tar_bit_pos, controls):
+        """
+        Overrides the parent class use_ function. Calls
+        evolve_by_controlled_one_bit_gate() for P_0 and P_1 phase factors.
+
+        Parameters
+        ----------
+        projection_bit : int
+            0 (resp. 1) for P_0 (resp. P_1) projection
+        angle_rads : float
+        tar_bit_pos : int
+        controls : Controls
+
+        Returns
+        -------
+        None
+
+        """
+        fun = {
+            0: OneBitGates.P_0_phase_fac,
+            1: OneBitGates.P_1_phase_fac
+        }
+        gate = fun[projection_bit](angle_rads)
+        self.evolve_by_controlled_one_bit_gate(tar_bit_pos, controls, gate)
+
+    def use_PRINT(self, style, line_num):
+        """
+        Overrides the parent class use_ function. Prints to screen the
+        bond dimensions, the truncation error and the probabilities of each
+        qubit.
+
+        Parameters
+        ----------
+        style : str
+            style in which to print
+        line_num : int
+            line number in eng & pic files in which PRINT command appears
+
+        Returns
+        -------
+        None
+
+        """
+        assert style in ["V1", "ALL"], "unsupported PRINT style"
+        print("\n*************************beginning PRINT output")
+        print("PRINT line number=" + str(line_num))
+        print("bond dimensions=", self.get_bond_dims())
+        print("truncation error=", self.trunc_err)
+        print("dictionary with key=qubit, value=(Prob(0), Prob(1))")
+        pp.pprint(dict(enumerate(self.get_bit_probs())))
+        print("****************************ending PRINT output")
+
+    def use_ROT(self, axis, angle_rads, tar_bit_pos, controls):
+        """
+        Overrides the parent class use_ function. Calls
+        evolve_by_controlled_one_bit_gate() for rot along axes x, y, or z.
+
+        Parameters
+        ----------
+        axis : int
+            1, 2, 3 for x, y, z
+        angle_rads : float
+        tar_bit_pos : int
+        controls : Controls
+
+        Returns
+        -------
+        None
+
+        """
+        gate = OneBitGates.rot_ax(angle_rads, axis)
+        self.evolve_by_controlled_one_bit_gate(tar_bit_pos, controls, gate)
+
+    def use_ROTN(self, angle_x_rads, angle_y_rads, angle_z_rads,
+                tar_bit_pos, controls):
+        """
+        Overrides the parent class use_ function. Calls
+        evolve_by_controlled_one_bit_gate() for rot along arbitrary axis.
+
+        Parameters
+        ----------
+        angle_x_rads : float
+        angle_y_rads : float
+        angle_z_rads : float
+        tar_bit_pos : int
+        controls : Controls
+
+        Returns
+        -------
+        None
+
+        """
+        gate = OneBitGates.rot(angle_x_rads, angle_y_rads, angle_z_rads)
+        self.evolve_by_controlled_one_bit_gate(tar_bit_pos, controls, gate)
+
+    def use_SIG(self, axis, tar_bit_pos, controls):
+        """
+        Overrides the parent class use_ function. Calls
+        evolve_by_controlled_one_bit_gate() for sigx, sigy, sigz.
+
+        Parameters
+        ----------
+        axis : int
+            1, 2, 3 for x, y, z
+        tar_bit_pos : int
+        controls : Controls
+
+        Returns
+        -------
+        None
+
+        """
+        fun = {
+            1: OneBitGates.sigx,
+            2: OneBitGates.sigy,
+            3: OneBitGates.sigz
+        }
+        gate = fun[axis]()
+        self.evolve_by_controlled_one_bit_gate(tar_bit_pos, controls, gate)
+
+    def use_SWAP(self, bit1, bit2, controls):
+        """
+        Overrides the parent class use_ function. Applies the controlled
+        bit swap to the MPS.
+
+        Parameters
+        ----------
+        bit1 : int
+        bit2 : int
+        controls : Controls
+
+        Returns
+        -------
+        None
+
+        """
+        if not self.mcase_is_true:
+            return
+
+        def fun(vals):
+            if not SEO_simulator_mps.trols_are_satisfied(controls, vals):
+                return [(vals, 1)]
+            out_vals = dict(vals)
+            out_vals[bit1], out_vals[bit2] = vals[bit2], vals[bit1]
+            return [(out_vals, 1)]
+        self.apply_to_bits(list(controls.bit_pos) + [bit1, bit2], fun)
+
+    def get_total_prob(self):
+        """
+        Returns the total probability (the squared norm) of the state.
+
+        Returns
+        -------
+        float
+
+        """
+        return float(np.linalg.norm(self.tensors[self.center])**2)
+
+    def get_bit_probs(self):
+        """
+        Returns a list whose jth item is, for the jth qubit, the pair (p,
+        1-p), where p is the probability that the jth qubit is 0, like
+        StateVec.get_bit_probs(). The orthogonality center is swept over
+        the whole chain.
+
+        Returns
+        -------
+        list[tuple[float, float]]
+
+        """
+        tot_prob = self.get_total_prob()
+        probs = []
+        for bit in range(self.num_bits):
+            self.move_center(bit)
+            p = np.linalg.norm(self.tensors[bit][:, 0, :])**2/tot_prob
+            probs.append((float(p), float(1 - p)))
+        return probs
+
+    def get_st_vec(self):
+        """
+        Contracts the MPS into a StateVec. Only feasible for small
+        num_bits.
+
+        Returns
+        -------
+        StateVec
+
+        """
+        arr = self.tensors[0]
+        for tensor in self.tensors[1:]:
+            arr = np.tensordot(arr, tensor, axes=(-1, 0))
+        return StateVec(self.num_bits, arr.reshape([2]*self.num_bits))
+
+if __name__ == "__main__":
+    from SEO_writer import *
+
+    def main():
+        # compare with SEO_simulator
+        file_prefix = 'io_folder/sim_test1'
+        num_bits = 6
+        sim = SEO_simulator(file_prefix, num_bits)
+        sim_mps = SEO_simulator_mps(file_prefix, num_bits)
+        print('same final state=',
+              np.allclose(sim.cur_st_vec_dict['pure'].arr,
+                          sim_mps.get_st_vec().arr))
+        print('bond dimensions=', sim_mps.get_bond_dims())
+
+        def write_chain(file_prefix, num_bits):
+            # layers of rotations and nearest neighbor CNOTs
+            wr = SEO_writer(file_prefix, CktEmbedder(num_bits, num_bits))
+            for layer in range(6):
+                for bit in range(num_bits):
+                    wr.write_one_bit_gate(bit, OneBitGates.rot,
+                                          [.3*layer, .7, .2*bit])
+                for bit in range(layer % 2, num_bits - 1, 2):
+                    trols = Controls(num_bits)
+                    trols.set_control(bit, True)
+                    trols.refresh_lists()
+                    wr.write_controlled_one_bit_gate(bit + 1, trols,
+                                                     OneBitGates.sigx)
+            wr.close_files()
+
+        # 12 qubit chain, small enough to compare the truncated MPS with
+        # the exact state. The chain needs bond dimension 8, so
+        # max_bond_dim=4 truncates it
+        num_bits = 12
+        file_prefix = 'io_folder/mps_chain_test'
+        write_chain(file_prefix, num_bits)
+        exact_arr = SEO_simulator(file_prefix,
+                                  num_bits).cur_st_vec_dict['pure'].arr
+        for max_bond_dim in [None, 4, 2]:
+            sim_mps = SEO_simulator_mps(file_prefix, num_bits,
+                                        max_bond_dim=max_bond_dim)
+            fidelity = abs(np.vdot(exact_arr, sim_mps.get_st_vec().arr))**2
+            print('max_bond_dim=', max_bond_dim,
+                  ', bond dimensions=', sim_mps.get_bond_dims())
+            print('    truncation error=', sim_mps.trunc_err,
+                  ', infidelity=', 1 - fidelity)
+
+        # 64 qubit chain. Its state vector would need 2^64 amplitudes
+        num_bits = 64
+        write_chain(file_prefix, num_bits)
+        sim_mps = SEO_simulator_mps(file_prefix, num_bits, max_bond_dim=4)
+        print('64 qubits, max bond dimension=',
+              max(sim_mps.get_bond_dims()))
+        print('truncation error=', sim_mps.trunc_err)
+        print('probs of last qubit=', sim_mps.get_bit_probs()[-1])
+    main()
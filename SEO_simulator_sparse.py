@@ -0,0 +1,564 @@
+from SEO_simulator import *
+import pprint as pp
+
+
+class SEO_simulator_sparse(SEO_simulator):
+    """
+    This class simulates the evolution of a state vector that has only a
+    few nonzero amplitudes, like the state of a reversible circuit (e.g.,
+    an adder or an oracle written with CGateSEO_writer) that starts from
+    a standard basis state. Whereas its parent class SEO_simulator always
+    stores the 2^num_bits amplitudes of the state vector, this class
+    stores only the nonzero ones, so it can simulate such circuits with 40
+    or more qubits.
+
+    The state is stored as two 1 dim arrays of the same length:
+    self.labels, with the ZL labels (i.e., the ints whose binary digit
+    bit is the value of qubit bit) of the basis states with nonzero
+    amplitude, and self.amps, with those amplitudes. Gates that just
+    permute basis states and multiply them by phases (SIGX, SIGY, SWAP,
+    and all diagonal gates, with any controls) change labels and amps in
+    place, without changing their length. Other gates (e.g., HAD2) may
+    create new labels; the contributions to the same label are added, and
+    the amplitudes whose absolute value is <= self.zero_tol are dropped.
+
+    If the number of nonzero amplitudes ever becomes larger than
+    self.max_fill times 2^num_bits, the state is densified: it is turned
+    into an ordinary state vector, and, from then on, the simulation is
+    done by the parent class, exactly as if the object were a
+    SEO_simulator.
+
+    Measurements and IF_M blocks are handled as in the trajectory mode of
+    SEO_simulator: the outcome of a kind 2 measurement is sampled, and the
+    state is projected onto it and rescaled so that its total probability
+    doesn't change. A kind 0 or 1 measurement projects the state without
+    rescaling it.
+
+    Attributes
+    ----------
+    amps : np.ndarray | None
+        complex array with the nonzero amplitudes, or None once the state
+        has been densified
+    is_dense : bool
+        True iff the state has been densified
+    labels : np.ndarray | None
+        int64 array with the ZL labels of the nonzero amplitudes, or None
+        once the state has been densified
+    max_fill : float
+    mcase_is_true : bool
+        True iff the lines being read are not inside an IF_M block, or if
+        they are inside one whose controls agree with the sampled outcomes.
+    zero_tol : float
+
+    """
+
+    def __init__(self, file_prefix, num_bits, init_label=0,
+                 max_fill=1/16, zero_tol=1e-15, dtype=np.complex128,
+                 num_threads=1, rand_seed=None, **kwargs):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        file_prefix : str
+        num_bits : int
+        init_label : int
+            ZL label of the initial standard basis state
+        max_fill : float
+            fraction of nonzero amplitudes above which the state is
+            densified
+        zero_tol : float
+            amplitudes created by a gate with absolute value <= zero_tol
+            are dropped
+        dtype : type
+            dtype of the amplitudes
+        num_threads : int
+            number of threads that apply each gate in parallel, once the
+            state has been densified
+        rand_seed : int | np.random.SeedSequence | None
+            seed of the random number generator used to sample the outcomes
+            of kind 2 measurements.
+
+        Returns
+        -------
+
+        """
+        # labels are stored in int64
+        assert num_bits <= 62
+        self.labels = np.array([init_label], dtype=np.int64)
+        self.amps = np.ones((1,), dtype=dtype)
+        self.max_fill = max_fill
+        self.zero_tol = zero_tol
+        self.is_dense = False
+        self.mcase_is_true = True
+
+        # attributes used by the parent class once the state is dense
+        self.dtype = np.dtype(dtype)
+        self.cur_st_vec_dict = {}
+        self.cached_sts = {}
+        self.branch_arr = None
+        self.br_meas_bits = []
+        self.br_outcome_masks = np.zeros((1,), dtype=np.int64)
+        self.br_is_zero = np.zeros((1,), dtype=bool)
+        self.evolving_arrs = []
+        self.prune_zero_brs = False
+        self.merge_brs = False
+        self.trajectory = True
+        self.rng = np.random.default_rng(rand_seed)
+        self.init_scratch_and_threads(num_threads)
+
+        SEO_reader.__init__(self, file_prefix, num_bits, **kwargs)
+
+    def get_st_vec(self):
+        """
+        Returns the state as an ordinary (dense) StateVec. Only feasible
+        for small num_bits, or after the state has been densified.
+
+        Returns
+        -------
+        StateVec
+
+        """
+        if self.is_dense:
+            return StateVec(self.num_bits, self.branch_arr[0])
+        num_bits = self.num_bits
+        arr = np.zeros((1 << num_bits,), dtype=self.dtype)
+        arr[self.labels] = self.amps
+        # reshape gives ZL axes, reverse them to get ZF axes
+        arr = arr.reshape([2]*num_bits).transpose(
+            list(reversed(range(num_bits))))
+        return StateVec(num_bits, np.ascontiguousarray(arr))
+
+    def densify(self):
+        """
+        Turns the sparse state into a dense one, stored in self.branch_arr
+        as in the parent class. From now on, the parent class does the
+        simulation.
+
+        Returns
+        -------
+        None
+
+        """
+        self.branch_arr = self.get_st_vec().arr[np.newaxis]
+        self.labels = None
+        self.amps = None
+        self.is_dense = True
+        self.refresh_st_vec_dict()
+        self.refresh_evolving_arrs()
+
+    def get_label_to_amp(self):
+        """
+        Returns a dictionary mapping the ZL label of each basis state with
+        nonzero amplitude to its amplitude.
+
+        Returns
+        -------
+        dict[int, complex]
+
+        """
+        if self.is_dense:
+            vec = self.get_st_vec().get_traditional_st_vec()
+            labels = np.flatnonzero(vec)
+            amps = vec[labels]
+        else:
+            labels, amps = self.labels, self.amps
+        return dict(zip(labels.tolist(), amps.tolist()))
+
+    def get_bit_probs(self):
+        """
+        Returns a list whose jth item is, for the jth qubit, the pair (p,
+        1-p), where p is the probability that the jth qubit is 0, like
+        StateVec.get_bit_probs().
+
+        Returns
+        -------
+        list[tuple[float, float]]
+
+        """
+        if self.is_dense:
+            pd = np.abs(self.get_st_vec().get_traditional_st_vec())**2
+            return StateVec.get_bit_probs(self.num_bits, pd)
+        probs = np.abs(self.amps)**2
+        tot_prob = np.sum(probs)
+        bit_probs = []
+        for bit in range(self.num_bits):
+            p = np.sum(probs[(self.labels >> bit) & 1 == 0])/tot_prob
+            bit_probs.append((float(p), float(1 - p)))
+        return bit_probs
+
+    @staticmethod
+    def get_TF_masks(trols):
+        """
+        Returns a pair of ints (mask, vals). mask has a 1 at each T/F
+        control of trols, and vals has a 1 at each T control. The labels
+        that satisfy the T/F controls are those with label & mask == vals.
+
+        Parameters
+        ----------
+        trols : Controls
+
+        Returns
+        -------
+        int, int
+
+        """
+        mask = 0
+        vals = 0
+        for bit, kind in trols.bit_pos_to_kind.items():
+            if isinstance(kind, bool):
+                mask |= 1 << bit
+                vals |= int(kind) << bit
+        return mask, vals
+
+    def get_mp_indices(self, trols):
+        """
+        Returns an int array with, for each label in self.labels, the int j
+        whose binary digit m is the value of the intrinsic control of kind
+        m of trols.
+
+        Parameters
+        ----------
+        trols : Controls
+
+        Returns
+        -------
+        np.ndarray
+
+        """
+        js = np.zeros_like(self.labels)
+        for bit, kind in trols.bit_pos_to_kind.items():
+            if not isinstance(kind, bool):
+                js |= ((self.labels >> bit) & 1) << kind
+        return js
+
+    def merge_labels(self, labels, amps):
+        """
+        Sets self.labels and self.amps to labels and amps, after adding
+        the amplitudes with the same label and dropping the amplitudes with
+        absolute value <= self.zero_tol. Densifies the state if it has too
+        many nonzero amplitudes.
+
+        Parameters
+        ----------
+        labels : np.ndarray
+        amps : np.ndarray
+
+        Returns
+        -------
+        None
+
+        """
+        labels, inv = np.unique(labels, return_inverse=True)
+        new_amps = np.zeros(labels.shape, dtype=self.dtype)
+        np.add.at(new_amps, inv, amps)
+        keep = np.abs(new_amps) > self.zero_tol
+        self.labels = labels[keep]
+        self.amps = new_amps[keep]
+        if len(self.labels) > self.max_fill*(1 << self.num_bits):
+            self.densify()
+
+    def apply_mixing_gate(self, tar_bit_pos, sel, gates):
+        """
+        Applies a one bit gate to the target bit tar_bit_pos of the
+        labels selected by the bool array sel. gates is an array of shape
+        (num_selected, 2, 2) with the gate for each selected label.
+
+        Parameters
+        ----------
+        tar_bit_pos : int
+        sel : np.ndarray
+        gates : np.ndarray
+
+        Returns
+        -------
+        None
+
+        """
+        tar_mask = 1 << tar_bit_pos
+        sel_labels = self.labels[sel]
+        sel_amps = self.amps[sel]
+        in_vals = (sel_labels >> tar_bit_pos) & 1
+        rows = np.arange(len(sel_labels))
+        labels = np.concatenate([self.labels[~sel],
+                                 sel_labels & ~tar_mask,
+                                 sel_labels | tar_mask])
+        amps = np.concatenate([self.amps[~sel],
+                               gates[rows, 0, in_vals]*sel_amps,
+                               gates[rows, 1, in_vals]*sel_amps])
+        self.merge_labels(labels, amps)
+
+    def evolve_by_controlled_bit_swap(self, bit1, bit2, controls):
+        """
+        Overrides the parent class function. Swaps bit1 and bit2 in the
+        labels that satisfy the controls.
+
+        Parameters
+        ----------
+        bit1 : int
+        bit2 : int
+        controls : Controls
+
+        Returns
+        -------
+        None
+
+        """
+        if self.is_dense:
+            SEO_simulator.evolve_by_controlled_bit_swap(
+                self, bit1, bit2, controls)
+            return
+        if not self.mcase_is_true:
+            return
+        mask, vals = SEO_simulator_sparse.get_TF_masks(controls)
+        labels = self.labels
+        sel = ((labels & mask) == vals) & \
+            (((labels >> bit1) ^ (labels >> bit2)) & 1 == 1)
+        labels[sel] ^= (1 << bit1) | (1 << bit2)
+
+    def evolve_by_controlled_diag_unitary_gate(self, trols, rad_angles):
+        """
+        Overrides the parent class function. Multiplies the amplitudes
+        whose labels satisfy the T/F controls by the phases selected by
+        the intrinsic controls.
+
+        Parameters
+        ----------
+        trols : Controls
+        rad_angles : list[float]
+
+        Returns
+        -------
+        None
+
+        """
+        if self.is_dense:
+            SEO_simulator.evolve_by_controlled_diag_unitary_gate(
+                self, trols, rad_angles)
+            return
+        if not self.mcase_is_true:
+            return
+        phases = np.exp(1j*np.array(rad_angles)).astype(self.dtype)
+        mask, vals = SEO_simulator_sparse.get_TF_masks(trols)
+        sel = (self.labels & mask) == vals
+        self.amps[sel] *= phases[self.get_mp_indices(trols)[sel]]
+
+    def evolve_by_controlled_multiplexor_gate(self,
+                tar_bit_pos, trols, rad_angles):
+        """
+        Overrides the parent class function. Applies to the labels that
+        satisfy the T/F controls the rotation selected by the intrinsic
+        controls.
+
+        Parameters
+        ----------
+        tar_bit_pos : int
+        trols : Controls
+        rad_angles : list[float]
+
+        Returns
+        -------
+        None
+
+        """
+        if self.is_dense:
+            SEO_simulator.evolve_by_controlled_multiplexor_gate(
+                self, tar_bit_pos, trols, rad_angles)
+            return
+        if not self.mcase_is_true:
+            return
+        cc = np.cos(rad_angles)
+        ss = np.sin(rad_angles)
+        # gates[j] = OneBitGates.rot_ax(rad_angles[j], 2)
+        gates = np.moveaxis(np.array([[cc, ss], [-ss, cc]],
+                                     dtype=self.dtype), 2, 0)
+        mask, vals = SEO_simulator_sparse.get_TF_masks(trols)
+        sel = (self.labels & mask) == vals
+        self.apply_mixing_gate(tar_bit_pos, sel,
+                               gates[self.get_mp_indices(trols)[sel]])
+
+    def evolve_by_controlled_one_bit_gate(self,
+                tar_bit_pos, controls, one_bit_gate):
+        """
+        Overrides the parent class function. Diagonal and anti-diagonal
+        gates change self.labels and self.amps in place. Other gates are
+        applied by apply_mixing_gate().
+
+        Parameters
+        ----------
+        tar_bit_pos : int
+        controls : Controls
+        one_bit_gate : np.ndarray
+
+        Returns
+        -------
+        None
+
+        """
+        if self.is_dense:
+            SEO_simulator.evolve_by_controlled_one_bit_gate(
+                self, tar_bit_pos, controls, one_bit_gate)
+            return
+        if not self.mcase_is_true:
+            return
+        mask, vals = SEO_simulator_sparse.get_TF_masks(controls)
+        sel = (self.labels & mask) == vals
+        is_one = (self.labels >> tar_bit_pos) & 1 == 1
+        if one_bit_gate[0, 1] == 0 and one_bit_gate[1, 0] == 0:
+            self.amps[sel & ~is_one] *= one_bit_gate[0, 0]
+            self.amps[sel & is_one] *= one_bit_gate[1, 1]
+        elif one_bit_gate[0, 0] == 0 and one_bit_gate[1, 1] == 0:
+            self.amps[sel & ~is_one] *= one_bit_gate[1, 0]
+            self.amps[sel & is_one] *= one_bit_gate[0, 1]
+            self.labels[sel] ^= 1 << tar_bit_pos
+        else:
+            gates = np.broadcast_to(one_bit_gate,
+                                    (np.count_nonzero(sel), 2, 2))
+            self.apply_mixing_gate(tar_bit_pos, sel, gates)
+
+    def use_IF_M_beg(self, controls):
+        """
+        Overrides the parent class use_ function. The lines inside the IF_M
+        block will be applied iff controls agree with the sampled outcomes
+        of the measurements.
+
+        Parameters
+        ----------
+        controls : Controls
+
+        Returns
+        -------
+        None
+
+        """
+        if self.is_dense:
+            SEO_simulator.use_IF_M_beg(self, controls)
+            return
+        mask = int(self.br_outcome_masks[0])
+        self.mcase_is_true = all(
+            ((mask >> bit) & 1) == int(kind) for bit, kind in
+            controls.bit_pos_to_kind.items())
+
+    def use_IF_M_end(self):
+        """
+        Overrides the parent class use_ function. From now on, all lines
+        are applied.
+
+        Returns
+        -------
+        None
+
+        """
+        self.mcase_is_true = True
+        if self.is_dense:
+            SEO_simulator.use_IF_M_end(self)
+
+    def use_MEAS(self, tar_bit_pos, kind):
+        """
+        Overrides the parent class use_ function. For kind 2, samples the
+        outcome of measuring qubit tar_bit_pos, and projects the state onto
+        it and rescales it. For kind 0 (resp., 1), projects the state onto
+        outcome 0 (resp., 1).
+
+        Parameters
+        ----------
+        tar_bit_pos : int
+        kind : int
+
+        Returns
+        -------
+        None
+
+        """
+        if self.is_dense:
+            SEO_simulator.use_MEAS(self, tar_bit_pos, kind)
+            return
+        vals = (self.labels >> tar_bit_pos) & 1
+        if kind in [0, 1]:
+            keep = vals == kind
+        elif kind == 2:
+            probs = np.abs(self.amps)**2
+            tot_prob = np.sum(probs)
+            prob1 = np.sum(probs[vals == 1])
+            is_T = False
+            if tot_prob > 0:
+                is_T = bool(self.rng.random() < prob1/tot_prob)
+            keep = vals == int(is_T)
+            prob = prob1 if is_T else tot_prob - prob1
+            if prob > 0:
+                self.amps *= np.sqrt(tot_prob/prob)
+            if is_T:
+                self.br_outcome_masks[0] |= 1 << tar_bit_pos
+            self.br_meas_bits.append(tar_bit_pos)
+        else:
+            assert False, 'unsupported measurement kind'
+        self.labels = self.labels[keep]
+        self.amps = self.amps[keep]
+
+    def use_PRINT(self, style, line_num):
+        """
+        Overrides the parent class use_ function. Prints to screen the
+        number of nonzero amplitudes and the probabilities of each qubit,
+        and, if style is "ALL", the nonzero amplitudes too.
+
+        Parameters
+        ----------
+        style : str
+            style in which to print
+        line_num : int
+            line number in eng & pic files in which PRINT command appears
+
+        Returns
+        -------
+        None
+
+        """
+        assert style in ["V1", "ALL"], "unsupported PRINT style"
+        print("\n*************************beginning PRINT output")
+        print("PRINT line number=" + str(line_num))
+        label_to_amp = self.get_label_to_amp()
+        print("number of nonzero amplitudes=", len(label_to_amp))
+        if style == "ALL":
+            print("dictionary with key=ZL label, value=amplitude")
+            pp.pprint(label_to_amp)
+        print("dictionary with key=qubit, value=(Prob(0), Prob(1))")
+        pp.pprint(dict(enumerate(self.get_bit_probs())))
+        print("****************************ending PRINT output")
+
+if __name__ == "__main__":
+    from SEO_writer import *
+
+    def main():
+        # compare with SEO_simulator. This circuit is not reversible, so
+        # it is densified along the way
+        file_prefix = 'io_folder/sim_test1'
+        num_bits = 6
+        sim = SEO_simulator(file_prefix, num_bits)
+        sim_sp = SEO_simulator_sparse(file_prefix, num_bits)
+        print('densified=', sim_sp.is_dense)
+        print('same final state=',
+              np.allclose(sim.cur_st_vec_dict['pure'].arr,
+                          sim_sp.get_st_vec().arr))
+
+        # 48 qubit reversible circuit: a chain of Toffolis, CNOTs and
+        # SWAPs acting on a superposition of 2 basis states
+        num_bits = 48
+        file_prefix = 'io_folder/sparse_test'
+        wr = SEO_writer(file_prefix, CktEmbedder(num_bits, num_bits))
+        wr.write_one_bit_gate(0, OneBitGates.had2)
+        for bit in range(num_bits - 2):
+            trols = Controls(num_bits)
+            trols.set_control(bit, True)
+            trols.set_control(bit + 1, False)
+            trols.refresh_lists()
+            wr.write_controlled_one_bit_gate(bit + 2, trols,
+                                             OneBitGates.sigx)
+            wr.write_controlled_bit_swap(bit, bit + 1,
+                                         Controls(num_bits))
+        wr.close_files()
+        sim_sp = SEO_simulator_sparse(file_prefix, num_bits,
+                                      init_label=(1 << 30) + 5)
+        print('densified=', sim_sp.is_dense)
+        for label, amp in sim_sp.get_label_to_amp().items():
+            print('label=', bin(label), 'amplitude=', amp)
+    main()
@@ -0,0 +1,789 @@
+from SEO_simulator import *
+
+
+class SEO_simulator_stab(SEO_reader):
+    """
+    This class simulates Clifford circuits with the stabilizer formalism
+    (the CHP tableau algorithm of Aaronson and Gottesman). Its memory and
+    time grow polynomially with the number of qubits num_bits, instead of
+    exponentially like those of SEO_simulator, so it can simulate
+    Clifford circuits with hundreds of qubits, like the Bell, GHZ and
+    teleportation circuits of io_folder or the CNOT routed circuits
+    written by ForbiddenCNotExpander.
+
+    The lines of the English file that this class accepts are:
+
+    * HAD2, SIGX, SIGY, SIGZ, PHAS, P0PH, P1PH, ROTX, ROTY, ROTZ, ROTN
+      lines without controls whose gate is a Clifford gate (e.g., ROTZ by
+      a multiple of 45 degrees), up to a global phase.
+    * the same lines with a single T/F control, if their gate is a Pauli
+      matrix (or the identity) times one of 1, i, -1, -i. For example,
+      CNOTs (SIGX with one control), controlled SIGZ and controlled PHAS
+      by a multiple of 90 degrees.
+    * SWAP lines without controls.
+    * MEAS lines and IF_M blocks.
+    * NOTA, PRINT, LOOP, NEXT.
+
+    Any other line (DIAG, MP_Y, gates with 2 or more controls, non-Clifford
+    gates) stops the simulation immediately with an AssertionError.
+
+    The initial state is the ground state |0>|0>...|0>. The state is
+    stored as a tableau of 2*num_bits Pauli operators (see attributes x, z,
+    r). Rows 0 to num_bits - 1 are the destabilizers and rows num_bits to
+    2*num_bits - 1 are the stabilizers. The last row is a scratch row.
+
+    A kind 2 measurement is simulated as in the trajectory mode of
+    SEO_simulator: its outcome is sampled with the random number generator
+    self.rng, and the state is projected onto that outcome. The IF_M blocks
+    are applied or skipped according to the sampled outcomes. A kind 0
+    (resp., 1) measurement projects the state onto outcome 0 (resp., 1) of
+    the target qubit, and multiplies self.tot_prob by the probability of
+    that outcome. If that probability is 0, the state becomes zero, which
+    is signalled by self.tot_prob = 0.
+
+    Attributes
+    ----------
+    br_meas_bits : list[int]
+        list of the qubits measured so far by kind 2 measurements, in the
+        order in which they were measured.
+    clifford_words : dict[tuple, str] | None
+        class attribute. Maps the action of a one qubit Clifford gate on
+        the Pauli matrices (see get_pauli_images()) to a word in the letters
+        'H' and 'S' that implements that gate, up to a global phase. Filled
+        by the first call to get_clifford_word().
+    mcase_is_true : bool
+        True iff the lines being read are not inside an IF_M block, or if
+        they are inside one whose controls agree with meas_outcomes.
+    meas_outcomes : dict[int, bool]
+        dictionary mapping each qubit measured by a kind 2 measurement to
+        its sampled outcome.
+    r : np.ndarray
+        bool array of shape (2*num_bits + 1,). r[row] is True iff the sign
+        of Pauli operator `row` of the tableau is -1.
+    rng : np.random.Generator
+    tot_prob : float
+        total probability of the state, which is 1 unless there are kind 0
+        or 1 measurements.
+    x : np.ndarray
+    z : np.ndarray
+        bool arrays of shape (2*num_bits + 1, num_bits). The Pauli
+        operator `row` of the tableau acts at qubit bit as X^x[row, bit]
+        Z^z[row, bit] (times a phase that makes it Hermitian).
+
+    """
+
+    clifford_words = None
+
+    def __init__(self, file_prefix, num_bits, rand_seed=None, **kwargs):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        file_prefix : str
+        num_bits : int
+        rand_seed : int | np.random.SeedSequence | None
+            seed of the random number generator used to sample the outcomes
+            of kind 2 measurements.
+
+        Returns
+        -------
+
+        """
+        num_rows = 2*num_bits + 1
+        self.x = np.zeros((num_rows, num_bits), dtype=bool)
+        self.z = np.zeros((num_rows, num_bits), dtype=bool)
+        self.r = np.zeros((num_rows,), dtype=bool)
+        # ground state: destabilizer bit is X_bit, stabilizer bit is Z_bit
+        bits = np.arange(num_bits)
+        self.x[bits, bits] = True
+        self.z[num_bits + bits, bits] = True
+        self.rng = np.random.default_rng(rand_seed)
+        self.tot_prob = 1.
+        self.br_meas_bits = []
+        self.meas_outcomes = {}
+        self.mcase_is_true = True
+        SEO_reader.__init__(self, file_prefix, num_bits, **kwargs)
+
+    @staticmethod
+    def get_pauli_images(gate):
+        """
+        Returns a pair (image of X, image of Z), where the image of P is
+        gate P gate^dagger, if both images are Pauli matrices times +1 or
+        -1. Each image is given as a pair (axis, sign), where axis is 1,
+        2 or 3 for X, Y or Z. Returns None if gate is not a Clifford gate.
+
+        Parameters
+        ----------
+        gate : np.ndarray
+            2 dim unitary matrix
+
+        Returns
+        -------
+        tuple[tuple[int, int], tuple[int, int]] | None
+
+        """
+        paulis = [OneBitGates.sigx(), OneBitGates.sigy(),
+                  OneBitGates.sigz()]
+        images = []
+        for pauli in [paulis[0], paulis[2]]:
+            img = gate @ pauli @ np.conj(gate.T)
+            found = None
+            for axis in [1, 2, 3]:
+                for sign in [1, -1]:
+                    if np.allclose(img, sign*paulis[axis - 1], atol=1e-8):
+                        found = (axis, sign)
+            if found is None:
+                return None
+            images.append(found)
+        return tuple(images)
+
+    @staticmethod
+    def get_clifford_word(gate):
+        """
+        Returns a str of letters 'H' and 'S' such that applying H and S
+        gates in the order of the letters gives gate, up to a global phase.
+        Returns None if gate is not a Clifford gate.
+
+        Parameters
+        ----------
+        gate : np.ndarray
+
+        Returns
+        -------
+        str | None
+
+        """
+        cls = SEO_simulator_stab
+        if cls.clifford_words is None:
+            # breadth first search over the 24 one qubit Cliffords
+            mats = {'H': OneBitGates.had2(), 'S': OneBitGates.mat_S()}
+            cls.clifford_words = {
+                cls.get_pauli_images(np.eye(2)): ''}
+            new_words = {'': np.eye(2)}
+            while new_words:
+                next_words = {}
+                for word, mat in new_words.items():
+                    for letter in 'HS':
+                        new_mat = mats[letter] @ mat
+                        key = cls.get_pauli_images(new_mat)
+                        if key not in cls.clifford_words:
+                            cls.clifford_words[key] = word + letter
+                            next_words[word + letter] = new_mat
+                new_words = next_words
+        key = cls.get_pauli_images(gate)
+        if key is None:
+            return None
+        return cls.clifford_words[key]
+
+    def apply_H(self, bit):
+        """
+        Applies a Hadamard gate at qubit bit to the tableau.
+
+        Parameters
+        ----------
+        bit : int
+
+        Returns
+        -------
+        None
+
+        """
+        x, z = self.x, self.z
+        self.r ^= x[:, bit] & z[:, bit]
+        x[:, bit], z[:, bit] = z[:, bit].copy(), x[:, bit].copy()
+
+    def apply_S(self, bit):
+        """
+        Applies an S = diag(1, i) gate at qubit bit to the tableau.
+
+        Parameters
+        ----------
+        bit : int
+
+        Returns
+        -------
+        None
+
+        """
+        x, z = self.x, self.z
+        self.r ^= x[:, bit] & z[:, bit]
+        z[:, bit] ^= x[:, bit]
+
+    def apply_pauli(self, axis, bit):
+        """
+        Applies a Pauli gate (X, Y or Z for axis = 1, 2, 3) at qubit bit to
+        the tableau.
+
+        Parameters
+        ----------
+        axis : int
+        bit : int
+
+        Returns
+        -------
+        None
+
+        """
+        if axis in [1, 2]:
+            self.r ^= self.z[:, bit]
+        if axis in [2, 3]:
+            self.r ^= self.x[:, bit]
+
+    def apply_CNOT(self, trol_bit, tar_bit):
+        """
+        Applies a CNOT with control trol_bit and target tar_bit to the
+        tableau.
+
+        Parameters
+        ----------
+        trol_bit : int
+        tar_bit : int
+
+        Returns
+        -------
+        None
+
+        """
+        x, z = self.x, self.z
+        self.r ^= x[:, trol_bit] & z[:, tar_bit] & \
+            ~(x[:, tar_bit] ^ z[:, trol_bit])
+        x[:, tar_bit] ^= x[:, trol_bit]
+        z[:, trol_bit] ^= z[:, tar_bit]
+
+    def row_sum(self, rows, src_row):
+        """
+        Multiplies each Pauli operator rows[k] of the tableau by the Pauli
+        operator src_row, keeping track of the sign. src_row must not be in
+        rows.
+
+        Parameters
+        ----------
+        rows : np.ndarray
+            1 dim int array
+        src_row : int
+
+        Returns
+        -------
+        None
+
+        """
+        x1 = self.x[src_row].astype(np.int64)
+        z1 = self.z[src_row].astype(np.int64)
+        x2 = self.x[rows].astype(np.int64)
+        z2 = self.z[rows].astype(np.int64)
+        # exponent of i picked up at each qubit when multiplying
+        # the Paulis (x1, z1) and (x2, z2)
+        g = np.where(x1 & z1, z2 - x2,
+                     np.where(x1, z2*(2*x2 - 1), z1*x2*(1 - 2*z2)))
+        tot = 2*self.r[rows] + 2*self.r[src_row] + np.sum(g, axis=1)
+        self.r[rows] = (tot % 4) == 2
+        self.x[rows] ^= self.x[src_row]
+        self.z[rows] ^= self.z[src_row]
+
+    def get_determined_outcome(self, bit):
+        """
+        Returns the outcome of measuring qubit bit in the Z basis if it is
+        determined (i.e., it has probability one), or None if it is random.
+        The state is not changed.
+
+        Parameters
+        ----------
+        bit : int
+
+        Returns
+        -------
+        bool | None
+
+        """
+        num_bits = self.num_bits
+        if np.any(self.x[num_bits:2*num_bits, bit]):
+            return None
+        scratch = 2*num_bits
+        self.x[scratch] = False
+        self.z[scratch] = False
+        self.r[scratch] = False
+        for row in np.flatnonzero(self.x[:num_bits, bit]):
+            self.row_sum(np.array([scratch]), row + num_bits)
+        return bool(self.r[scratch])
+
+    def measure(self, bit, outcome=None):
+        """
+        Measures qubit bit in the Z basis, projects the state onto the
+        outcome, and returns the pair (outcome, probability of outcome).
+        If outcome is None, it is sampled. Otherwise, the state is
+        projected onto the given outcome, even if its probability is 0 (in
+        which case the state is left unchanged).
+
+        Parameters
+        ----------
+        bit : int
+        outcome : bool | None
+
+        Returns
+        -------
+        tuple[bool, float]
+
+        """
+        num_bits = self.num_bits
+        det_outcome = self.get_determined_outcome(bit)
+        if det_outcome is not None:
+            if outcome is None or outcome == det_outcome:
+                return det_outcome, 1.
+            return outcome, 0.
+        if outcome is None:
+            outcome = bool(self.rng.random() < .5)
+        stab_rows = num_bits + np.flatnonzero(
+            self.x[num_bits:2*num_bits, bit])
+        p = stab_rows[0]
+        rows = np.flatnonzero(self.x[:2*num_bits, bit])
+        self.row_sum(rows[rows != p], p)
+        self.x[p - num_bits] = self.x[p]
+        self.z[p - num_bits] = self.z[p]
+        self.r[p - num_bits] = self.r[p]
+        self.x[p] = False
+        self.z[p] = False
+        self.z[p, bit] = True
+        self.r[p] = outcome
+        return outcome, .5
+
+    def get_bit_probs(self):
+        """
+        Returns a list whose jth item is, for the jth qubit, the pair (p,
+        1-p), where p is the probability that the jth qubit is 0, like
+        StateVec.get_bit_probs(). For a stabilizer state, p is 0, 1/2 or 1.
+
+        Returns
+        -------
+        list[tuple[float, float]]
+
+        """
+        probs = []
+        for bit in range(self.num_bits):
+            outcome = self.get_determined_outcome(bit)
+            if outcome is None:
+                probs.append((.5, .5))
+            else:
+                probs.append((0., 1.) if outcome else (1., 0.))
+        return probs
+
+    def get_br_key(self):
+        """
+        Returns the branch key of the state, i.e., "pure" if there have been
+        no kind 2 measurements, and otherwise a str like '4F2T' with the
+        sampled outcomes, as in the trajectory mode of SEO_simulator.
+
+        Returns
+        -------
+        str
+
+        """
+        br_key = "pure"
+        for bit in self.br_meas_bits:
+            br_key = SEO_simulator.get_br_key_with_new_link(
+                br_key, bit, self.meas_outcomes[bit])
+        return br_key
+
+    def evolve_by_controlled_one_bit_gate(self,
+                tar_bit_pos, controls, one_bit_gate):
+        """
+        Applies the controlled one bit gate to the tableau, if it is a
+        Clifford gate. Otherwise, it fails with an AssertionError. The
+        check is done even inside an IF_M block whose controls disagree
+        with the sampled outcomes, so whether a circuit is rejected
+        doesn't depend on those outcomes.
+
+        Parameters
+        ----------
+        tar_bit_pos : int
+        controls : Controls
+        one_bit_gate : np.ndarray
+
+        Returns
+        -------
+        None
+
+        """
+        num_trols = len(controls.bit_pos)
+        if num_trols == 0:
+            word = SEO_simulator_stab.get_clifford_word(one_bit_gate)
+            assert word is not None, \
+                "line " + str(self.line_count) + " is not a Clifford gate"
+            if not self.mcase_is_true:
+                return
+            for letter in word:
+                if letter == 'H':
+                    self.apply_H(tar_bit_pos)
+                else:
+                    self.apply_S(tar_bit_pos)
+            return
+        assert num_trols == 1, "line " + str(self.line_count) + \
+            " has more than one control, so it is not a Clifford gate"
+        trol_bit = controls.bit_pos[0]
+        kind = controls.kinds[0]
+        # one_bit_gate = fac*pauli, with pauli in I, X, Y, Z
+        found = None
+        paulis = [np.eye(2), OneBitGates.sigx(), OneBitGates.sigy(),
+                  OneBitGates.sigz()]
+        for axis, pauli in enumerate(paulis):
+            fac = np.trace(pauli @ one_bit_gate)/2
+            if np.allclose(one_bit_gate, fac*pauli, atol=1e-8):
+                found = axis, fac
+        assert found is not None, "line " + str(self.line_count) + \
+            " is a controlled gate which is not a controlled Pauli gate"
+        axis, fac = found
+        # number of quarter turns of fac
+        num_quarters = int(np.round(np.angle(fac)/(np.pi/2))) % 4
+        assert np.isclose(fac, 1j**num_quarters, atol=1e-8), \
+            "line " + str(self.line_count) + " is not a Clifford gate"
+        if not self.mcase_is_true:
+            return
+        # a control of kind False is a control of kind True conjugated by
+        # X at the control bit
+        if not kind:
+            self.apply_pauli(1, trol_bit)
+        if axis == 1:
+            self.apply_CNOT(trol_bit, tar_bit_pos)
+        elif axis == 2:
+            # controlled Y = S CNOT S^dagger
+            for k in range(3):
+                self.apply_S(tar_bit_pos)
+            self.apply_CNOT(trol_bit, tar_bit_pos)
+            self.apply_S(tar_bit_pos)
+        elif axis == 3:
+            # controlled Z = H CNOT H
+            self.apply_H(tar_bit_pos)
+            self.apply_CNOT(trol_bit, tar_bit_pos)
+            self.apply_H(tar_bit_pos)
+        # diag(1, fac) at control bit
+        for k in range(num_quarters):
+            self.apply_S(trol_bit)
+        if not kind:
+            self.apply_pauli(1, trol_bit)
+
+    def use_DIAG(self, trols, rad_angles):
+        """
+        Overrides the parent class use_ function. DIAG lines are not
+        supported.
+
+        Parameters
+        ----------
+        trols : Controls
+        rad_angles : list[float]
+
+        Returns
+        -------
+        None
+
+        """
+        assert False, "DIAG lines are not supported by the stabilizer " \
+            "simulator"
+
+    def use_HAD2(self, tar_bit_pos, controls):
+        """
+        Overrides the parent class use_ function. Calls
+        evolve_by_controlled_one_bit_gate() for had2.
+
+        Parameters
+        ----------
+        tar_bit_pos : int
+        controls : Controls
+
+        Returns
+        -------
+        None
+
+        """
+        gate = OneBitGates.had2()
+        self.evolve_by_controlled_one_bit_gate(tar_bit_pos, controls, gate)
+
+    def use_IF_M_beg(self, controls):
+        """
+        Overrides the parent class use_ function. The lines inside the IF_M
+        block will be applied iff controls agree with the sampled outcomes
+        of the measurements.
+
+        Parameters
+        ----------
+        controls : Controls
+
+        Returns
+        -------
+        None
+
+        """
+        self.mcase_is_true = all(
+            self.meas_outcomes[bit] == kind for bit, kind in
+            controls.bit_pos_to_kind.items())
+
+    def use_IF_M_end(self):
+        """
+        Overrides the parent class use_ function. From now on, all lines
+        are applied.
+
+        Returns
+        -------
+        None
+
+        """
+        self.mcase_is_true = True
+
+    def use_MEAS(self, tar_bit_pos, kind):
+        """
+        Overrides the parent class use_ function. For kind 2, samples the
+        outcome of measuring qubit tar_bit_pos, and stores it in
+        self.meas_outcomes. For kind 0 (resp., 1), projects the state onto
+        outcome 0 (resp., 1), and multiplies self.tot_prob by the
+        probability of that outcome.
+
+        Parameters
+        ----------
+        tar_bit_pos : int
+        kind : int
+
+        Returns
+        -------
+        None
+
+        """
+        if kind == 2:
+            outcome, prob = self.measure(tar_bit_pos)
+            self.meas_outcomes[tar_bit_pos] = outcome
+            self.br_meas_bits.append(tar_bit_pos)
+        elif kind in [0, 1]:
+            outcome, prob = self.measure(tar_bit_pos, kind == 1)
+            self.tot_prob *= prob
+        else:
+            assert False, 'unsupported measurement kind'
+
+    def use_MP_Y(self, tar_bit_pos, trols, rad_angles):
+        """
+        Overrides the parent class use_ function. MP_Y lines are not
+        supported.
+
+        Parameters
+        ----------
+        tar_bit_pos : int
+        trols : Controls
+        rad_angles : list[float]
+
+        Returns
+        -------
+        None
+
+        """
+        assert False, "MP_Y lines are not supported by the stabilizer " \
+            "simulator"
+
+    def use_NOTA(self, bla_str):
+        """
+        Overrides the parent class use_ function. Does nothing.
+
+        Parameters
+        ----------
+        bla_str : str
+
+        Returns
+        -------
+        None
+
+        """
+        pass
+
+    def use_PHAS(self, angle_rads, tar_bit_pos, controls):
+        """
+        Overrides the parent class use_ function. Calls
+        evolve_by_controlled_one_bit_gate() for PHAS.
+
+        Parameters
+        ----------
+        angle_rads : float
+        tar_bit_pos : int
+        controls : Controls
+
+        Returns
+        -------
+        None
+
+        """
+        gate = OneBitGates.phase_fac(angle_rads)
+        self.evolve_by_controlled_one_bit_gate(tar_bit_pos, controls, gate)
+
+    def use_P_PH(self, projection_bit, angle_rads, tar_bit_pos, controls):
+        """
+        Overrides the parent class use_ function. Calls
+        evolve_by_controlled_one_bit_gate() for P_0 and P_1 phase factors.
+
+        Parameters
+        ----------
+        projection_bit : int
+            0 (resp. 1) for P_0 (resp. P_1) projection
+        angle_rads : float
+        tar_bit_pos : int
+        controls : Controls
+
+        Returns
+        -------
+        None
+
+        """
+        fun = {
+            0: OneBitGates.P_0_phase_fac,
+            1: OneBitGates.P_1_phase_fac
+        }
+        gate = fun[projection_bit](angle_rads)
+        self.evolve_by_controlled_one_bit_gate(tar_bit_pos, controls, gate)
+
+    def use_PRINT(self, style, line_num):
+        """
+        Overrides the parent class use_ function. Prints to screen the
+        branch key and the probabilities of each qubit, and, if style is
+        "ALL", the stabilizers too.
+
+        Parameters
+        ----------
+        style : str
+            style in which to print
+        line_num : int
+            line number in eng & pic files in which PRINT command appears
+
+        Returns
+        -------
+        None
+
+        """
+        assert style in ["V1", "ALL"], "unsupported PRINT style"
+        print("\n*************************beginning PRINT output")
+        print("PRINT line number=" + str(line_num))
+        print("*********branch= " + self.get_br_key())
+        print("total probability of state (=one if no kind 0 or 1 "
+              "measurements)=", self.tot_prob)
+        if style == "ALL":
+            print("stabilizers:")
+            for row in range(self.num_bits, 2*self.num_bits):
+                print(("-" if self.r[row] else "+") + "".join(
+                    "IXZY"[x + 2*z] for x, z in
+                    zip(self.x[row], self.z[row])))
+        print("dictionary with key=qubit, value=(Prob(0), Prob(1))")
+        print(dict(enumerate(self.get_bit_probs())))
+        print("****************************ending PRINT output")
+
+    def use_ROT(self, axis, angle_rads, tar_bit_pos, controls):
+        """
+        Overrides the parent class use_ function. Calls
+        evolve_by_controlled_one_bit_gate() for rot along axes x, y, or z.
+
+        Parameters
+        ----------
+        axis : int
+            1, 2, 3 for x, y, z
+        angle_rads : float
+        tar_bit_pos : int
+        controls : Controls
+
+        Returns
+        -------
+        None
+
+        """
+        gate = OneBitGates.rot_ax(angle_rads, axis)
+        self.evolve_by_controlled_one_bit_gate(tar_bit_pos, controls, gate)
+
+    def use_ROTN(self, angle_x_rads, angle_y_rads, angle_z_rads,
+                tar_bit_pos, controls):
+        """
+        Overrides the parent class use_ function. Calls
+        evolve_by_controlled_one_bit_gate() for rot along arbitrary axis.
+
+        Parameters
+        ----------
+        angle_x_rads : float
+        angle_y_rads : float
+        angle_z_rads : float
+        tar_bit_pos : int
+        controls : Controls
+
+        Returns
+        -------
+        None
+
+        """
+        gate = OneBitGates.rot(angle_x_rads, angle_y_rads, angle_z_rads)
+        self.evolve_by_controlled_one_bit_gate(tar_bit_pos, controls, gate)
+
+    def use_SIG(self, axis, tar_bit_pos, controls):
+        """
+        Overrides the parent class use_ function. Calls
+        evolve_by_controlled_one_bit_gate() for sigx, sigy, sigz.
+
+        Parameters
+        ----------
+        axis : int
+            1, 2, 3 for x, y, z
+        tar_bit_pos : int
+        controls : Controls
+
+        Returns
+        -------
+        None
+
+        """
+        fun = {
+            1: OneBitGates.sigx,
+            2: OneBitGates.sigy,
+            3: OneBitGates.sigz
+        }
+        gate = fun[axis]()
+        self.evolve_by_controlled_one_bit_gate(tar_bit_pos, controls, gate)
+
+    def use_SWAP(self, bit1, bit2, controls):
+        """
+        Overrides the parent class use_ function. Exchanges the columns of
+        the tableau for bit1 and bit2. Controlled swaps are not supported,
+        even inside an IF_M block that isn't applied.
+
+        Parameters
+        ----------
+        bit1 : int
+        bit2 : int
+        controls : Controls
+
+        Returns
+        -------
+        None
+
+        """
+        assert len(controls.bit_pos) == 0, "line " + str(self.line_count) \
+            + " is a controlled SWAP, so it is not a Clifford gate"
+        if not self.mcase_is_true:
+            return
+        for arr in [self.x, self.z]:
+            arr[:, [bit1, bit2]] = arr[:, [bit2, bit1]]
+
+if __name__ == "__main__":
+    from SEO_writer import *
+
+    def main():
+        # GHZ circuit with measurements. Its 3 qubits are measured in the
+        # x, y and y bases
+        sim = SEO_simulator_stab('io_folder/ghz_xyy_meas', 3, rand_seed=7)
+        print('bit probs=', sim.get_bit_probs())
+
+        # 100 qubit GHZ state, far too big for SEO_simulator
+        num_bits = 100
+        file_prefix = 'io_folder/stab_ghz_test'
+        wr = SEO_writer(file_prefix, CktEmbedder(num_bits, num_bits))
+        wr.write_one_bit_gate(0, OneBitGates.had2)
+        for bit in range(1, num_bits):
+            trols = Controls(num_bits)
+            trols.set_control(0, True)
+            trols.refresh_lists()
+            wr.write_controlled_one_bit_gate(bit, trols, OneBitGates.sigx)
+        wr.write_MEAS(0, 2)
+        wr.close_files()
+        sim = SEO_simulator_stab(file_prefix, num_bits, rand_seed=7)
+        probs = sim.get_bit_probs()
+        print('outcome of qubit 0=', sim.meas_outcomes[0])
+        print('all qubits agree with it=',
+              all(p == probs[0] for p in probs))
+    main()
@@ -14,11 +14,24 @@ class StateVec:
     SEO_simulation. This class also provides a function for constructing
     from such dictionaries of state vectors, a density matrix which is a 2
     dim square numpy array of dimension 2^num_bits.
-    
+
+    self.arr may also hold a batch of state vectors. In that case,
+    its shape is batch_shape + [2]*num_bits; i.e., the leading axes of
+    self.arr label the items of the batch and its last num_bits axes are
+    the qubits. A batch is evolved by SEO_simulator in a single pass, as if
+    it were a single state vector.
+
+    self.arr is np.complex128 by default, but the functions that create
+    state vectors have a dtype option that can be set to np.complex64 to
+    halve the memory used. Functions whose accuracy matters more than
+    their speed, like get_entropy(), upcast their input to double
+    precision internally.
+
     Attributes
     ----------
     arr : np.ndarray
-         a complex array of shape [2]*num_bits
+         a complex array of shape [2]*num_bits, or of shape batch_shape + [
+         2]*num_bits for a batch of state vectors
     num_bits : int
 
     """
@@ -38,7 +51,9 @@ class StateVec:
         self.num_bits = num_bits
         self.arr = arr
         if arr is not None:
-            assert self.arr.shape == tuple([2]*self.num_bits)
+            assert self.arr.ndim >= num_bits
+            assert self.arr.shape[self.arr.ndim - num_bits:] == \
+                tuple([2]*self.num_bits)
 
     @staticmethod
     def is_zero(st_vec):
@@ -57,6 +72,94 @@ class StateVec:
         """
         return st_vec is None or st_vec.arr is None
 
+    def get_batch_shape(self):
+        """
+        Returns the shape of the batch axes of self.arr. This is () if
+        self.arr holds a single state vector.
+
+        Returns
+        -------
+        tuple[int]
+
+        """
+        return self.arr.shape[:self.arr.ndim - self.num_bits]
+
+    def get_batch_item(self, index):
+        """
+        Returns a StateVec whose arr is a view of the item labelled by index
+        of the batch self.arr.
+
+        Parameters
+        ----------
+        index : int | tuple[int]
+
+        Returns
+        -------
+        StateVec
+
+        """
+        assert self.get_batch_shape(), "self is not a batch"
+        if isinstance(index, int):
+            index = (index,)
+        return StateVec(self.num_bits, self.arr[index + (Ellipsis,)])
+
+    @staticmethod
+    def get_batch_st_vec(st_vec_list):
+        """
+        Returns a StateVec whose arr is a batch (with a single batch axis)
+        made from the state vectors in the list st_vec_list. Evolving this
+        batch with SEO_simulator is equivalent to evolving each item of
+        st_vec_list separately.
+
+        Parameters
+        ----------
+        st_vec_list : list[StateVec]
+
+        Returns
+        -------
+        StateVec
+
+        """
+        num_bits = st_vec_list[0].num_bits
+        for st_vec in st_vec_list:
+            assert st_vec.num_bits == num_bits
+            assert st_vec.get_batch_shape() == ()
+        arr = np.stack([st_vec.arr for st_vec in st_vec_list])
+        return StateVec(num_bits, arr)
+
+    @staticmethod
+    def get_standard_basis_batch_st_vec(num_bits, labels=None,
+                                        dtype=np.complex128):
+        """
+        Returns a batch of standard basis states. Item k of the batch is the
+        basis state whose ZL label is labels[k]. If labels is None,
+        it is taken to be range(2^num_bits), in which case the batch
+        axis and the traditional (ZL) state vector of the batch form an
+        identity matrix. Evolving this batch with SEO_simulator yields the
+        columns labels of the unitary matrix of a circuit.
+
+        Parameters
+        ----------
+        num_bits : int
+        labels : list[int] | range | None
+        dtype : type
+
+        Returns
+        -------
+        StateVec
+
+        """
+        dim = 1 << num_bits
+        if labels is None:
+            labels = range(dim)
+        num_items = len(labels)
+        arr = np.zeros((num_items, dim), dtype=dtype)
+        arr[np.arange(num_items), np.array(labels, dtype=int)] = 1
+        # reshape gives ZL axes, reverse them to get ZF axes
+        arr = arr.reshape([num_items] + [2]*num_bits)
+        arr = arr.transpose([0] + list(reversed(range(1, num_bits + 1))))
+        return StateVec(num_bits, np.ascontiguousarray(arr))
+
     def __str__(self):
         """
         Returns str(self.arr)
@@ -69,7 +172,7 @@ class StateVec:
         return str(self.arr)
 
     @staticmethod
-    def get_ground_st_vec(num_bits):
+    def get_ground_st_vec(num_bits, dtype=np.complex128):
         """
         Returns StateVec for the ground state |0>|0>|0>...|0>, where |0> = [
         1,0]^t and |1> = [0,1]^t, t = transpose
@@ -77,20 +180,21 @@ class StateVec:
         Parameters
         ----------
         num_bits : int
+        dtype : type
 
         Returns
         -------
         StateVec
 
         """
-        ty = np.complex128
+        ty = dtype
         arr = np.zeros([1 << num_bits], dtype=ty)
         arr[0] = 1
         arr = arr.reshape([2]*num_bits)
         return StateVec(num_bits, arr)
 
     @staticmethod
-    def get_random_st_vec(num_bits, rand_seed=None):
+    def get_random_st_vec(num_bits, rand_seed=None, dtype=np.complex128):
         """
         Returns StateVec for random state \sum_b^n A(b^n)|b^n>, b^n \in {0,
         1}^n, where n=num_bits and \sum_b^n |A( b^n)|^2 = 1
@@ -99,6 +203,7 @@ class StateVec:
         ----------
         num_bits : int
         rand_seed : int
+        dtype : type
 
         Returns
         -------
@@ -113,11 +218,12 @@ class StateVec:
         arr = mat_r*(np.cos(mat_phi) + 1j*np.sin(mat_phi))
         magnitude = np.linalg.norm(arr)
         arr /= magnitude
-        arr = arr.reshape([2]*num_bits)
+        arr = arr.reshape([2]*num_bits).astype(dtype, copy=False)
         return StateVec(num_bits, arr)
 
     @staticmethod
-    def get_standard_basis_st_vec(spin_dir_list, ZL=True):
+    def get_standard_basis_st_vec(spin_dir_list, ZL=True,
+                                  dtype=np.complex128):
         """
         If ZL = True, returns StateVec for state ...|s2>|s1>|s0>,
         where spin_dir_list=[...,s2, s1, s0], s_j \in {0, 1} for all j,
@@ -130,6 +236,7 @@ class StateVec:
         ZL : bool
             True(False) if last(first) entry of spin_dir_list refers to
             qubit 0
+        dtype : type
 
         Returns
         -------
@@ -137,7 +244,7 @@ class StateVec:
 
         """
         num_bits = len(spin_dir_list)
-        arr = np.zeros([1 << num_bits], dtype=np.complex128)
+        arr = np.zeros([1 << num_bits], dtype=dtype)
         arr = arr.reshape([2]*num_bits)
         if ZL:
             spin_dir_list = reversed(spin_dir_list)
@@ -156,6 +263,10 @@ class StateVec:
         view. So it reshapes (flattens) the array and it reverses the axes (
         reversing axes takes it from ZF to ZL).
 
+        If self.arr is a batch, the batch axes are kept and the qubit axes
+        are flattened, so the returned array has shape batch_shape + (1<<
+        num_bits,).
+
         The rows are always labelled 0, 1, 2, 3, ... or the binary
         representation thereof, regardless of whether ZL or ZF convention.
         One can go from digital to binary labels and vice versa
@@ -175,8 +286,13 @@ class StateVec:
         np.array
 
         """
-        perm = list(reversed(range(self.num_bits)))
-        return np.transpose(self.arr, perm).flatten()
+        batch_shape = self.get_batch_shape()
+        num_batch_axes = len(batch_shape)
+        perm = list(range(num_batch_axes)) + \
+            list(reversed(range(num_batch_axes, self.arr.ndim)))
+        # flatten() always returns a copy, reshape() of it doesn't copy
+        return np.transpose(self.arr, perm).flatten().reshape(
+            batch_shape + (-1,))
 
     @staticmethod
     def get_den_mat(num_bits, st_vec_dict):
@@ -254,6 +370,138 @@ class StateVec:
         dm = dm.reshape((dim, dim))
         return dm
 
+    def get_kept_bits_mat(self, kept_bits):
+        """
+        Returns self.arr reshaped into a matrix whose rows (resp.,
+        columns) are labelled by the states of the qubits in kept_bits
+        (resp., of the other qubits), both in the ZL convention. No copy
+        is made if the kept qubits happen to be the leading axes of
+        self.arr.
+
+        Parameters
+        ----------
+        kept_bits : list[int] | set[int]
+
+        Returns
+        -------
+        np.ndarray
+            shape (2^len(kept_bits), 2^(num_bits - len(kept_bits)))
+
+        """
+        assert self.get_batch_shape() == (), \
+            'batches of state vectors are not supported'
+        kept_bits = set(kept_bits)
+        assert kept_bits <= set(range(self.num_bits))
+        # axis of qubit k is k (ZF), so reversed bits give the ZL order
+        kept_axes = [k for k in reversed(range(self.num_bits))
+                     if k in kept_bits]
+        traced_axes = [k for k in reversed(range(self.num_bits))
+                       if k not in kept_bits]
+        return np.transpose(self.arr, kept_axes + traced_axes).reshape(
+            1 << len(kept_axes), -1)
+
+    @staticmethod
+    def get_st_vec_dict_reduced_den_mat(num_bits, st_vec_dict, kept_bits):
+        """
+        Returns the same density matrix as get_partial_tr(num_bits,
+        get_den_mat(num_bits, st_vec_dict), traced_bits_set), where
+        traced_bits_set is the set of qubits not in kept_bits, but without
+        building the 2^num_bits dimensional density matrix. For each
+        branch, the qubits not in kept_bits are contracted directly with a
+        single matrix product of the matrix of get_kept_bits_mat() times
+        its hermitian conjugate.
+
+        Parameters
+        ----------
+        num_bits : int
+        st_vec_dict : dict[str, StateVec]
+        kept_bits : list[int] | set[int]
+
+        Returns
+        -------
+        np.ndarray
+            shape (dim, dim), where dim = 2^len(kept_bits), indexed in the
+            ZL convention
+
+        """
+        dim = 1 << len(set(kept_bits))
+        den_mat = np.zeros((dim, dim), dtype=np.complex128)
+        for br_key in st_vec_dict:
+            if StateVec.is_zero(st_vec_dict[br_key]):
+                continue
+            st_vec = st_vec_dict[br_key]
+            assert st_vec.num_bits == num_bits
+            mat = st_vec.get_kept_bits_mat(kept_bits).astype(
+                np.complex128, copy=False)
+            den_mat += np.dot(mat, np.conj(mat.T))
+        tr = np.trace(den_mat)
+        assert abs(tr) > 1e-6
+        return den_mat/tr
+
+    def get_reduced_den_mat(self, kept_bits):
+        """
+        Returns get_st_vec_dict_reduced_den_mat() for the single branch
+        self.
+
+        Parameters
+        ----------
+        kept_bits : list[int] | set[int]
+
+        Returns
+        -------
+        np.ndarray
+
+        """
+        return StateVec.get_st_vec_dict_reduced_den_mat(
+            self.num_bits, {'pure': self}, kept_bits)
+
+    def get_schmidt_coefs(self, kept_bits):
+        """
+        Returns the Schmidt coefficients, in decreasing order, of the pure
+        state self for the bipartition of the qubits into those in
+        kept_bits and the rest. They are the singular values of the matrix
+        returned by get_kept_bits_mat(), normalized so that the sum of
+        their squares is one. Only the 2^num_bits entries of self.arr and
+        that matrix are ever in memory.
+
+        Parameters
+        ----------
+        kept_bits : list[int] | set[int]
+
+        Returns
+        -------
+        np.ndarray
+
+        """
+        mat = self.get_kept_bits_mat(kept_bits).astype(np.complex128,
+                                                        copy=False)
+        sing_vals = np.linalg.svd(mat, compute_uv=False)
+        norm = np.linalg.norm(sing_vals)
+        assert norm > 1e-6
+        return sing_vals/norm
+
+    def get_entanglement_entropy(self, kept_bits):
+        """
+        Returns the entanglement entropy of the pure state self for the
+        bipartition of the qubits into those in kept_bits and the rest.
+        This is the entropy of get_reduced_den_mat(kept_bits), i.e.,
+        -sum_j p_j log(p_j), where the p_j are the squares of
+        get_schmidt_coefs(kept_bits). Uses natural log, like
+        get_entropy().
+
+        Parameters
+        ----------
+        kept_bits : list[int] | set[int]
+
+        Returns
+        -------
+        float
+
+        """
+        probs = np.square(self.get_schmidt_coefs(kept_bits))
+        probs = probs[probs > 1e-12]
+        return float(-np.sum(probs*np.log(probs)))
+
     @staticmethod
     def get_impurity(den_mat):
         """
@@ -272,6 +520,7 @@ class StateVec:
         float
 
         """
+        den_mat = np.asarray(den_mat, dtype=np.complex128)
         return abs(np.trace(np.dot(den_mat, den_mat)) - 1)
 
     @staticmethod
@@ -292,6 +541,7 @@ class StateVec:
         float
 
         """
+        den_mat = np.asarray(den_mat, dtype=np.complex128)
         ent = 0.0
         if method == 'eigen':
             evas = np.real(np.linalg.eigvalsh(den_mat))
@@ -326,6 +576,81 @@ class StateVec:
         """
         return np.real(np.diag(den_mat))
 
+    @staticmethod
+    def get_st_vec_dict_pd(num_bits, st_vec_dict):
+        """
+        Returns the same array as get_den_mat_pd(get_den_mat(num_bits,
+        st_vec_dict)), but without building the density matrix. The
+        probabilities of each state vector in st_vec_dict are added,
+        so only arrays of 2^num_bits entries are allocated, instead of
+        4^num_bits.
+
+        Parameters
+        ----------
+        num_bits : int
+        st_vec_dict : dict[str, StateVec]
+
+        Returns
+        -------
+        np.ndarray
+            probability distribution of shape (2^num_bits,) IMP: will
+            be indexed in ZL convention
+
+        """
+        pd = StateVec.get_st_vec_dict_prob_arr(num_bits, st_vec_dict)
+        tot_prob = np.sum(pd)
+        assert tot_prob > 1e-6
+        pd /= tot_prob
+        # pd has ZF axes. Reversing them gives the ZL order
+        return np.transpose(pd, list(reversed(range(num_bits)))).flatten()
+
+    def get_prob_arr(self):
+        """
+        Returns a float64 array with the same shape as self.arr (so
+        possibly with batch axes, and with the qubit axes in ZF order)
+        whose entries are the probabilities |amplitude|^2 of the entries of
+        self.arr.
+
+        Returns
+        -------
+        np.ndarray
+
+        """
+        prob_arr = np.square(self.arr.real, dtype=np.float64)
+        prob_arr += np.square(self.arr.imag, dtype=np.float64)
+        return prob_arr
+
+    @staticmethod
+    def get_st_vec_dict_prob_arr(num_bits, st_vec_dict):
+        """
+        Returns the sum over the nonzero branches of st_vec_dict of their
+        get_prob_arr(). This is the diagonal of the (unnormalized) density
+        matrix of st_vec_dict, as an array with ZF axes.
+
+        Parameters
+        ----------
+        num_bits : int
+        st_vec_dict : dict[str, StateVec]
+
+        Returns
+        -------
+        np.ndarray
+
+        """
+        prob_arr = None
+        for br_key in st_vec_dict:
+            if StateVec.is_zero(st_vec_dict[br_key]):
+                continue
+            st_vec = st_vec_dict[br_key]
+            assert st_vec.num_bits == num_bits
+            if prob_arr is None:
+                prob_arr = st_vec.get_prob_arr()
+            else:
+                prob_arr += np.square(st_vec.arr.real, dtype=np.float64)
+                prob_arr += np.square(st_vec.arr.imag, dtype=np.float64)
+        assert prob_arr is not None, 'all branches are zero'
+        return prob_arr
+
     def get_pd(self):
         """
         Returns copy of self.get_traditional_st_vec() with amplitudes
@@ -348,17 +673,22 @@ class StateVec:
 
     def get_total_prob(self):
         """
-        Returns total probability of self.
+        Returns total probability of self. If self.arr is a batch,
+        returns an array of shape batch_shape with the total probability of
+        each item of the batch.
 
         Parameters
         ----------
 
         Returns
         -------
-        float
+        float | np.ndarray
 
         """
-        return np.sum(np.real(self.arr*self.arr.conj()))
+        qubit_axes = tuple(range(self.arr.ndim - self.num_bits,
+                                 self.arr.ndim))
+        return np.sum(np.real(self.arr*self.arr.conj()), axis=qubit_axes,
+                      dtype=np.float64)
 
     @staticmethod
     def sample_pd(num_bits, pd, num_samples, rand_seed=None):
@@ -395,10 +725,12 @@ class StateVec:
             np.random.seed(rand_seed)
         len_pd = 1 << num_bits
         assert pd.shape == (len_pd,)
-        tot_prob = np.sum(pd)
+        tot_prob = np.sum(pd, dtype=np.float64)
         p = pd
-        if abs(tot_prob-1) > 1e-5:
-            p = pd/tot_prob
+        # np.random.choice() demands that p add up to one with a
+        # tolerance that single precision can't meet
+        if abs(tot_prob-1) > 1e-5 or pd.dtype != np.float64:
+            p = pd.astype(np.float64)/tot_prob
         return np.random.choice(np.arange(0, len_pd), size=num_samples, p=p)
 
     @staticmethod
@@ -423,26 +755,303 @@ class StateVec:
 
         """
         assert pd.shape == (1 << num_bits,)
-        probs = []
-        arr = pd.reshape([2] * num_bits)
-        # tot_prob may not be one
-        # if a measurement has been done
-        tot_prob = np.sum(arr)
-        if abs(tot_prob-1) > 1e-5:
-            arr /= tot_prob
-        # slicex is a portmanteau of slice index
-        # print("state_vec_pd=\n", vec)
-        slicex = [slice(None)]*num_bits
-        # pd is assumed to be in ZL convention
-        # so when reshape, bit k has axis= num_bits -1 - k
-        for k in range(num_bits):
-            k_axis = num_bits - 1 - k
-            slicex[k_axis] = 0
-            p = np.sum(arr[tuple(slicex)])
-            probs.append((p, 1-p))
-            slicex[k_axis] = slice(None)  # restore to all entries slice(None)
-        # print(probs)
-        return probs
+        # reshape gives ZL axes, reverse them to get ZF axes. Both are
+        # views, so pd is not changed
+        prob_arr = np.transpose(pd.reshape([2]*num_bits),
+                                list(reversed(range(num_bits))))
+        bit_probs = StateVec.get_all_bit_probs_from_prob_arr(num_bits,
+                                                             prob_arr)
+        return [(p0, p1) for p0, p1 in bit_probs.tolist()]
+
+    @staticmethod
+    def get_all_bit_probs_from_prob_arr(num_bits, prob_arr):
+        """
+        Returns an array bit_probs of shape batch_shape + (num_bits, 2),
+        such that bit_probs[..., k, b] is the probability that qubit k is
+        b, if the state of all other qubits is ignored.
+
+        prob_arr has shape batch_shape + [2]*num_bits, with the qubit axes
+        in ZF order, like the array returned by get_prob_arr(). The
+        probabilities are normalized separately for each item of the batch.
+
+        All the marginals are found in a single sweep that halves the array
+        at each qubit, so the cost is about 3 passes over prob_arr, instead
+        of the num_bits passes of summing a slice per qubit. prob_arr is not
+        changed.
+
+        Parameters
+        ----------
+        num_bits : int
+        prob_arr : np.ndarray
+
+        Returns
+        -------
+        np.ndarray
+
+        """
+        num_batch_axes = prob_arr.ndim - num_bits
+        assert num_batch_axes >= 0
+        batch_shape = prob_arr.shape[:num_batch_axes]
+        batch_slicex = (slice(None),)*num_batch_axes
+        bit_probs = np.empty(batch_shape + (num_bits, 2), dtype=np.float64)
+        arr = prob_arr
+        for bit in range(num_bits):
+            # the first qubit axis of arr is that of qubit bit. The
+            # following qubit axes are summed over
+            qubit_axes = tuple(range(num_batch_axes, arr.ndim - 1))
+            bit_probs[..., bit, 0] = np.sum(arr[batch_slicex + (0,)],
+                                            axis=qubit_axes,
+                                            dtype=np.float64)
+            bit_probs[..., bit, 1] = np.sum(arr[batch_slicex + (1,)],
+                                            axis=qubit_axes,
+                                            dtype=np.float64)
+            if bit < num_bits - 1:
+                # sum over qubit bit
+                arr = arr[batch_slicex + (0,)] + arr[batch_slicex + (1,)]
+        tot_prob = np.sum(bit_probs[..., 0:1, :], axis=-1, keepdims=True)
+        return bit_probs/np.where(tot_prob > 0, tot_prob, 1)
+
+    @staticmethod
+    def get_marginal_from_prob_arr(num_bits, prob_arr, bits):
+        """
+        Returns the marginal probability table of the qubits in bits,
+        as an array marg of shape batch_shape + [2]*len(bits), such that
+        marg[..., b0, b1, ...] is the probability that qubit bits[0] is b0,
+        qubit bits[1] is b1, etc., if the state of all other qubits is
+        ignored. The table is found with a single np.sum() over the axes of
+        the other qubits.
+
+        prob_arr is as in get_all_bit_probs_from_prob_arr(), and is not
+        changed. The probabilities are normalized separately for each item
+        of the batch.
+
+        Parameters
+        ----------
+        num_bits : int
+        prob_arr : np.ndarray
+        bits : list[int]
+
+        Returns
+        -------
+        np.ndarray
+
+        """
+        assert len(set(bits)) == len(bits), 'repeated qubits'
+        assert all(0 <= bit < num_bits for bit in bits)
+        num_batch_axes = prob_arr.ndim - num_bits
+        assert num_batch_axes >= 0
+        traced_axes = tuple(num_batch_axes + bit for bit in range(num_bits)
+                            if bit not in bits)
+        marg = np.sum(prob_arr, axis=traced_axes, dtype=np.float64)
+        # the axes of marg are in increasing bit order. Reorder them
+        # like bits
+        sorted_bits = sorted(bits)
+        perm = list(range(num_batch_axes)) + \
+            [num_batch_axes + sorted_bits.index(bit) for bit in bits]
+        marg = np.transpose(marg, perm)
+        qubit_axes = tuple(range(num_batch_axes, marg.ndim))
+        tot_prob = np.sum(marg, axis=qubit_axes, keepdims=True)
+        return marg/np.where(tot_prob > 0, tot_prob, 1)
+
+    def get_all_bit_probs(self):
+        """
+        Returns get_all_bit_probs_from_prob_arr() for self. For a
+        dictionary of branches, use
+        get_all_bit_probs_from_prob_arr(num_bits,
+        get_st_vec_dict_prob_arr(num_bits, st_vec_dict)).
+
+        Returns
+        -------
+        np.ndarray
+
+        """
+        return StateVec.get_all_bit_probs_from_prob_arr(
+            self.num_bits, self.get_prob_arr())
+
+    def get_marginal(self, bits):
+        """
+        Returns get_marginal_from_prob_arr() for self. For a dictionary of
+        branches, use get_marginal_from_prob_arr(num_bits,
+        get_st_vec_dict_prob_arr(num_bits, st_vec_dict), bits).
+
+        Parameters
+        ----------
+        bits : list[int]
+
+        Returns
+        -------
+        np.ndarray
+
+        """
+        return StateVec.get_marginal_from_prob_arr(
+            self.num_bits, self.get_prob_arr(), bits)
+
+    @staticmethod
+    def get_pauli_expectations_from_arrs(num_bits, arr_list, terms):
+        """
+        Returns an array expects of shape batch_shape + (len(terms),) such
+        that expects[..., t] is the expected value of the Pauli string
+        terms[t] for the (possibly mixed) state whose branches are the
+        arrays in arr_list, each of shape batch_shape + [2]*num_bits with
+        ZF qubit axes, like StateVec.arr. The expected value is normalized
+        by the total probability, like rho is in get_den_mat().
+
+        Each Pauli string is a tuple of pairs (bit, 'X' | 'Y' | 'Z'),
+        like the keys of the dict QubitOperator.terms of OpenFermion. The
+        empty tuple is the identity.
+
+        A Pauli string P equals i^(number of Y's) X^x Z^z, where x (resp.,
+        z) is the set of qubits with an X or a Y (resp., a Z or a Y), so
+        <psi|P|psi> = i^(number of Y's) sum_j conj(psi[j^x]) psi[j] s_z(j),
+        where the sign s_z(j) is -1 iff j has an odd number of ones in z.
+        The terms are grouped by x, and each group costs a single pass over
+        each branch, no matter how many terms it has (all diagonal terms,
+        for instance, form a single group): the product prod[j] = conj(psi[
+        j^x]) psi[j] is computed once (flipping psi along the x axes is just
+        a view), summed over the axes of the qubits that are not in the z
+        of any term of the group, and a Walsh-Hadamard transform of the
+        small table that is left gives the signed sums of all the terms of
+        the group at once.
+
+        Parameters
+        ----------
+        num_bits : int
+        arr_list : list[np.ndarray]
+        terms : list[tuple[tuple[int, str]]]
+
+        Returns
+        -------
+        np.ndarray
+
+        """
+        assert arr_list, 'all branches are zero'
+        num_batch_axes = arr_list[0].ndim - num_bits
+        assert num_batch_axes >= 0
+        batch_shape = arr_list[0].shape[:num_batch_axes]
+        batch_slicex = (slice(None),)*num_batch_axes
+        qubit_axes = tuple(range(num_batch_axes, num_batch_axes + num_bits))
+        # x_bits_to_ts[x_bits] = positions in terms of the terms with
+        # flipped bits x_bits
+        x_bits_to_ts = {}
+        z_bits_list = []
+        num_ys_list = []
+        for t, term in enumerate(terms):
+            x_bits = set()
+            z_bits = set()
+            num_ys = 0
+            for bit, pauli in term:
+                assert 0 <= bit < num_bits
+                assert pauli in ['X', 'Y', 'Z'], 'unsupported Pauli matrix'
+                assert bit not in x_bits | z_bits, 'repeated qubit'
+                if pauli in ['X', 'Y']:
+                    x_bits.add(bit)
+                if pauli in ['Y', 'Z']:
+                    z_bits.add(bit)
+                num_ys += pauli == 'Y'
+            x_bits_to_ts.setdefault(tuple(sorted(x_bits)), []).append(t)
+            z_bits_list.append(z_bits)
+            num_ys_list.append(num_ys)
+
+        tot_prob = 0.
+        for arr in arr_list:
+            tot_prob += np.sum(np.square(arr.real, dtype=np.float64) +
+                               np.square(arr.imag, dtype=np.float64),
+                               axis=qubit_axes)
+        expects = np.zeros(batch_shape + (len(terms),), dtype=np.complex128)
+        for x_bits, ts in x_bits_to_ts.items():
+            # the z bits of the group, in increasing order
+            z_bits = sorted(set().union(*[z_bits_list[t] for t in ts]))
+            traced_axes = tuple(num_batch_axes + bit for bit in
+                                range(num_bits) if bit not in z_bits)
+            table = 0
+            for arr in arr_list:
+                if x_bits:
+                    flipped = np.flip(arr, axis=tuple(
+                        num_batch_axes + bit for bit in x_bits))
+                    prod = np.conj(flipped)*arr
+                else:
+                    prod = np.square(arr.real, dtype=np.float64) + \
+                        np.square(arr.imag, dtype=np.float64)
+                table = table + np.sum(prod, axis=traced_axes,
+                                       dtype=np.complex128)
+            # Walsh-Hadamard transform of table
+            for axis in range(num_batch_axes, num_batch_axes + len(z_bits)):
+                table0 = np.take(table, 0, axis=axis)
+                table1 = np.take(table, 1, axis=axis)
+                table = np.stack([table0 + table1, table0 - table1],
+                                 axis=axis)
+            for t in ts:
+                slicex = tuple(int(bit in z_bits_list[t]) for bit in z_bits)
+                expects[..., t] = (1j)**num_ys_list[t] * \
+                    table[batch_slicex + slicex]
+        tot_prob = np.where(tot_prob > 0, tot_prob, 1)
+        # Pauli strings are hermitian, so the imaginary parts are only
+        # round-off
+        return np.real(expects)/np.asarray(tot_prob)[..., np.newaxis]
+
+    def get_pauli_expectations(self, terms):
+        """
+        Returns get_pauli_expectations_from_arrs() for the single branch
+        self.arr, which may be a batch.
+
+        Parameters
+        ----------
+        terms : list[tuple[tuple[int, str]]]
+
+        Returns
+        -------
+        np.ndarray
+
+        """
+        return StateVec.get_pauli_expectations_from_arrs(
+            self.num_bits, [self.arr], terms)
+
+    @staticmethod
+    def get_st_vec_dict_pauli_expectations(num_bits, st_vec_dict, terms):
+        """
+        Returns get_pauli_expectations_from_arrs() for the mixed state whose
+        branches are those of st_vec_dict. This equals tr(rho P) for each
+        Pauli string P in terms, where rho = get_den_mat(num_bits,
+        st_vec_dict), but the density matrix is never built.
+
+        Parameters
+        ----------
+        num_bits : int
+        st_vec_dict : dict[str, StateVec]
+        terms : list[tuple[tuple[int, str]]]
+
+        Returns
+        -------
+        np.ndarray
+
+        """
+        arr_list = [st_vec.arr for st_vec in st_vec_dict.values()
+                    if not StateVec.is_zero(st_vec)]
+        return StateVec.get_pauli_expectations_from_arrs(
+            num_bits, arr_list, terms)
+
+    @staticmethod
+    def get_pauli_sum_expectation(expects, pauli_sum):
+        """
+        Returns the expected value of the weighted sum of Pauli strings
+        pauli_sum, given the array expects returned by one of the
+        get_*pauli_expectations*() functions for the terms
+        list(pauli_sum.keys()).
+
+        Parameters
+        ----------
+        expects : np.ndarray
+        pauli_sum : dict[tuple[tuple[int, str]], float | complex]
+            dict from Pauli string to its coefficient, like
+            QubitOperator.terms of OpenFermion
+
+        Returns
+        -------
+        float | complex | np.ndarray
+
+        """
+        coefs = np.array(list(pauli_sum.values()))
+        return np.sum(expects*coefs, axis=-1)
 
     @staticmethod
     def get_bit_counts(bit_probs, num_trials, rand_seed=None):
@@ -554,6 +1163,12 @@ class StateVec:
         if self.arr is None:
             print("zero state vector")
             return
+        if self.get_batch_shape():
+            for index in np.ndindex(*self.get_batch_shape()):
+                print("---------batch item= " + str(index))
+                self.get_batch_item(index).describe_self(print_st_vec,
+                    do_pp, omit_zero_amps, show_probs, ZL)
+            return
         if print_st_vec:
             print('state vector:')
             if do_pp:
@@ -627,6 +1242,11 @@ if __name__ == "__main__":
               StateVec.get_partial_tr(num_bits, den_mat, {0, 2}))
         print("impurity=", StateVec.get_impurity(den_mat))
         print("entropy=", StateVec.get_entropy(den_mat))
+        print('reduced den_mat of qubits 0, 2, without den_mat\n',
+              StateVec.get_st_vec_dict_reduced_den_mat(num_bits,
+                                                       st_vec_dict, {0, 2}))
+        print('entanglement entropy of qubit 1 and qubits 0, 2 for st_vec0=',
+              st_vec0.get_entanglement_entropy({1}))
         den_mat_pd = StateVec.get_den_mat_pd(den_mat)
         print('den_mat_pd=', den_mat_pd)
 
@@ -637,6 +1257,14 @@ if __name__ == "__main__":
         print("counts_dm=\n", StateVec.get_bit_counts(bit_probs_dm, 10))
         print('sample_st_vec_pd, ' + str(num_bits) + ' qubits\n',
               StateVec.sample_pd(num_bits, st_vec_pd, num_samples=20))
+        pauli_sum = {((0, 'Z'), (1, 'Z')): .5,
+                     ((0, 'X'), (2, 'Y')): -.25,
+                     (): 1.}
+        expects = StateVec.get_st_vec_dict_pauli_expectations(
+            num_bits, st_vec_dict, list(pauli_sum.keys()))
+        print('Pauli expectations=', expects)
+        print('expected value of Pauli sum=',
+              StateVec.get_pauli_sum_expectation(expects, pauli_sum))
         StateVec.describe_st_vec_dict(st_vec_dict,
                 print_st_vec=True, do_pp=True,
                 omit_zero_amps=False, show_probs=True, ZL=True)
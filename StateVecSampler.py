@@ -0,0 +1,281 @@
+from StateVec import *
+
+
+class StateVecSampler:
+    """
+    This class draws samples (a.k.a. shots) of the measurement of all the
+    qubits of a state vector, or of a mixed state given by a dictionary
+    st_vec_dict of branches like SEO_simulator.cur_st_vec_dict, without
+    ever building the traditional state vector or its probability
+    distribution pd, like StateVec.sample_pd() does, or the density matrix
+    of the mixed state, like StateVec.get_den_mat() does.
+
+    The constructor builds, in chunks of self.chunk_size amplitudes,
+    the cumulative distribution self.cdf of the probabilities of the
+    entries of st_vec.arr, taken in the order in which they are stored in
+    memory, which is the ZF order. For a dictionary of branches, the
+    probabilities of each entry are summed over the branches. This gives
+    the diagonal of the (unnormalized) density matrix, so the branches are
+    weighed by their total probabilities, and the memory used is that of
+    the branches plus self.cdf, instead of the 4^num_bits of the density
+    matrix. Each sample is then just a binary search of a uniform random
+    number in self.cdf (the random numbers are sorted first, so the
+    searches sweep self.cdf once), followed by a bit reversal that turns
+    the ZF index into a ZL label. self.cdf is built once and reused by
+    every call to sample().
+
+    Since self.cdf is a copy, the sampler does not see later changes of
+    st_vec.arr. Call refresh_cdf() after a state vector is evolved in place.
+
+    Attributes
+    ----------
+    cdf : np.ndarray
+        float64 array of shape (2^num_bits,). cdf[j] is the sum of the
+        probabilities of entries 0 to j of st_vec.arr.ravel()
+    chunk_size : int
+        number of amplitudes (resp., samples) processed at once when
+        building self.cdf (resp., sampling)
+    num_bits : int
+    rng : np.random.Generator
+    tot_prob : float
+        total probability of the state vector, or sum of the total
+        probabilities of the branches. Needn't be one.
+
+    """
+    def __init__(self, st_vecs, chunk_size=1 << 20, rand_seed=None):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        st_vecs : StateVec | dict[str, StateVec]
+            a state vector, or a dictionary of branches. None of them can
+            be a batch.
+        chunk_size : int
+        rand_seed : int | np.random.SeedSequence | None
+
+        Returns
+        -------
+
+        """
+        self.num_bits = StateVecSampler.get_st_vec_list(st_vecs)[0].num_bits
+        self.chunk_size = chunk_size
+        self.rng = np.random.default_rng(rand_seed)
+        self.cdf = np.empty((1 << self.num_bits,), dtype=np.float64)
+        self.tot_prob = 0.
+        self.refresh_cdf(st_vecs)
+
+    @staticmethod
+    def get_st_vec_list(st_vecs):
+        """
+        Returns a list with the nonzero StateVec's in st_vecs.
+
+        Parameters
+        ----------
+        st_vecs : StateVec | dict[str, StateVec]
+
+        Returns
+        -------
+        list[StateVec]
+
+        """
+        if isinstance(st_vecs, dict):
+            st_vec_list = [st_vec for st_vec in st_vecs.values()
+                           if not StateVec.is_zero(st_vec)]
+        else:
+            st_vec_list = [st_vecs]
+        assert st_vec_list, 'all branches are zero'
+        return st_vec_list
+
+    def refresh_cdf(self, st_vecs):
+        """
+        Overwrites self.cdf and self.tot_prob with those of st_vecs, which
+        must have the same number of qubits as the st_vecs given to the
+        constructor.
+
+        Parameters
+        ----------
+        st_vecs : StateVec | dict[str, StateVec]
+
+        Returns
+        -------
+        None
+
+        """
+        flat_arrs = []
+        for st_vec in StateVecSampler.get_st_vec_list(st_vecs):
+            assert st_vec.num_bits == self.num_bits
+            assert st_vec.arr.shape == (2,)*self.num_bits, \
+                'batches of state vectors are not supported'
+            # ravel() is a view if st_vec.arr is contiguous
+            flat_arrs.append(st_vec.arr.ravel())
+        carry = 0.
+        for beg in range(0, len(self.cdf), self.chunk_size):
+            cdf_chunk = self.cdf[beg: beg + self.chunk_size]
+            cdf_chunk[:] = 0
+            for flat_arr in flat_arrs:
+                chunk = flat_arr[beg: beg + self.chunk_size]
+                cdf_chunk += np.square(chunk.real, dtype=np.float64)
+                cdf_chunk += np.square(chunk.imag, dtype=np.float64)
+            np.cumsum(cdf_chunk, out=cdf_chunk)
+            cdf_chunk += carry
+            carry = cdf_chunk[-1]
+        self.tot_prob = float(carry)
+
+    @staticmethod
+    def get_ZL_labels(num_bits, indices):
+        """
+        Reverses, in place, the num_bits lowest bits of each int in the int
+        array indices, and returns it. This turns ZF indices into ZL labels
+        and vice versa. The reversal is done a byte at a time, with a
+        lookup table.
+
+        Parameters
+        ----------
+        num_bits : int
+        indices : np.ndarray
+            int64 array
+
+        Returns
+        -------
+        np.ndarray
+
+        """
+        # rev_byte[j] = j with its 8 bits reversed
+        rev_byte = np.zeros((256,), dtype=np.int64)
+        for bit in range(8):
+            rev_byte |= ((np.arange(256) >> bit) & 1) << (7 - bit)
+        num_bytes = (num_bits + 7)//8
+        # pad indices with zeros on the right so that they have a whole
+        # number of bytes
+        indices <<= 8*num_bytes - num_bits
+        labels = np.zeros_like(indices)
+        for byte in range(num_bytes):
+            labels |= rev_byte[(indices >> 8*byte) & 255] << \
+                8*(num_bytes - 1 - byte)
+        indices[:] = labels
+        return indices
+
+    @staticmethod
+    def get_bitstrings(num_bits, labels):
+        """
+        Returns an array of bytes strings with the binary representation,
+        num_bits characters long, of each int in labels. Like for the
+        labels, the last, rightmost character of each string is the
+        measurement of the 0th qubit.
+
+        Parameters
+        ----------
+        num_bits : int
+        labels : np.ndarray
+
+        Returns
+        -------
+        np.ndarray
+            array of dtype 'S' + str(num_bits), same shape as labels
+
+        """
+        shifts = np.arange(num_bits - 1, -1, -1)
+        chars = ((labels[..., np.newaxis] >> shifts) & 1).astype(np.uint8)
+        chars += ord('0')
+        return chars.view('S' + str(num_bits))[..., 0]
+
+    def sample_in_chunks(self, num_samples):
+        """
+        Generator that yields the num_samples samples in int arrays of at
+        most self.chunk_size samples. Each sample is the ZL label of the
+        measured basis state; i.e., the last, rightmost bit of its binary
+        representation is the measurement of the 0th qubit, as in
+        StateVec.sample_pd().
+
+        Parameters
+        ----------
+        num_samples : int
+
+        Returns
+        -------
+        Iterator[np.ndarray]
+
+        """
+        assert self.tot_prob > 0, 'zero state vector'
+        max_index = len(self.cdf) - 1
+        for beg in range(0, num_samples, self.chunk_size):
+            rand = self.rng.random(min(self.chunk_size, num_samples - beg))
+            rand *= self.tot_prob
+            # searching sorted random numbers visits self.cdf in order,
+            # which is several times faster for large self.cdf. The
+            # samples are shuffled afterwards so their order is random.
+            rand.sort()
+            indices = np.searchsorted(self.cdf, rand, side='right')
+            self.rng.shuffle(indices)
+            # a random number within round-off of self.tot_prob could
+            # fall past the end of self.cdf
+            np.minimum(indices, max_index, out=indices)
+            yield StateVecSampler.get_ZL_labels(self.num_bits,
+                                                indices.astype(np.int64,
+                                                               copy=False))
+
+    def sample(self, num_samples, as_bitstrings=False):
+        """
+        Returns the num_samples samples, as ZL labels or, if as_bitstrings
+        is True, as bitstrings.
+
+        Parameters
+        ----------
+        num_samples : int
+        as_bitstrings : bool
+
+        Returns
+        -------
+        np.ndarray
+            shape (num_samples,)
+
+        """
+        labels = np.empty((num_samples,), dtype=np.int64)
+        beg = 0
+        for chunk in self.sample_in_chunks(num_samples):
+            labels[beg: beg + len(chunk)] = chunk
+            beg += len(chunk)
+        if as_bitstrings:
+            return StateVecSampler.get_bitstrings(self.num_bits, labels)
+        return labels
+
+if __name__ == "__main__":
+    import time
+
+    def main():
+        num_bits = 3
+        st_vec = StateVec.get_random_st_vec(num_bits, rand_seed=123)
+        sampler = StateVecSampler(st_vec, rand_seed=1)
+        print('samples\n', sampler.sample(10))
+        print('bitstrings\n', sampler.sample(10, as_bitstrings=True))
+        num_samples = 100000
+        freqs = np.bincount(sampler.sample(num_samples),
+                            minlength=1 << num_bits)/num_samples
+        print('frequencies\n', freqs)
+        print('probabilities\n', st_vec.get_pd())
+
+        # mixed state given by 2 branches, with probabilities 1/3 and 2/3
+        st_vec_dict = {
+            'br0': StateVec(num_bits, np.sqrt(1/3)*st_vec.arr),
+            'br1': StateVec(num_bits, np.sqrt(2/3)*StateVec.get_random_st_vec(
+                num_bits, rand_seed=321).arr),
+            'br2': None}
+        sampler = StateVecSampler(st_vec_dict, rand_seed=1)
+        freqs = np.bincount(sampler.sample(num_samples),
+                            minlength=1 << num_bits)/num_samples
+        print('mixed state frequencies\n', freqs)
+        print('mixed state probabilities\n',
+              StateVec.get_st_vec_dict_pd(num_bits, st_vec_dict))
+
+        num_bits = 24
+        st_vec = StateVec.get_random_st_vec(num_bits, rand_seed=123,
+                                            dtype=np.complex64)
+        start = time.time()
+        sampler = StateVecSampler(st_vec, rand_seed=1)
+        print(num_bits, 'qubits, time to build cdf',
+              time.time() - start)
+        start = time.time()
+        sampler.sample(10**6)
+        print('time to draw 10^6 samples', time.time() - start)
+    main()
@@ -121,7 +121,7 @@ class Qubiter_to_AnyQasm(SEO_reader):
 
         vman = PlaceholderManager(eval_all_vars=False)
         rdr = SEO_reader(file_prefix, num_bits, vars_manager=vman,
-                        write_log=True)
+                        write_log=True, ckt=kwargs.pop('ckt', None))
         self.ckt_var_nums = rdr.vars_manager.ckt_var_nums
         self.ckt_fun_names = rdr.vars_manager.ckt_fun_names
 
@@ -142,8 +142,9 @@ class Qubiter_to_AnyQasm(SEO_reader):
         self.write_prelude()
 
         vman1 = PlaceholderManager(eval_all_vars=False)
+        # reuse compiled English file of rdr so file is parsed only once
         SEO_reader.__init__(self, file_prefix, num_bits,
-                            vars_manager=vman1, **kwargs)
+                            vars_manager=vman1, ckt=rdr.ckt, **kwargs)
 
         self.write_ending()
 